@@ -0,0 +1,141 @@
+"""
+Content-aware, transactional artifact writer.
+
+Stage every file a task produces, then commit:
+  - files whose sha256 already matches what is on disk are left untouched
+    (mtime preserved, so Maven/javac and Cucumber see no change)
+  - everything else is written to a temp file in the target directory,
+    fsync'ed, and only then renamed over the target with os.replace()
+
+If anything fails while staging or writing temp files, no target is touched.
+
+    txn = ArtifactTransaction()
+    txn.stage(path_a, text_a)
+    txn.stage(path_b, text_b)
+    report = txn.commit()   # {"written": [...], "unchanged": [...]}
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+
+def _read_umask() -> int:
+    # os.umask can only be read by setting it; done once at import, before any worker threads
+    mask = os.umask(0o022)
+    os.umask(mask)
+    return mask
+
+
+_UMASK = _read_umask()
+
+
+def _target_mode(path: Path) -> int:
+    """Mode the published file should get: the replaced file's, else what open() would create."""
+    try:
+        return path.stat().st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _same_content(path: Path, data: bytes) -> bool:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return False
+    # size check first: avoids reading the file for the common "changed" case
+    if st.st_size != len(data):
+        return False
+    return sha256_bytes(path.read_bytes()) == sha256_bytes(data)
+
+
+def _unlink_all(paths: Iterable[str]) -> None:
+    for tmp in paths:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+class ArtifactTransaction:
+    def __init__(self) -> None:
+        self._staged: Dict[Path, bytes] = {}
+        self.committed = False
+
+    def stage(self, path: Path, content: str) -> Path:
+        if self.committed:
+            raise RuntimeError("ArtifactTransaction already committed")
+        self._staged[Path(path)] = content.encode("utf-8")
+        return Path(path)
+
+    @property
+    def staged(self) -> List[Path]:
+        return list(self._staged)
+
+    def content(self, path: Path) -> str:
+        """The text staged for `path` (what this transaction writes, whatever is on disk later)."""
+        return self._staged[Path(path)].decode("utf-8")
+
+    def discard(self) -> None:
+        self._staged.clear()
+
+    def commit(self) -> Dict[str, List[str]]:
+        if self.committed:
+            raise RuntimeError("ArtifactTransaction already committed")
+
+        unchanged: List[str] = []
+        pending: List[Tuple[str, Path]] = []
+        try:
+            # phase 1: temp files next to their targets (same filesystem -> rename is atomic)
+            for path, data in self._staged.items():
+                if _same_content(path, data):
+                    unchanged.append(str(path))
+                    continue
+                path.parent.mkdir(parents=True, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+                pending.append((tmp, path))
+                with os.fdopen(fd, "wb") as f:
+                    # mkstemp creates 0600 and os.replace keeps it: give the file its normal mode
+                    os.fchmod(f.fileno(), _target_mode(path))
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+        except BaseException:
+            _unlink_all(tmp for tmp, _ in pending)
+            raise
+
+        # phase 2: publish
+        written: List[str] = []
+        try:
+            for tmp, path in pending:
+                os.replace(tmp, path)
+                written.append(str(path))
+        except BaseException:
+            # targets already replaced stay replaced; don't leave the rest as .tmp debris
+            _unlink_all(tmp for tmp, _ in pending[len(written):])
+            raise
+
+        self.committed = True
+        return {"written": written, "unchanged": unchanged}
+
+    def __enter__(self) -> "ArtifactTransaction":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.discard()
+        elif not self.committed:
+            self.commit()
+
+
+def write_if_changed(path: Path, content: str) -> bool:
+    """Single-file convenience wrapper. Returns True if the file was (re)written."""
+    txn = ArtifactTransaction()
+    txn.stage(path, content)
+    return bool(txn.commit()["written"])
+
@@ -0,0 +1,132 @@
+"""
+Compile contracts/ai_test_contracts.md into a minimal rule digest.
+
+The markdown is parsed into numbered sections of bullet rules (nested bullets
+are folded into their parent), whitespace/case duplicates are dropped, and each
+section is tagged with the pipeline stages that need it. The digest is cached
+on disk keyed by the contract checksum, so it is rebuilt only when the
+contracts change.
+
+  digest = load_digest(contracts_text, contract_checksum)
+  render_rules(digest, "gherkin")   # only the rules the strict Gherkin stage needs
+  render_rules(digest, "plan")      # steps + page object rules
+"""
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parent
+CACHE_DIR = REPO_ROOT / "generated" / "_cache"
+
+DIGEST_VERSION = 1
+
+# Which pipeline stages need a section, matched on the section title
+STAGE_KEYWORDS = {
+    "gherkin": ("gherkin", "feature"),
+    "plan": ("step", "page"),
+}
+
+# rag_docs entries that are copies of the contracts (see rag_build.py CONTRACTS_SOURCE)
+CONTRACT_RAG_DOCS = ("contracts.md",)
+
+_SECTION_RE = re.compile(r"^\s*(\d+)[\).]\s+(.*\S)\s*$")
+_BULLET_RE = re.compile(r"^(\s*)[-*]\s+(.*\S)\s*$")
+
+
+def _norm(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def parse_contracts(text: str) -> List[Dict[str, Any]]:
+    sections: List[Dict[str, Any]] = []
+    current: Optional[Dict[str, Any]] = None
+
+    for line in text.splitlines():
+        m = _SECTION_RE.match(line)
+        if m:
+            current = {"id": m.group(1), "title": m.group(2), "rules": []}
+            sections.append(current)
+            continue
+        b = _BULLET_RE.match(line)
+        if current is None:
+            continue
+        if not b:
+            # indented continuation line ("start with one of:\n  click, select, ...")
+            if line[:1] in (" ", "\t") and line.strip() and current["rules"]:
+                current["rules"][-1] += " " + line.strip()
+            continue
+        indent, body = len(b.group(1)), b.group(2)
+        if indent > 0 and current["rules"]:
+            # nested bullet: fold into the parent rule ("... lines: 1 Given, 1 When, 1 Then")
+            parent = current["rules"][-1]
+            joiner = " " if parent.endswith(":") else ", "
+            current["rules"][-1] = parent + joiner + body
+            continue
+        current["rules"].append(body)
+
+    return sections
+
+
+def _stages_for(title: str) -> List[str]:
+    t = title.lower()
+    return [stage for stage, kws in STAGE_KEYWORDS.items() if any(k in t for k in kws)]
+
+
+def compile_digest(text: str, checksum: str) -> Dict[str, Any]:
+    seen = set()
+    rules: List[Dict[str, Any]] = []
+    for sec in parse_contracts(text):
+        stages = _stages_for(sec["title"])
+        for i, body in enumerate(sec["rules"], start=1):
+            key = _norm(body)
+            if key in seen:
+                continue
+            seen.add(key)
+            rules.append({
+                "id": f"R{sec['id']}.{i}",
+                "section": sec["title"],
+                "stages": stages,
+                "text": body,
+            })
+    return {"digest_version": DIGEST_VERSION, "contract_checksum": checksum, "rules": rules}
+
+
+def _cache_path(checksum: str, cache_dir: Path = CACHE_DIR) -> Path:
+    return cache_dir / f"contract_digest_{checksum[:16]}.json"
+
+
+def load_digest(text: str, checksum: str, cache_dir: Path = CACHE_DIR) -> Dict[str, Any]:
+    path = _cache_path(checksum, cache_dir)
+    if path.exists():
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if data.get("digest_version") == DIGEST_VERSION and data.get("contract_checksum") == checksum:
+                return data
+        except (OSError, json.JSONDecodeError):
+            pass
+
+    data = compile_digest(text, checksum)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".contract_digest_", dir=str(cache_dir))
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+    return data
+
+
+def render_rules(digest: Dict[str, Any], stage: str) -> str:
+    """Compact rule list for one stage: '[R1.1] ...' per line."""
+    lines = [f"[{r['id']}] {r['text']}" for r in digest["rules"] if stage in r["stages"]]
+    return "\n".join(lines)
+
+
+def is_contract_chunk(doc_name: str) -> bool:
+    return doc_name in CONTRACT_RAG_DOCS
+
+
+def without_contract_chunks(rag_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop RAG hits that are copies of the contracts (the digest already carries them)."""
+    return [r for r in rag_results if not is_contract_chunk(r.get("doc", ""))]
@@ -1,9 +1,13 @@
-import json, re, subprocess, sys
+import argparse, json, os, re, sys
 from pathlib import Path
 import urllib.request
 
+import java_precheck
+import maven_runner
+
 API = "http://127.0.0.1:8000/v1/chat/completions"
 MODEL = "/workspace/models/deepseek-coder-v2-lite"
+PROJECT_DIR = "/workspace/selenium-poc"
 
 PROMPT = (
     "Generate a complete Java Selenium WebDriver JUnit5 test class named ExampleTest. "
@@ -22,34 +26,67 @@ payload = {
     "max_tokens": 1400,
 }
 
-req = urllib.request.Request(
-    API,
-    data=json.dumps(payload).encode("utf-8"),
-    headers={"Content-Type": "application/json"},
-    method="POST",
-)
 
-with urllib.request.urlopen(req, timeout=600) as r:
-    data = json.loads(r.read().decode("utf-8"))
+def generate_code() -> str:
+    req = urllib.request.Request(
+        API,
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+
+    with urllib.request.urlopen(req, timeout=600) as r:
+        data = json.loads(r.read().decode("utf-8"))
+
+    code = data["choices"][0]["message"]["content"].strip()
+
+    # Strip markdown fences if present
+    code = re.sub(r"^\s*```(?:java)?\s*\n", "", code, flags=re.IGNORECASE)
+    code = re.sub(r"\n\s*```\s*$", "", code)
+
+    # Strip accidental leading label line like "java"
+    if code.lower().startswith("java\n"):
+        code = code.split("\n", 1)[1].lstrip()
+
+    # Strip trailing stray dot
+    return code.rstrip().rstrip(".")
+
+
+def generate_and_run(runner: maven_runner.Runner) -> int:
+    code = generate_code()
+
+    test_path = Path(PROJECT_DIR) / "src/test/java/ExampleTest.java"
+    test_path.write_text(code + "\n", encoding="utf-8")
+    print(f"[OK] Wrote: {test_path} ({test_path.stat().st_size} bytes)")
+
+    # Reject broken sources here: a Maven run only to learn about a syntax error costs a JVM start
+    problems = java_precheck.check(test_path, code)
+    for line, rule, msg in problems:
+        print(f"JAVA PRECHECK FAILED: {test_path}:{line or '-'}: [{rule}] {msg}")
+    if problems:
+        return 1
 
-code = data["choices"][0]["message"]["content"].strip()
+    print(f"[RUN] ExampleTest via {runner.name}")
+    run = runner.run(["ExampleTest"], on_case=lambda c: print(f"[TEST] {c}", flush=True))
+    for err in run.compile_errors:
+        print(f"[COMPILE] {err}")
+    print(f"[{'OK' if run.ok else 'FAIL'}] tests={run.counts()['tests']} compiled={len(run.compiled)} "
+          f"compile_ms={run.compile_ms} elapsed_ms={run.elapsed_ms}")
+    return 0 if run.ok else 1
 
-# Strip markdown fences if present
-code = re.sub(r"^\s*```(?:java)?\s*\n", "", code, flags=re.IGNORECASE)
-code = re.sub(r"\n\s*```\s*$", "", code)
 
-# Strip accidental leading label line like "java"
-if code.lower().startswith("java\n"):
-    code = code.split("\n", 1)[1].lstrip()
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Generate a Selenium test with the local LLM and run it.")
+    ap.add_argument("--runner", default=os.getenv("TEST_RUNNER", "auto"), choices=("auto", "mvn", "mvnd", "warm"))
+    ap.add_argument("--iterations", "-n", type=int, default=1, help="generate + run N times on the same (warm) runner")
+    args = ap.parse_args()
 
-# Strip trailing stray dot
-code = code.rstrip().rstrip(".")
+    rc = 0
+    with maven_runner.make_runner(PROJECT_DIR, args.runner, on_output=print) as runner:
+        for _ in range(args.iterations):
+            rc = generate_and_run(runner) or rc
+    return rc
 
-test_path = Path("/workspace/selenium-poc/src/test/java/ExampleTest.java")
-test_path.write_text(code + "\n", encoding="utf-8")
-print(f"[OK] Wrote: {test_path} ({test_path.stat().st_size} bytes)")
 
-cmd = ["mvn", "-q", "-Dtest=ExampleTest", "test"]
-print("[RUN]", " ".join(cmd))
-p = subprocess.run(cmd, cwd="/workspace/selenium-poc")
-sys.exit(p.returncode)
+if __name__ == "__main__":
+    sys.exit(main())
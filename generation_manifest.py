@@ -0,0 +1,122 @@
+"""
+Per-task generation manifest for skip-if-unchanged regeneration.
+
+A manifest records the input fingerprint of a generation run
+(task, contract checksum, RAG context hash, PROMPT_VERSION, model) and the
+sha256 of every artifact it wrote. If a rerun computes the same fingerprint
+and the artifacts on disk still hash the same, the LLM calls are skipped.
+
+Layout: generated/_manifests/<task_slug>_<task_sha10>.json
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parent
+MANIFEST_DIR = REPO_ROOT / "generated" / "_manifests"
+
+MANIFEST_VERSION = 1
+
+# check_manifest() statuses
+HIT = "hit"
+MISS = "miss"                  # no manifest for this task
+INPUTS_CHANGED = "inputs_changed"
+OUTPUTS_CHANGED = "outputs_changed"  # artifact edited/deleted since it was generated
+
+
+def _sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def sha256_file(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _slug(text: str) -> str:
+    s = re.sub(r"[^a-z0-9]+", "_", text.strip().lower()).strip("_")
+    return s[:80] or "task"
+
+
+def manifest_path(task: str, manifest_dir: Path = MANIFEST_DIR) -> Path:
+    return manifest_dir / f"{_slug(task)}_{_sha256_text(task)[:10]}.json"
+
+
+def input_fingerprint(task: str, contract_checksum: str, rag_context_hash: str, prompt_version: str, model: str) -> Dict[str, str]:
+    inputs = {
+        "task": task,
+        "contract_checksum": contract_checksum,
+        "rag_context_hash": rag_context_hash,
+        "prompt_version": prompt_version,
+        "model": model,
+    }
+    inputs["fingerprint"] = _sha256_text(json.dumps(inputs, sort_keys=True))
+    return inputs
+
+
+def load_manifest(task: str, manifest_dir: Path = MANIFEST_DIR) -> Optional[Dict[str, Any]]:
+    path = manifest_path(task, manifest_dir)
+    if not path.exists():
+        return None
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+    if data.get("manifest_version") != MANIFEST_VERSION:
+        return None
+    return data
+
+
+def outputs_unchanged(outputs: Dict[str, str]) -> bool:
+    for p, digest in outputs.items():
+        path = Path(p)
+        if not path.exists() or sha256_file(path) != digest:
+            return False
+    return bool(outputs)
+
+
+def read_outputs(outputs: Dict[str, str]) -> Optional[Dict[str, str]]:
+    """Contents of the recorded outputs, or None if any is gone or no longer hashes the same."""
+    contents: Dict[str, str] = {}
+    for p, digest in outputs.items():
+        try:
+            data = Path(p).read_bytes()
+        except OSError:
+            return None
+        if hashlib.sha256(data).hexdigest() != digest:
+            return None
+        contents[p] = data.decode("utf-8")
+    return contents or None
+
+
+def check_manifest(task: str, inputs: Dict[str, str], manifest_dir: Path = MANIFEST_DIR) -> Tuple[str, Optional[Dict[str, Any]]]:
+    manifest = load_manifest(task, manifest_dir)
+    if manifest is None:
+        return MISS, None
+    if manifest.get("inputs", {}).get("fingerprint") != inputs["fingerprint"]:
+        return INPUTS_CHANGED, manifest
+    if not outputs_unchanged(manifest.get("outputs", {})):
+        return OUTPUTS_CHANGED, manifest
+    return HIT, manifest
+
+
+def write_manifest(task: str, inputs: Dict[str, str], output_paths: Iterable[Path], meta: Dict[str, Any], manifest_dir: Path = MANIFEST_DIR) -> Path:
+    manifest_dir.mkdir(parents=True, exist_ok=True)
+    path = manifest_path(task, manifest_dir)
+    data = {
+        "manifest_version": MANIFEST_VERSION,
+        "updated_utc": datetime.now(timezone.utc).isoformat(),
+        "inputs": inputs,
+        "outputs": {str(p): sha256_file(Path(p)) for p in output_paths},
+        "meta": meta,
+    }
+    # temp + rename so a crash never leaves a truncated manifest behind
+    fd, tmp = tempfile.mkstemp(prefix=".manifest_", dir=str(manifest_dir))
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,295 @@
+"""
+Resident generation service.
+
+Keeps env, the FAISS retriever + embedding model, the contracts and the
+backend HTTP connections warm, and exposes the llm_generate pipeline over HTTP:
+
+  POST /generate   {"task": "...", "validate": true, "force": false, "candidates": 1}
+  POST /testcase   {"task": "..."}
+  GET  /metrics    queue depth, in-flight, stage latency percentiles
+  GET  /health
+
+Usage:
+  python generation_service.py --port 8765 --workers 4 --max-queue 32
+"""
+import os
+# Must be set before any HF tokenizers / sentence-transformers usage to avoid fork warnings
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import llm_generate
+import run_ledger
+import validate_artifacts
+from rag.retrieve import warm_up
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_QUEUE = 32
+LATENCY_WINDOW = 500
+
+
+class QueueFull(Exception):
+    pass
+
+
+# =========================
+# Metrics
+# =========================
+class ServiceMetrics:
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        self._lock = threading.Lock()
+        self._window = window
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.started_at = time.time()
+        self._stages: Dict[str, Deque[float]] = {}
+
+    def observe(self, stage: str, ms: float) -> None:
+        with self._lock:
+            self._stages.setdefault(stage, deque(maxlen=self._window)).append(ms)
+
+    def observe_many(self, timings: Dict[str, float]) -> None:
+        for k, v in (timings or {}).items():
+            self.observe(k, float(v))
+
+    @staticmethod
+    def _pct(sorted_vals: List[float], p: float) -> float:
+        if not sorted_vals:
+            return 0.0
+        i = min(len(sorted_vals) - 1, int(round(p / 100.0 * (len(sorted_vals) - 1))))
+        return round(sorted_vals[i], 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {}
+            for name, vals in self._stages.items():
+                sv = sorted(vals)
+                stages[name] = {
+                    "count": len(sv),
+                    "p50_ms": self._pct(sv, 50),
+                    "p95_ms": self._pct(sv, 95),
+                    "max_ms": round(sv[-1], 1) if sv else 0.0,
+                }
+            return {
+                "uptime_s": round(time.time() - self.started_at, 1),
+                "queue_depth": self.queued,
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "stages": stages,
+            }
+
+
+# =========================
+# Worker pool
+# =========================
+class GenerationService:
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_queue: int = DEFAULT_MAX_QUEUE) -> None:
+        self.workers = workers
+        self.max_queue = max_queue
+        self.metrics = ServiceMetrics()
+        self.models: List[str] = []
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gen")
+        self._admit = threading.Lock()
+
+    def start(self, probe_backend: bool = True) -> None:
+        llm_generate.ensure_env()
+        # keep-alive pooled connections instead of one curl process per call
+        os.environ.setdefault("LOCAL_LLM_HTTP", "session")
+
+        t0 = time.perf_counter()
+        warm_up()
+        llm_generate.load_contracts()
+        self.metrics.observe("warm_up", (time.perf_counter() - t0) * 1000)
+
+        if probe_backend:
+            self.models = llm_generate.list_models()
+            print("LOCAL_LLM_READY: /v1/models OK")
+            print("MODELS:", self.models[:5], "..." if len(self.models) > 5 else "")
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+    def submit(self, fn: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        with self._admit:
+            backlog = self.metrics.queued + self.metrics.in_flight
+            if backlog >= self.workers + self.max_queue:
+                self.metrics.rejected += 1
+                raise QueueFull(f"queue full ({backlog} pending)")
+            self.metrics.queued += 1
+
+        enqueued = time.perf_counter()
+
+        def run() -> Dict[str, Any]:
+            with self._admit:
+                self.metrics.queued -= 1
+                self.metrics.in_flight += 1
+            self.metrics.observe("queue_wait", (time.perf_counter() - enqueued) * 1000)
+            ok = False
+            try:
+                out = fn()
+                ok = True
+                return out
+            finally:
+                with self._admit:
+                    self.metrics.in_flight -= 1
+                    if ok:
+                        self.metrics.completed += 1
+                    else:
+                        self.metrics.failed += 1
+
+        return self._pool.submit(run).result()
+
+    # ---- jobs ----
+    def generate(self, task: str, validate: bool = True, force: bool = False, candidates: int = llm_generate.DEFAULT_CANDIDATES) -> Dict[str, Any]:
+        # contents as this run produced them: with workers > 1 another task mapping to the
+        # same feature/class names may rewrite the files before we could read them back
+        artifacts: Dict[str, str] = {}
+        meta = llm_generate.generate(task, verbose=False, force=force, candidates=candidates, artifacts=artifacts)
+        self.metrics.observe_many(meta.get("timings_ms", {}))
+
+        out: Dict[str, Any] = {"meta": meta, "artifacts": artifacts}
+        if validate:
+            t0 = time.perf_counter()
+            # the contents are already in memory: validate them without touching disk again
+            report = validate_artifacts.validate_contents({meta[k]: artifacts[k] for k in artifacts})
+            self.metrics.observe("validate", (time.perf_counter() - t0) * 1000)
+            run_ledger.set_valid([meta["run_id"]], report.ok)
+            if report.ok:
+                llm_generate.index_valid_plans([meta], [meta["run_id"]])
+            out["validation"] = {
+                "passed": report.ok,
+                "violations": [v.to_dict() for v in report.violations],
+            }
+        return out
+
+    def testcase(self, task: str) -> Dict[str, Any]:
+        from testcase_generate import generate_testcase
+
+        t0 = time.perf_counter()
+        try:
+            out = generate_testcase(task)
+        except SystemExit as e:
+            # the CLI-oriented generator exits (e.g. RAG_EMPTY); that must not kill the worker/request thread
+            raise RuntimeError(f"testcase generation aborted: {e.code}") from None
+        self.metrics.observe("testcase", (time.perf_counter() - t0) * 1000)
+        return out
+
+
+# =========================
+# HTTP
+# =========================
+def make_handler(service: GenerationService):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt: str, *args: Any) -> None:
+            if os.getenv("GEN_SERVICE_DEBUG", "0") == "1":
+                super().log_message(fmt, *args)
+
+        def _send(self, code: int, body: Dict[str, Any]) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _read_json(self) -> Dict[str, Any]:
+            n = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(n) if n else b""
+            return json.loads(raw.decode("utf-8")) if raw else {}
+
+        def do_GET(self) -> None:
+            if self.path == "/metrics":
+                self._send(200, service.metrics.snapshot())
+            elif self.path == "/health":
+                self._send(200, {"ok": True, "models": service.models[:5]})
+            else:
+                self._send(404, {"error": f"unknown path {self.path}"})
+
+        def do_POST(self) -> None:
+            try:
+                body = self._read_json()
+            except (ValueError, UnicodeDecodeError) as e:
+                self._send(400, {"error": f"invalid JSON body: {e}"})
+                return
+            if not isinstance(body, dict):
+                self._send(400, {"error": "JSON body must be an object"})
+                return
+
+            task = str(body.get("task") or "").strip()
+            if not task:
+                self._send(400, {"error": "missing 'task'"})
+                return
+
+            if self.path == "/generate":
+                job = lambda: service.generate(
+                    task,
+                    validate=bool(body.get("validate", True)),
+                    force=bool(body.get("force", False)),
+                    candidates=int(body.get("candidates") or llm_generate.DEFAULT_CANDIDATES),
+                )
+            elif self.path == "/testcase":
+                job = lambda: service.testcase(task)
+            else:
+                self._send(404, {"error": f"unknown path {self.path}"})
+                return
+
+            t0 = time.perf_counter()
+            try:
+                out = service.submit(job)
+            except QueueFull as e:
+                self._send(503, {"error": str(e)})
+                return
+            except Exception as e:
+                self._send(500, {"error": f"{type(e).__name__}: {e}"})
+                return
+            out["service_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            self._send(200, out)
+
+    return Handler
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Resident llm_generate service.")
+    ap.add_argument("--host", default=DEFAULT_HOST)
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="concurrent generations")
+    ap.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE, help="waiting requests before 503")
+    ap.add_argument("--no-probe", action="store_true", help="skip /v1/models probe at startup")
+    args = ap.parse_args(argv)
+
+    service = GenerationService(workers=args.workers, max_queue=args.max_queue)
+    service.start(probe_backend=not args.no_probe)
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    server.daemon_threads = True
+    print(f"GEN_SERVICE_LISTENING: http://{args.host}:{args.port} workers={args.workers} max_queue={args.max_queue}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,396 @@
+"""
+Single-pass Gherkin tokenizer/parser.
+
+One scan over the lines produces a typed AST with 1-based line numbers:
+
+  GherkinDocument
+    feature: Feature(name, tags, description, background, scenarios)
+      background: Background(steps)
+      scenarios: [Scenario(keyword, name, tags, steps, examples, rule)]
+        examples: [Examples(name, tags, header, rows)]
+    counts:  keyword -> number of lines (Feature, Scenario, Given, And, ...)
+    errors:  [(line, message)] for lines that fit nowhere
+    comments
+
+Steps keep their literal keyword ("And") plus the effective one ("Given" after
+a Given) and any attached data table / doc string. Rule blocks are flattened:
+their scenarios carry `rule`.
+
+Input can be a string or any iterable of lines (e.g. an open file), so large
+suites are parsed without building intermediate line lists. parse() results for
+the same text are cached; treat the AST as read-only.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+STEP_KEYWORDS = ("Given", "When", "Then", "And", "But", "*")
+SCENARIO_KEYWORDS = ("Scenario Outline", "Scenario Template", "Scenario", "Example")
+EXAMPLES_KEYWORDS = ("Examples", "Scenarios")
+
+_HEADER_RE = re.compile(
+    r"^(Feature|Rule|Background|Scenario Outline|Scenario Template|Scenario|Example|Examples|Scenarios):\s*(.*)$"
+)
+_STEP_RE = re.compile(r"^(Given|When|Then|And|But|\*)(?:\s+(.*)|$)")
+_PLACEHOLDER_RE = re.compile(r"<([^<>]+)>")
+
+
+class Step:
+    __slots__ = ("keyword", "effective_keyword", "text", "line", "table", "doc_string")
+
+    def __init__(self, keyword: str, effective_keyword: str, text: str, line: int) -> None:
+        self.keyword = keyword
+        # And/But/* resolved to the Given/When/Then they continue
+        self.effective_keyword = effective_keyword
+        self.text = text
+        self.line = line
+        self.table: List[List[str]] = []
+        self.doc_string: Optional[DocString] = None
+
+    def __str__(self) -> str:
+        return f"{self.keyword} {self.text}"
+
+    def __repr__(self) -> str:
+        return f"Step({self.keyword!r}, {self.text!r}, line={self.line})"
+
+
+class DocString:
+    __slots__ = ("delimiter", "media_type", "content", "line")
+
+    def __init__(self, delimiter: str, media_type: str, line: int) -> None:
+        self.delimiter = delimiter
+        self.media_type = media_type
+        self.content = ""
+        self.line = line
+
+
+class Examples:
+    __slots__ = ("keyword", "name", "line", "tags", "header", "rows", "row_lines")
+
+    def __init__(self, keyword: str, name: str, line: int, tags: List[str]) -> None:
+        self.keyword = keyword
+        self.name = name
+        self.line = line
+        self.tags = tags
+        self.header: List[str] = []
+        self.rows: List[List[str]] = []
+        self.row_lines: List[int] = []
+
+
+class Background:
+    __slots__ = ("name", "line", "description", "steps")
+
+    def __init__(self, name: str, line: int) -> None:
+        self.name = name
+        self.line = line
+        self.description: List[Tuple[int, str]] = []
+        self.steps: List[Step] = []
+
+
+class Scenario:
+    __slots__ = ("keyword", "name", "line", "tags", "description", "steps", "examples", "rule")
+
+    def __init__(self, keyword: str, name: str, line: int, tags: List[str], rule: Optional[str]) -> None:
+        self.keyword = keyword
+        self.name = name
+        self.line = line
+        self.tags = tags
+        self.description: List[Tuple[int, str]] = []
+        self.steps: List[Step] = []
+        self.examples: List[Examples] = []
+        self.rule = rule
+
+    @property
+    def is_outline(self) -> bool:
+        return self.keyword in ("Scenario Outline", "Scenario Template") or bool(self.examples)
+
+    def __repr__(self) -> str:
+        return f"Scenario({self.keyword!r}, {self.name!r}, line={self.line}, steps={len(self.steps)})"
+
+
+class Feature:
+    __slots__ = ("name", "line", "tags", "description", "background", "scenarios")
+
+    def __init__(self, name: str, line: int, tags: List[str]) -> None:
+        self.name = name
+        self.line = line
+        self.tags = tags
+        self.description: List[Tuple[int, str]] = []
+        self.background: Optional[Background] = None
+        self.scenarios: List[Scenario] = []
+
+
+class GherkinDocument:
+    def __init__(self) -> None:
+        self.feature: Optional[Feature] = None
+        self.comments: List[Tuple[int, str]] = []
+        self.errors: List[Tuple[int, str]] = []
+        self.counts: Dict[str, int] = {}
+        # first non-blank, non-comment, non-tag line (header checks)
+        self.first_line: Optional[Tuple[int, str]] = None
+
+    @property
+    def scenarios(self) -> List[Scenario]:
+        return self.feature.scenarios if self.feature else []
+
+    def steps(self) -> Iterator[Step]:
+        if self.feature is None:
+            return
+        if self.feature.background:
+            yield from self.feature.background.steps
+        for sc in self.feature.scenarios:
+            yield from sc.steps
+
+    def expanded_steps(self) -> Iterator[Tuple[Step, str]]:
+        """
+        (step, text) as Cucumber matches them: background steps once, Scenario
+        Outline steps once per Examples row with <placeholders> substituted.
+        """
+        if self.feature is None:
+            return
+        if self.feature.background:
+            for st in self.feature.background.steps:
+                yield st, st.text
+        for sc in self.feature.scenarios:
+            rows = [(ex.header, r) for ex in sc.examples for r in ex.rows]
+            if not rows:
+                for st in sc.steps:
+                    yield st, st.text
+                continue
+            for header, row in rows:
+                values = dict(zip(header, row))
+                for st in sc.steps:
+                    yield st, _PLACEHOLDER_RE.sub(lambda m: values.get(m.group(1), m.group(0)), st.text)
+
+    def scenario_texts(self, sc: Scenario) -> List[str]:
+        """Step texts one scenario runs: background first, outline rows expanded."""
+        texts = [st.text for st in self.feature.background.steps] if self.feature and self.feature.background else []
+        rows = [dict(zip(ex.header, r)) for ex in sc.examples for r in ex.rows] or [{}]
+        for values in rows:
+            texts += [_PLACEHOLDER_RE.sub(lambda m: values.get(m.group(1), m.group(0)), st.text) for st in sc.steps]
+        return texts
+
+    def free_text(self) -> List[Tuple[int, str]]:
+        """Description lines plus lines that fit nowhere, in file order."""
+        out = list(self.errors)
+        if self.feature:
+            out += self.feature.description
+            if self.feature.background:
+                out += self.feature.background.description
+            for sc in self.feature.scenarios:
+                out += sc.description
+        return sorted(out)
+
+
+# =========================
+# Tokenizer
+# =========================
+# (kind, line_no, keyword, text, raw line)
+Token = Tuple[str, int, str, str, str]
+
+
+def tokenize(lines: Iterable[str]) -> Iterator[Token]:
+    """
+    Classify each line on its own. Kinds: empty, comment, tags, header, step,
+    row, docstring (triple-quote or triple-backtick delimiter), other. Whether a
+    delimiter opens a doc string depends on context, so the parser decides that.
+    """
+    for n, raw in enumerate(lines, start=1):
+        line = raw.rstrip("\r\n")
+        s = line.strip()
+        if not s:
+            yield ("empty", n, "", "", line)
+        elif s.startswith('"""') or s.startswith("```"):
+            yield ("docstring", n, s[:3], s[3:].strip(), line)
+        elif s.startswith("#"):
+            yield ("comment", n, "", s, line)
+        elif s.startswith("@"):
+            yield ("tags", n, "", s, line)
+        elif s.startswith("|"):
+            yield ("row", n, "", s, line)
+        else:
+            m = _HEADER_RE.match(s)
+            if m:
+                yield ("header", n, m.group(1), m.group(2).strip(), line)
+                continue
+            m = _STEP_RE.match(s)
+            if m:
+                yield ("step", n, m.group(1), (m.group(2) or "").strip(), line)
+            else:
+                yield ("other", n, "", s, line)
+
+
+def _cells(row: str) -> List[str]:
+    body = row.strip()
+    if body.startswith("|"):
+        body = body[1:]
+    if body.endswith("|"):
+        body = body[:-1]
+    return [c.strip().replace("\\|", "|") for c in re.split(r"(?<!\\)\|", body)]
+
+
+# =========================
+# Parser
+# =========================
+def parse_lines(lines: Iterable[str]) -> GherkinDocument:
+    doc = GherkinDocument()
+    counts = doc.counts
+    feature: Optional[Feature] = None
+    rule: Optional[str] = None
+    block: Union[None, Background, Scenario] = None
+    examples: Optional[Examples] = None
+    step: Optional[Step] = None
+    last_effective = "Given"
+    pending_tags: List[str] = []
+    doc_string: Optional[DocString] = None
+    doc_lines: List[str] = []
+    doc_indent = 0
+    # description text is only valid right after a header, before any step/table
+    describing: Optional[List[Tuple[int, str]]] = None
+
+    for kind, n, kw, text, raw in tokenize(lines):
+        if doc_string is not None:
+            if kind == "docstring" and kw == doc_string.delimiter:
+                doc_string.content = "\n".join(doc_lines)
+                doc_string, doc_lines = None, []
+            else:
+                # content is dedented to the opening delimiter's column
+                pad = len(raw) - len(raw.lstrip(" "))
+                doc_lines.append(raw[min(pad, doc_indent):])
+            continue
+        if kind == "empty":
+            continue
+        if kind == "comment":
+            doc.comments.append((n, text))
+            continue
+        if kind == "tags":
+            pending_tags.extend(t for t in text.split() if t.startswith("@"))
+            continue
+
+        if doc.first_line is None:
+            doc.first_line = (n, raw.strip())
+
+        if kind == "header":
+            counts[kw] = counts.get(kw, 0) + 1
+            tags, pending_tags = pending_tags, []
+            step = None
+            if kw == "Feature":
+                if feature is not None:
+                    doc.errors.append((n, "Only one Feature per file"))
+                    continue
+                feature = doc.feature = Feature(text, n, tags)
+                describing = feature.description
+                continue
+            if feature is None:
+                doc.errors.append((n, f"{kw}: before Feature:"))
+                describing = None
+                continue
+            if kw == "Rule":
+                rule, block, examples, describing = text, None, None, None
+            elif kw == "Background":
+                block = feature.background = Background(text, n)
+                examples, describing, last_effective = None, block.description, "Given"
+            elif kw in SCENARIO_KEYWORDS:
+                block = Scenario(kw, text, n, tags, rule)
+                feature.scenarios.append(block)
+                examples, describing, last_effective = None, block.description, "Given"
+            else:  # Examples / Scenarios
+                if not isinstance(block, Scenario):
+                    doc.errors.append((n, f"{kw}: outside a Scenario Outline"))
+                    describing = None
+                    continue
+                examples = Examples(kw, text, n, tags)
+                block.examples.append(examples)
+                describing = None
+            continue
+
+        if kind == "step":
+            counts[kw] = counts.get(kw, 0) + 1
+            describing = None
+            if block is None or examples is not None:
+                doc.errors.append((n, f"Step outside a Scenario/Background: {kw} {text}".rstrip()))
+                step = None
+                continue
+            effective = last_effective if kw in ("And", "But", "*") else kw
+            last_effective = effective
+            step = Step(kw, effective, text, n)
+            block.steps.append(step)
+            continue
+
+        if kind == "row":
+            describing = None
+            if examples is not None:
+                if not examples.header:
+                    examples.header = _cells(text)
+                else:
+                    examples.rows.append(_cells(text))
+                    examples.row_lines.append(n)
+            elif step is not None:
+                step.table.append(_cells(text))
+            else:
+                doc.errors.append((n, "Table row without a step or Examples"))
+            continue
+
+        if kind == "docstring":
+            describing = None
+            if step is not None and step.doc_string is None:
+                doc_string = step.doc_string = DocString(kw, text, n)
+                doc_lines = []
+                doc_indent = len(raw) - len(raw.lstrip(" "))
+            else:
+                # e.g. a markdown fence around model output: report it, don't swallow what follows
+                doc.errors.append((n, f"Doc string delimiter without a step: {raw.strip()}"))
+            continue
+
+        # other: free text
+        if describing is not None:
+            describing.append((n, text))
+        else:
+            doc.errors.append((n, f"Unexpected line: {text}"))
+
+    if doc_string is not None:
+        doc_string.content = "\n".join(doc_lines)
+        doc.errors.append((doc_string.line, "Unterminated doc string"))
+    return doc
+
+
+@lru_cache(maxsize=64)
+def parse(text: str) -> GherkinDocument:
+    return parse_lines(text.splitlines())
+
+
+def parse_file(path: str) -> GherkinDocument:
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_lines(f)
+
+
+# =========================
+# Strict 1 Given / 1 When / 1 Then helpers
+# =========================
+def strict_lines(doc: GherkinDocument) -> Optional[Tuple[str, str, str, str, str]]:
+    """
+    (Feature, Scenario, Given, When, Then) lines of the strict shape: the first
+    plain Scenario and the first literal Given/When/Then from it onwards.
+    None when any of them is missing.
+    """
+    if doc.feature is None:
+        return None
+    scenarios = doc.feature.scenarios
+    start = next((i for i, sc in enumerate(scenarios) if sc.keyword == "Scenario"), None)
+    if start is None:
+        return None
+
+    found: Dict[str, str] = {}
+    for sc in scenarios[start:]:
+        for st in sc.steps:
+            if st.keyword in ("Given", "When", "Then") and st.keyword not in found:
+                found[st.keyword] = str(st)
+        if len(found) == 3:
+            break
+    if len(found) != 3:
+        return None
+    return (
+        f"Feature: {doc.feature.name}".rstrip(),
+        f"Scenario: {scenarios[start].name}".rstrip(),
+        found["Given"], found["When"], found["Then"],
+    )
@@ -0,0 +1,531 @@
+"""
+Fast Java structure pre-check for generated page objects and steps classes.
+
+A single regex-driven lexer pass plus a declaration-level parser (no method
+bodies) catches what otherwise costs a Maven/javac round trip:
+
+  java-syntax            bad tokens (markdown fences, unterminated strings or
+                         comments), unbalanced brackets, malformed package/
+                         import/type/member declarations
+  java-package           package declaration does not match the file's directory
+  java-class-name        public top-level type not named after the file
+  java-duplicate-method  same method name + erased parameter types twice in a type
+  java-page-import       a page class is referenced but neither imported nor in
+                         the same package
+
+    problems = check("generated/steps/CancelOrderSteps.java", text, page_classes={"OrderPage"})
+    # [(line, rule, message), ...]
+
+parse() results are cached per text; treat JavaUnit as read-only. validate_artifacts
+runs these checks for every steps/page file (parallel + cached there).
+
+  python java_precheck.py [files...] [-j 4]
+"""
+import argparse
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
+
+Problem = Tuple[Optional[int], str, str]
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<nl>\n)
+  | (?P<ws>[ \t\r\f]+)
+  | (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<bad_comment>/\*)
+  | (?P<text_block>\"\"\"[ \t\f]*\n.*?(?<!\\)\"\"\")
+  | (?P<string>"(?:[^"\\\n]|\\.)*")
+  | (?P<bad_string>"[^\n]*)
+  | (?P<char>'(?:[^'\\\n]|\\.)+')
+  | (?P<ident>[A-Za-z_$][\w$]*)
+  | (?P<number>(?:\d|\.\d)[\w.]*(?:[eEpP][-+]\d+)?)
+  | (?P<op>->|::|\.\.\.|[{}()\[\];,.@=<>!~?:&|+\-*/%^])
+  | (?P<other>.)
+    """,
+    re.S | re.X,
+)
+
+REPO_ROOT = Path(__file__).resolve().parent
+
+TYPE_KEYWORDS = ("class", "interface", "enum", "record")
+MODIFIERS = {
+    "public", "protected", "private", "static", "final", "abstract", "native",
+    "synchronized", "transient", "volatile", "strictfp", "default", "sealed", "non",
+}
+_OPEN = {"(": ")", "[": "]", "{": "}"}
+_CLOSE = {v: k for k, v in _OPEN.items()}
+
+
+class Token:
+    __slots__ = ("kind", "value", "line")
+
+    def __init__(self, kind: str, value: str, line: int) -> None:
+        self.kind = kind
+        self.value = value
+        self.line = line
+
+    def __repr__(self) -> str:
+        return f"Token({self.kind}, {self.value!r}, {self.line})"
+
+
+class Method:
+    __slots__ = ("name", "params", "line")
+
+    def __init__(self, name: str, params: Tuple[str, ...], line: int) -> None:
+        self.name = name
+        self.params = params
+        self.line = line
+
+    @property
+    def signature(self) -> str:
+        return f"{self.name}({', '.join(self.params)})"
+
+
+class TypeDecl:
+    __slots__ = ("kind", "name", "line", "public", "methods", "types")
+
+    def __init__(self, kind: str, name: str, line: int, public: bool) -> None:
+        self.kind = kind
+        self.name = name
+        self.line = line
+        self.public = public
+        self.methods: List[Method] = []
+        self.types: List["TypeDecl"] = []
+
+
+class JavaUnit:
+    def __init__(self) -> None:
+        self.package: Optional[str] = None
+        self.package_line: Optional[int] = None
+        # (qualified name, static, line); wildcard imports end in ".*"
+        self.imports: List[Tuple[str, bool, int]] = []
+        self.types: List[TypeDecl] = []
+        # simple type-like names (Capitalized, unqualified) used outside package/import -> first line
+        self.referenced: Dict[str, int] = {}
+        self.errors: List[Tuple[int, str]] = []
+
+    def all_types(self) -> Iterable[TypeDecl]:
+        stack = list(self.types)
+        while stack:
+            t = stack.pop(0)
+            yield t
+            stack.extend(t.types)
+
+
+# =========================
+# Lexer
+# =========================
+def tokenize(text: str) -> Tuple[List[Token], List[Tuple[int, str]]]:
+    """Significant tokens (no whitespace/comments) and lexical errors."""
+    tokens: List[Token] = []
+    errors: List[Tuple[int, str]] = []
+    line = 1
+    for m in _TOKEN_RE.finditer(text):
+        kind = m.lastgroup
+        value = m.group()
+        if kind == "nl":
+            line += 1
+            continue
+        if kind in ("ws", "comment", "text_block", "string", "char"):
+            if kind not in ("ws", "comment"):
+                tokens.append(Token("literal", value, line))
+        elif kind == "bad_comment":
+            errors.append((line, "Unterminated block comment"))
+            break
+        elif kind == "bad_string":
+            errors.append((line, "Unterminated string literal"))
+        elif kind == "other":
+            if not errors or errors[-1][0] != line:  # one report per line (e.g. a ``` fence)
+                errors.append((line, f"Unexpected character {value!r}"))
+        else:
+            tokens.append(Token(kind, value, line))
+        line += value.count("\n")
+    return tokens, errors
+
+
+def _match_brackets(tokens: List[Token], errors: List[Tuple[int, str]]) -> Dict[int, int]:
+    """Index of every opening bracket -> index of its closing one (errors on imbalance)."""
+    pairs: Dict[int, int] = {}
+    stack: List[int] = []
+    for i, t in enumerate(tokens):
+        if t.kind != "op":
+            continue
+        if t.value in _OPEN:
+            stack.append(i)
+        elif t.value in _CLOSE:
+            if not stack or tokens[stack[-1]].value != _CLOSE[t.value]:
+                errors.append((t.line, f"Unbalanced '{t.value}'"))
+                return pairs
+            pairs[stack.pop()] = i
+    if stack:
+        opened = tokens[stack[-1]]
+        errors.append((opened.line, f"Unclosed '{opened.value}'"))
+    return pairs
+
+
+# =========================
+# Declaration parser
+# =========================
+class _Parser:
+    def __init__(self, tokens: List[Token], pairs: Dict[int, int], unit: JavaUnit) -> None:
+        self.t = tokens
+        self.pairs = pairs
+        self.unit = unit
+
+    def val(self, i: int) -> str:
+        return self.t[i].value if i < len(self.t) else ""
+
+    def error(self, i: int, msg: str) -> None:
+        line = self.t[min(i, len(self.t) - 1)].line if self.t else 1
+        self.unit.errors.append((line, msg))
+
+    def qualified(self, i: int, end: int) -> Tuple[str, int]:
+        # Name(.Name)*(.*)?
+        parts = []
+        while i < end and (self.t[i].kind == "ident" or (parts and self.val(i) == "*")):
+            parts.append(self.val(i))
+            i += 1
+            if self.val(i) != "." or parts[-1] == "*":
+                break
+            parts.append(".")
+            i += 1
+        return "".join(parts), i
+
+    def skip_annotation(self, i: int) -> int:
+        # @Name(.Name)* [( ... )]
+        i += 1
+        _, i = self.qualified(i, len(self.t))
+        if self.val(i) == "(" and i in self.pairs:
+            i = self.pairs[i] + 1
+        return i
+
+    def skip_modifiers(self, i: int, end: int) -> Tuple[int, Set[str]]:
+        mods: Set[str] = set()
+        while i < end:
+            v = self.val(i)
+            if v == "@" and self.val(i + 1) != "interface":
+                i = self.skip_annotation(i)
+            elif v in MODIFIERS:
+                mods.add(v)
+                i += 1
+                if v == "non" and self.val(i) == "-":  # non-sealed
+                    i += 2
+            else:
+                break
+        return i, mods
+
+    def compilation_unit(self) -> None:
+        i, n = 0, len(self.t)
+        seen_type = False
+        while i < n:
+            v = self.val(i)
+            if v == ";":
+                i += 1
+            elif v == "package" and not seen_type:
+                if self.unit.package is not None or self.unit.imports:
+                    self.error(i, "package declaration must come first")
+                name, j = self.qualified(i + 1, n)
+                self.unit.package, self.unit.package_line = name, self.t[i].line
+                i = self.expect_semicolon(j, "package declaration")
+            elif v == "import" and not seen_type:
+                static = self.val(i + 1) == "static"
+                name, j = self.qualified(i + 2 if static else i + 1, n)
+                if not name or name.endswith("."):
+                    self.error(i, "Malformed import")
+                self.unit.imports.append((name, static, self.t[i].line))
+                i = self.expect_semicolon(j, "import")
+            else:
+                j, mods = self.skip_modifiers(i, n)
+                decl, j = self.type_decl(j, n, mods)
+                if decl is None:
+                    self.error(j, f"Expected a class, interface, enum or record declaration, found '{self.val(j)}'")
+                    return
+                self.unit.types.append(decl)
+                seen_type = True
+                i = j
+
+    def expect_semicolon(self, i: int, what: str) -> int:
+        if self.val(i) != ";":
+            self.error(i, f"Missing ';' after {what}")
+            return i
+        return i + 1
+
+    def type_decl(self, i: int, end: int, mods: Set[str]) -> Tuple[Optional[TypeDecl], int]:
+        """Parses `class X ... { body }` starting at the keyword; returns (decl, index after body)."""
+        kind = self.val(i)
+        if kind == "@" and self.val(i + 1) == "interface":
+            kind, i = "@interface", i + 1
+        elif kind not in TYPE_KEYWORDS:
+            return None, i
+        if self.t[i + 1 : i + 2] and self.t[i + 1].kind == "ident":
+            decl = TypeDecl(kind, self.val(i + 1), self.t[i + 1].line, "public" in mods)
+        else:
+            self.error(i + 1, f"Expected a name after '{self.val(i)}'")
+            return TypeDecl(kind, "", self.t[i].line, False), end
+        j = i + 2
+        # type parameters, record header, extends/implements/permits
+        while j < end and self.val(j) != "{":
+            if self.val(j) in ("(", "[") and j in self.pairs:
+                j = self.pairs[j]
+            elif self.val(j) == ";":
+                break
+            j += 1
+        if self.val(j) != "{" or j not in self.pairs:
+            self.error(j, f"Expected '{{' to open {kind} {decl.name}")
+            return decl, end
+        close = self.pairs[j]
+        self.body(decl, j + 1, close)
+        return decl, close + 1
+
+    def body(self, decl: TypeDecl, i: int, end: int) -> None:
+        if decl.kind == "enum":
+            # constants (with optional args/bodies) up to the first top-level ';'
+            while i < end and self.val(i) != ";":
+                i = self.pairs.get(i, i) + 1
+            i += 1
+        while i < end:
+            v = self.val(i)
+            if v == ";":
+                i += 1
+                continue
+            if v == "{" or (v == "static" and self.val(i + 1) == "{"):
+                i = self.pairs.get(i if v == "{" else i + 1, end) + 1  # initializer block
+                continue
+            j, mods = self.skip_modifiers(i, end)
+            nested, k = self.type_decl(j, end, mods)
+            if nested is not None:
+                decl.types.append(nested)
+                i = k
+                continue
+            i = self.member(decl, j, end)
+
+    def member(self, decl: TypeDecl, i: int, end: int) -> int:
+        """Method, constructor or field declaration starting after its modifiers."""
+        j = i
+        while j < end and self.val(j) not in ("(", "=", ";", "{", "}"):
+            if self.val(j) == "[" and j in self.pairs:
+                j = self.pairs[j]
+            j += 1
+        stop = self.val(j)
+        if j == i or j >= end or stop in ("{", "}") or not (self.t[j - 1].kind == "ident" or self.val(j - 1) == "]"):
+            self.error(j if j < end else i, f"Unexpected '{self.val(j) if j < end else self.val(i)}' in {decl.kind} {decl.name}")
+            # resync after the next ';' or block
+            while j < end and self.val(j) not in (";", "{"):
+                j = self.pairs.get(j, j) + 1
+            return self.pairs.get(j, j) + 1 if j < end else end
+
+        if stop == "(":
+            close = self.pairs.get(j, end)
+            decl.methods.append(Method(self.val(j - 1), self._param_types(j + 1, close), self.t[j - 1].line))
+            k = close + 1
+            while k < end and self.val(k) not in ("{", ";"):
+                k += 1  # throws clause / annotation default value
+            if k >= end:
+                self.error(close, f"Expected a method body or ';' after {self.val(j - 1)}(...)")
+                return end
+            return self.pairs.get(k, k) + 1
+
+        # field(s): skip the initializer (may contain lambdas/array/anonymous class bodies)
+        k = j
+        while k < end and self.val(k) != ";":
+            k = self.pairs.get(k, k) + 1
+        if k >= end:
+            self.error(j - 1, f"Missing ';' after field {self.val(j - 1)}")
+            return end
+        return k + 1
+
+    def _param_types(self, i: int, end: int) -> Tuple[str, ...]:
+        params: List[List[str]] = [[]]
+        depth = 0
+        while i < end:
+            v = self.val(i)
+            if v == "@":
+                i = self.skip_annotation(i)
+                continue
+            if v == "<":
+                depth += 1
+            elif v == ">":
+                depth -= 1
+            elif v == "," and depth == 0:
+                params.append([])
+            elif depth == 0 and v != "final":
+                params[-1].append("[]" if v == "..." else v)
+            i += 1
+        # drop the parameter name; `int[] a` and `int a[]` are the same type
+        out = []
+        for p in params:
+            if not p:
+                continue
+            dims = p.count("[")
+            names = [x for x in p if x not in ("[", "]", "[]")]
+            out.append("".join(names[:-1] or names) + "[]" * (dims + p.count("[]")))
+        return tuple(out)
+
+
+@lru_cache(maxsize=256)
+def parse(text: str) -> JavaUnit:
+    unit = JavaUnit()
+    tokens, unit.errors = tokenize(text)
+    pairs = _match_brackets(tokens, unit.errors)
+
+    in_header = False
+    for i, t in enumerate(tokens):
+        if t.value in ("package", "import"):
+            in_header = True
+        elif in_header and t.value == ";":
+            in_header = False
+        elif (
+            not in_header and t.kind == "ident" and t.value[:1].isupper()
+            and (i == 0 or tokens[i - 1].value not in (".", "@"))
+        ):
+            unit.referenced.setdefault(t.value, t.line)
+
+    if not unit.errors:
+        # declarations are only meaningful when the brackets pair up
+        _Parser(tokens, pairs, unit).compilation_unit()
+    return unit
+
+
+# =========================
+# Checks
+# =========================
+def expected_package(path: Union[str, Path]) -> Optional[str]:
+    """
+    Package implied by the file's directory: the part after src/<set>/java/ for
+    Maven sources, from the last `generated` directory on for generated
+    artifacts (.../generated/pages -> generated.pages), otherwise the directory
+    relative to the repo root. Independent of the cwd; None when it cannot be
+    derived (a path outside the repo).
+    """
+    p = Path(path)
+    parts = p.parent.parts
+    if "java" in parts:
+        k = len(parts) - 1 - parts[::-1].index("java")
+        if k >= 2 and parts[k - 2] == "src":
+            return ".".join(parts[k + 1:])
+    if "generated" in parts:
+        k = len(parts) - 1 - parts[::-1].index("generated")
+        return ".".join(parts[k:])
+    try:
+        parts = p.parent.resolve().relative_to(REPO_ROOT).parts
+    except ValueError:
+        return None
+    return ".".join(parts)
+
+
+def check(
+    path: Union[str, Path],
+    text: str,
+    page_classes: Optional[Iterable[str]] = None,
+    pages_package: str = "generated.pages",
+) -> List[Problem]:
+    """All pre-check problems of one Java file as (line, rule, message)."""
+    unit = parse(text)
+    out: List[Problem] = [(n, "java-syntax", msg) for n, msg in unit.errors]
+    if unit.errors:
+        return out
+
+    path = Path(path)
+    want = expected_package(path)
+    got = unit.package or ""
+    if want is not None and got != want:
+        out.append((
+            unit.package_line or 1, "java-package",
+            f"package '{got or '(default)'}' does not match directory; expected '{want or '(default)'}'",
+        ))
+
+    stem = path.stem
+    top = [t for t in unit.types if t.name]
+    for t in top:
+        if t.public and t.name != stem:
+            out.append((t.line, "java-class-name", f"public {t.kind} {t.name} must be declared in {t.name}.java"))
+    if not any(t.name == stem for t in top):
+        out.append((top[0].line if top else 1, "java-class-name", f"{path.name} does not declare a type named {stem}"))
+
+    for t in unit.all_types():
+        seen: Dict[Tuple[str, Tuple[str, ...]], int] = {}
+        for m in t.methods:
+            key = (m.name, m.params)
+            if key in seen:
+                out.append((m.line, "java-duplicate-method",
+                            f"{t.name}.{m.signature} already declared at line {seen[key]}"))
+            else:
+                seen[key] = m.line
+
+    if page_classes is not None and got != pages_package:
+        declared = {t.name for t in unit.all_types()}
+        imported = {q.rsplit(".", 1)[-1] for q, static, _ in unit.imports if not static}
+        wildcard = any(q == f"{pages_package}.*" for q, static, _ in unit.imports if not static)
+        for name in sorted(set(page_classes) & set(unit.referenced)):
+            if name not in imported and name not in declared and not wildcard:
+                out.append((unit.referenced[name], "java-page-import",
+                            f"{name} is used but not imported (import {pages_package}.{name};)"))
+
+    return sorted(out, key=lambda p: p[0] or 0)
+
+
+@lru_cache(maxsize=256)
+def _page_classes(pages_dir: str, mtime_ns: int) -> FrozenSet[str]:
+    # mtime_ns only keys the cache: adding, removing or renaming a file bumps the directory mtime
+    try:
+        return frozenset(p.stem for p in Path(pages_dir).glob("*.java"))
+    except OSError:
+        return frozenset()
+
+
+def page_classes_near(path: Union[str, Path]) -> FrozenSet[str]:
+    """
+    Page class names in the pages/ directory next to a steps/ directory. The
+    listing is cached per directory (path + mtime), so a validation run scans
+    pages/ once instead of once per steps file.
+    """
+    pages_dir = Path(path).parent.parent / "pages"
+    try:
+        mtime_ns = pages_dir.stat().st_mtime_ns
+    except OSError:
+        return frozenset()
+    return _page_classes(str(pages_dir), mtime_ns)
+
+
+def check_file(path: str) -> List[Problem]:
+    try:
+        text = Path(path).read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError) as e:
+        return [(None, "readable", str(e))]
+    pages = page_classes_near(path) if Path(path).parent.name == "steps" else None
+    return check(path, text, page_classes=pages)
+
+
+def _check_chunk(paths: List[str]) -> List[List[Problem]]:
+    return [check_file(p) for p in paths]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Pre-check Java sources before compiling them.")
+    ap.add_argument("paths", nargs="*", help="default: generated/pages and generated/steps")
+    ap.add_argument("--jobs", "-j", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    paths = args.paths or [str(p) for d in ("generated/pages", "generated/steps") for p in sorted(Path(d).glob("*.java"))]
+    if args.jobs > 1 and len(paths) > 64:
+        chunks = [paths[i:i + 64] for i in range(0, len(paths), 64)]
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            results = [r for chunk in pool.map(_check_chunk, chunks) for r in chunk]
+    else:
+        results = _check_chunk(paths)
+
+    failed = 0
+    for path, problems in zip(paths, results):
+        for line, rule, msg in problems:
+            print(f"JAVA PRECHECK FAILED: {path}:{line or '-'}: [{rule}] {msg}")
+        failed += bool(problems)
+    print(f"FILES: {len(paths)} failed={failed}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
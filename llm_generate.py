@@ -7,17 +7,31 @@ import json
 import re
 import sys
 import subprocess
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Optional, Any, List, Tuple
+from typing import Callable, Dict, Optional, Any, List, Set, Tuple
 
-from rag.retrieve import retrieve  # your FAISS retriever
+from rag.retrieve import retrieve, warm_up  # your FAISS retriever
+import contract_compiler
+import generation_manifest
+import gherkin_parser
+import plan_cache
+from artifact_writer import ArtifactTransaction, write_if_changed
+from stage_dag import Stage, StageRunner
+from step_matcher import StepMatcher, extract_definitions
+import run_ledger
+import token_usage
+import validate_artifacts
 
 
 # =========================
 # Constants
 # =========================
-PROMPT_VERSION = "v1.1.1"
+PROMPT_VERSION = "v1.2.0"
 
 REPO_ROOT = Path(__file__).resolve().parent
 CONTRACT_PATH = REPO_ROOT / "contracts" / "ai_test_contracts.md"
@@ -31,6 +45,10 @@ META_PATH = GENERATED_DIR / "_meta.json"
 DEFAULT_MODEL = "deepseek-v2-lite-lora-merged"
 RAG_TOP_K = 3
 
+# digest: prompts carry only the compiled contract rules each stage needs (contract_compiler.py)
+# full:   prompts embed the raw contracts markdown (pre-v1.2.0 behaviour)
+CONTRACT_MODE = os.getenv("CONTRACT_MODE", "digest").strip().lower()
+
 # Keep in sync with validate_artifacts.py allowed prefixes
 ALLOWED_METHOD_PREFIXES = (
     "click", "select", "enter", "type", "set", "fill",
@@ -99,13 +117,22 @@ def sha256(text: str) -> str:
 # =========================
 def usage_exit() -> None:
     print('Usage: python llm_generate.py "Cancel pending order in Salesforce Order History"')
+    print('       python llm_generate.py --tasks-file stories.txt [--force] [--revalidate]')
     sys.exit(2)
 
 
+_CONTRACTS_CACHE: Tuple[float, str] = (-1.0, "")
+
+
 def load_contracts() -> str:
+    global _CONTRACTS_CACHE
     if not CONTRACT_PATH.exists():
         raise FileNotFoundError(f"Contract file not found: {CONTRACT_PATH}")
-    return CONTRACT_PATH.read_text(encoding="utf-8")
+    # cached by mtime so long-running callers don't re-read it per task
+    mtime = CONTRACT_PATH.stat().st_mtime
+    if _CONTRACTS_CACHE[0] != mtime:
+        _CONTRACTS_CACHE = (mtime, CONTRACT_PATH.read_text(encoding="utf-8"))
+    return _CONTRACTS_CACHE[1]
 
 
 def slugify(text: str) -> str:
@@ -127,16 +154,62 @@ def to_pascal_case(text: str) -> str:
 
 
 def extract_feature_name(gherkin_text: str) -> str:
-    for line in gherkin_text.splitlines():
-        line = line.strip()
-        if line.startswith("Feature:"):
-            return line[len("Feature:"):].strip() or "feature"
-    return "feature"
+    feature = gherkin_parser.parse(gherkin_text).feature
+    return (feature.name if feature else "") or "feature"
 
 
 # =========================
-# Cloudflare-safe HTTP (curl)
+# Cloudflare-safe HTTP (curl) / pooled session
 # =========================
+# LOCAL_LLM_HTTP=curl     (default) one curl process per call, works through Cloudflare proxies
+# LOCAL_LLM_HTTP=session  pooled keep-alive requests.Session per thread (used by generation_service.py)
+_HTTP_LOCAL = threading.local()
+
+
+def _http_session():
+    sess = getattr(_HTTP_LOCAL, "session", None)
+    if sess is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        sess = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        sess.mount("http://", adapter)
+        sess.mount("https://", adapter)
+        _HTTP_LOCAL.session = sess
+    return sess
+
+
+def _session_json(method: str, url: str, token: str, payload: Optional[Dict[str, Any]] = None, timeout: int = 90) -> Dict[str, Any]:
+    headers = {
+        "Accept": "application/json",
+        # same UA as tools/llm/local_client.py so Cloudflare lets it through
+        "User-Agent": "Mozilla/5.0 (compatible; DeepSeek-Test-Automation/1.0)",
+    }
+    if token.strip():
+        headers["Authorization"] = f"Bearer {token.strip()}"
+
+    try:
+        r = _http_session().request(method, url, headers=headers, json=payload, timeout=timeout)
+    except Exception as e:
+        raise RuntimeError(f"HTTP request failed for {url}: {e}") from e
+
+    out = (r.text or "").strip()
+    if r.status_code != 200:
+        raise RuntimeError(f"HTTP {r.status_code} for {url}\nRESPONSE:\n{out[:2000]}")
+
+    try:
+        return json.loads(out) if out else {}
+    except json.JSONDecodeError:
+        raise RuntimeError(f"Non-JSON response from {url}\nSTDOUT:\n{out}")
+
+
+def _http_json(method: str, url: str, token: str, payload: Optional[Dict[str, Any]] = None, timeout: int = 90) -> Dict[str, Any]:
+    if os.getenv("LOCAL_LLM_HTTP", "curl").strip().lower() == "session":
+        return _session_json(method, url, token=token, payload=payload, timeout=timeout)
+    return _curl_json(method, url, token=token, payload=payload, timeout=timeout)
+
+
 def _curl_json(method: str, url: str, token: str, payload: Optional[Dict[str, Any]] = None, timeout: int = 90) -> Dict[str, Any]:
     cmd = ["curl", "-sS", "-X", method, url, "-H", "Accept: application/json"]
 
@@ -166,12 +239,12 @@ def _curl_json(method: str, url: str, token: str, payload: Optional[Dict[str, An
 def list_models() -> List[str]:
     base = os.environ["LOCAL_LLM_BASE_URL"].rstrip("/")
     token = os.environ.get("LOCAL_LLM_API_KEY", "")
-    j = _curl_json("GET", f"{base}/v1/models", token=token, payload=None)
+    j = _http_json("GET", f"{base}/v1/models", token=token, payload=None)
     data = j.get("data", []) or []
     return [m.get("id", "") for m in data if m.get("id")]
 
 
-def completions(prompt: str, max_tokens: int = 400, temperature: float = 0.0, stop: Optional[List[str]] = None) -> str:
+def _completion_texts(prompt: str, max_tokens: int, temperature: float, stop: Optional[List[str]], n: int = 1) -> List[str]:
     base = os.environ["LOCAL_LLM_BASE_URL"].rstrip("/")
     token = os.environ.get("LOCAL_LLM_API_KEY", "")
     model = os.environ.get("LOCAL_LLM_MODEL", DEFAULT_MODEL)
@@ -184,69 +257,90 @@ def completions(prompt: str, max_tokens: int = 400, temperature: float = 0.0, st
     }
     if stop:
         payload["stop"] = stop
+    if n > 1:
+        payload["n"] = n
+
+    t0 = time.perf_counter()
+    j = _http_json("POST", f"{base}/v1/completions", token=token, payload=payload)
+    elapsed = time.perf_counter() - t0
 
-    j = _curl_json("POST", f"{base}/v1/completions", token=token, payload=payload)
     choices = j.get("choices", []) or []
-    text = choices[0].get("text", "") if choices else ""
-    return text or ""
+    # vLLM/OpenAI return choices ordered by "index"; keep that order
+    choices = sorted(choices, key=lambda c: c.get("index", 0))
+    texts = [c.get("text", "") or "" for c in choices]
+    token_usage.record_call(j.get("usage"), elapsed, prompt, texts, n=n)
+    return texts
+
+
+def completions(prompt: str, max_tokens: int = 400, temperature: float = 0.0, stop: Optional[List[str]] = None) -> str:
+    texts = _completion_texts(prompt, max_tokens=max_tokens, temperature=temperature, stop=stop)
+    return texts[0] if texts else ""
+
+
+# (base URL, model) of backends that answered an n > 1 request with a single choice
+_N_UNSUPPORTED: Set[Tuple[str, str]] = set()
+
+
+def _parallel_completions(count: int, prompt: str, max_tokens: int, temperature: float, stop: Optional[List[str]]) -> List[str]:
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        # copy_context per call so usage is recorded against this run/stage
+        futs = [
+            pool.submit(contextvars.copy_context().run, completions, prompt, max_tokens, temperature, stop)
+            for _ in range(count)
+        ]
+        return [f.result() for f in futs]
+
+
+def completions_n(prompt: str, n: int, max_tokens: int = 400, temperature: float = 0.7, stop: Optional[List[str]] = None) -> List[str]:
+    """
+    n candidates for one prompt. Uses the `n` parameter in a single call; if the
+    backend returns fewer choices, the rest are requested in parallel, and a
+    backend that ignores `n` is remembered so later calls send all n requests
+    in parallel up front instead of waiting for the first one.
+    """
+    backend = (os.environ["LOCAL_LLM_BASE_URL"].rstrip("/"), os.environ.get("LOCAL_LLM_MODEL", DEFAULT_MODEL))
+    if backend in _N_UNSUPPORTED:
+        return _parallel_completions(n, prompt, max_tokens, temperature, stop)
+
+    texts = _completion_texts(prompt, max_tokens=max_tokens, temperature=temperature, stop=stop, n=n)
+    if n > 1 and len(texts) <= 1:
+        _N_UNSUPPORTED.add(backend)
+    missing = n - len(texts)
+    if missing > 0:
+        texts += _parallel_completions(missing, prompt, max_tokens, temperature, stop)
+    return texts[:n]
 
 
 # =========================
 # Strict Gherkin (1 Given/When/Then)
 # =========================
 def extract_strict_5_lines(raw: str) -> str:
-    lines = [l.strip() for l in raw.splitlines() if l.strip()]
-    feature = scenario = given = when = then = None
-
-    for s in lines:
-        if feature is None and s.startswith("Feature:"):
-            feature = s
-            continue
-        if feature is not None and scenario is None and s.startswith("Scenario:"):
-            scenario = s
-            continue
-        if scenario is not None and given is None and s.startswith("Given "):
-            given = s
-            continue
-        if scenario is not None and when is None and s.startswith("When "):
-            when = s
-            continue
-        if scenario is not None and then is None and s.startswith("Then "):
-            then = s
-            continue
-        if feature and scenario and given and when and then:
-            break
-
-    if not (feature and scenario and given and when and then):
+    lines = gherkin_parser.strict_lines(gherkin_parser.parse(raw))
+    if lines is None:
         return raw.strip()
-
-    return "\n".join([feature, scenario, given, when, then]).strip()
+    return "\n".join(lines).strip()
 
 
 def validate_llm_output_strict_gherkin(text: str) -> None:
-    lines = [l.strip() for l in text.splitlines() if l.strip()]
-    if sum(l.startswith("Given ") for l in lines) != 1:
-        raise ValueError("Must have exactly one Given")
-    if sum(l.startswith("When ") for l in lines) != 1:
-        raise ValueError("Must have exactly one When")
-    if sum(l.startswith("Then ") for l in lines) != 1:
-        raise ValueError("Must have exactly one Then")
-    if not any(l.startswith("Feature:") for l in lines):
+    doc = gherkin_parser.parse(text)
+    # counts go into the message: the repair prompt quotes it verbatim
+    for kw in ("Given", "When", "Then"):
+        n = doc.counts.get(kw, 0)
+        if n != 1:
+            raise ValueError(f"Must have exactly one {kw} (found {n} {kw} lines)")
+    if doc.feature is None:
         raise ValueError("Missing Feature")
-    if not any(l.startswith("Scenario:") for l in lines):
+    if not doc.counts.get("Scenario"):
         raise ValueError("Missing Scenario")
-    for l in lines:
-        if l.startswith("And ") or l.startswith("But "):
-            raise ValueError("And/But not allowed")
+    if doc.counts.get("And") or doc.counts.get("But"):
+        raise ValueError("And/But not allowed")
 
 
 def normalize_feature_file(text: str) -> str:
-    raw = [l.strip() for l in text.splitlines() if l.strip()]
-    feature = next(l for l in raw if l.startswith("Feature:"))
-    scenario = next(l for l in raw if l.startswith("Scenario:"))
-    given = next(l for l in raw if l.startswith("Given "))
-    when = next(l for l in raw if l.startswith("When "))
-    then = next(l for l in raw if l.startswith("Then "))
+    lines = gherkin_parser.strict_lines(gherkin_parser.parse(text))
+    if lines is None:
+        raise ValueError("Not a strict Feature/Scenario/Given/When/Then document")
+    feature, scenario, given, when, then = lines
     return "\n".join([feature, "", scenario, f"  {given}", f"  {when}", f"  {then}"])
 
 
@@ -357,11 +451,177 @@ def ensure_unique(names: List[str]) -> List[str]:
     return out
 
 
+# =========================
+# Targeted repair (bounded)
+# =========================
+# On a validation failure, send only the invalid output + the violation + the
+# output schema instead of rerunning the full contracts + RAG prompt.
+MAX_REPAIR_ATTEMPTS = int(os.getenv("LLM_REPAIR_ATTEMPTS", "2"))
+
+REPAIR_SCHEMAS = {
+    "gherkin": {
+        "schema": (
+            "EXACTLY 5 non-empty lines, in this order:\n"
+            "Feature: <name>\n"
+            "Scenario: <name>\n"
+            "Given <one precondition>\n"
+            "When <one action>\n"
+            "Then <one outcome>\n"
+            "No And/But lines, no markdown, no other text."
+        ),
+        "max_tokens": 220,
+    },
+    "plan": {
+        "schema": (
+            '{"page": {"className": "XxxPage", "methods": [{"name": "...", "type": "...", "comment": "..."}]},\n'
+            ' "steps": {"className": "XxxSteps", "givenCalls": ["..."], "whenCalls": ["..."], "thenCalls": ["..."]}}\n'
+            "givenCalls/whenCalls/thenCalls must be non-empty and reference page.methods names.\n"
+            f"Method names start with one of: {', '.join(ALLOWED_METHOD_PREFIXES)}.\n"
+            "Return ONLY the JSON object."
+        ),
+        "max_tokens": 800,
+    },
+}
+
+
+def parse_strict_gherkin(raw: str) -> str:
+    strict_5 = extract_strict_5_lines(raw)
+    validate_llm_output_strict_gherkin(strict_5)
+    return strict_5
+
+
+def build_repair_prompt(kind: str, invalid_output: str, violation: str) -> str:
+    return f"""
+SYSTEM:
+Fix the output below so it satisfies the schema. Change only what is needed.
+
+VIOLATION:
+{violation}
+
+SCHEMA:
+{REPAIR_SCHEMAS[kind]["schema"]}
+
+INVALID OUTPUT:
+{invalid_output.strip()}
+
+FIXED OUTPUT:
+""".strip()
+
+
+def _violation(e: Exception) -> str:
+    return getattr(e, "violation", None) or str(e)
+
+
+def with_repair(kind: str, raw: str, parse: Callable[[str], Any], max_attempts: int = MAX_REPAIR_ATTEMPTS) -> Tuple[Any, Dict[str, Any]]:
+    """
+    parse(raw); on ValueError/PlanValidationError run up to max_attempts short
+    repair calls. Returns (parsed, repair_log). Re-raises the last error when
+    every attempt fails.
+    """
+    log: Dict[str, Any] = {"attempts": 0, "repaired": False, "violations": [], "prompt_chars": 0, "prompt_tokens_est": 0}
+    try:
+        return parse(raw), log
+    except (ValueError, PlanValidationError) as e:
+        last_err: Exception = e
+
+    current = raw
+    for _ in range(max_attempts):
+        violation = _violation(last_err)
+        prompt = build_repair_prompt(kind, current, violation)
+        log["attempts"] += 1
+        log["violations"].append(violation)
+        log["prompt_chars"] += len(prompt)
+        log["prompt_tokens_est"] += token_usage.count_tokens(prompt)
+
+        with token_usage.stage(f"repair_{kind}"):
+            current = completions(prompt, max_tokens=REPAIR_SCHEMAS[kind]["max_tokens"], temperature=0.0)
+        try:
+            parsed = parse(current)
+        except (ValueError, PlanValidationError) as e:
+            last_err = e
+            continue
+        log["repaired"] = True
+        return parsed, log
+
+    raise last_err
+
+
+# =========================
+# n-candidate sampling
+# =========================
+# LLM_CANDIDATES > 1 asks for n samples in one call and keeps the first one that
+# passes the validators, so a bad sample no longer costs a serial retry.
+DEFAULT_CANDIDATES = int(os.getenv("LLM_CANDIDATES", "1"))
+CANDIDATE_TEMPERATURE = float(os.getenv("LLM_CANDIDATE_TEMPERATURE", "0.7"))
+
+
+def score_candidates(candidates: List[str], parse: Callable[[str], Any]) -> Tuple[Optional[int], Any, List[Dict[str, Any]]]:
+    """
+    Run the validator over every candidate. Returns (first_valid_index, parsed, scores);
+    index is None when no candidate is valid.
+    """
+    chosen: Optional[int] = None
+    parsed: Any = None
+    scores: List[Dict[str, Any]] = []
+    for i, raw in enumerate(candidates):
+        try:
+            p = parse(raw)
+        except (ValueError, PlanValidationError) as e:
+            scores.append({"index": i, "valid": False, "violation": _violation(e)})
+            continue
+        scores.append({"index": i, "valid": True})
+        if chosen is None:
+            chosen, parsed = i, p
+    return chosen, parsed, scores
+
+
+def sample_valid(
+    kind: str,
+    prompt: str,
+    parse: Callable[[str], Any],
+    max_tokens: int,
+    n: int = DEFAULT_CANDIDATES,
+    log: Callable[..., None] = lambda *a, **k: None,
+) -> Tuple[Any, Dict[str, Any], Dict[str, Any]]:
+    """
+    Returns (parsed, sampling_log, repair_log). With n <= 1 this is the old
+    greedy single call. If no candidate is valid, the first one goes through
+    the targeted repair stage.
+    """
+    if n <= 1:
+        raw = completions(prompt, max_tokens=max_tokens, temperature=0.0)
+        parsed, repair_log = with_repair(kind, raw, parse)
+        return parsed, {"n": 1, "chosen": 0}, repair_log
+
+    candidates = completions_n(prompt, n=n, max_tokens=max_tokens, temperature=CANDIDATE_TEMPERATURE)
+    chosen, parsed, scores = score_candidates(candidates, parse)
+    sampling_log = {
+        "n": n,
+        "temperature": CANDIDATE_TEMPERATURE,
+        "chosen": chosen,
+        "valid_count": sum(1 for sc in scores if sc["valid"]),
+        "scores": scores,
+    }
+    log(f"CANDIDATE_SELECTED: {kind} chosen={chosen} valid={sampling_log['valid_count']}/{len(candidates)}")
+    if chosen is not None:
+        return parsed, sampling_log, {"attempts": 0, "repaired": False, "violations": [], "prompt_chars": 0, "prompt_tokens_est": 0}
+
+    parsed, repair_log = with_repair(kind, candidates[0] if candidates else "", parse)
+    return parsed, sampling_log, repair_log
+
+
 # =========================
 # Granular plan for Steps/Page
 # =========================
-def plan_granular_steps(task: str, contracts: str, rag_context: str, strict_5: str) -> Dict[str, Any]:
-    prompt = f"""
+class PlanValidationError(RuntimeError):
+    def __init__(self, violation: str, raw: str) -> None:
+        super().__init__(f"{violation}. RAW:\n{raw}")
+        self.violation = violation
+        self.raw = raw
+
+
+def build_plan_prompt(task: str, contracts: str, rag_context: str, strict_5: str) -> str:
+    return f"""
 SYSTEM:
 You generate a JSON plan for Selenium Page Object + Cucumber Steps.
 
@@ -410,21 +670,45 @@ TASK:
 {task}
 """.strip()
 
-    raw = completions(prompt, max_tokens=800, temperature=0.0)
 
+def plan_granular_steps(
+    task: str,
+    contracts: str,
+    rag_context: str,
+    strict_5: str,
+    repair_log: Optional[Dict[str, Any]] = None,
+    candidates: int = DEFAULT_CANDIDATES,
+    sampling_log: Optional[Dict[str, Any]] = None,
+    log: Callable[..., None] = lambda *a, **k: None,
+) -> Dict[str, Any]:
+    prompt = build_plan_prompt(task, contracts, rag_context, strict_5)
+
+    plan, s_log, r_log = sample_valid("plan", prompt, parse_plan, max_tokens=800, n=candidates, log=log)
+    if repair_log is not None:
+        repair_log.update(r_log)
+    if sampling_log is not None:
+        sampling_log.update(s_log)
+    return plan
+
+
+def parse_plan(raw: str) -> Dict[str, Any]:
+    """
+    Parse + normalize a model plan. Raises PlanValidationError naming the
+    specific violation, which the repair stage feeds back to the model.
+    """
     try:
         json_str = extract_first_json_object(raw)
         plan = json.loads(json_str)
     except Exception as e:
-        raise RuntimeError(f"Could not parse JSON plan from model.\nRAW:\n{raw}") from e
+        raise PlanValidationError(f"Could not parse JSON plan from model ({e})", raw) from e
 
     # minimal structural validation
-    if "page" not in plan or "steps" not in plan:
-        raise RuntimeError(f"Plan missing 'page' or 'steps'. RAW:\n{raw}")
+    if not isinstance(plan, dict) or not isinstance(plan.get("page"), dict) or not isinstance(plan.get("steps"), dict):
+        raise PlanValidationError("Plan missing 'page' or 'steps' object", raw)
 
     methods = plan["page"].get("methods", [])
     if not isinstance(methods, list) or not methods:
-        raise RuntimeError(f"Plan page.methods empty. RAW:\n{raw}")
+        raise PlanValidationError("Plan page.methods empty", raw)
 
     # ---- enforce atomic + uniqueness + update calls accordingly ----
     old_to_new: Dict[str, str] = {}
@@ -456,7 +740,7 @@ TASK:
     for k in ["givenCalls", "whenCalls", "thenCalls"]:
         calls = plan["steps"].get(k, [])
         if not isinstance(calls, list) or not calls:
-            raise RuntimeError(f"Plan steps.{k} empty. RAW:\n{raw}")
+            raise PlanValidationError(f"Plan steps.{k} missing or empty", raw)
 
         fixed_calls = []
         for c in calls:
@@ -485,11 +769,54 @@ TASK:
     for k in ["givenCalls", "whenCalls", "thenCalls"]:
         for c in plan["steps"][k]:
             if c not in method_names:
-                raise RuntimeError(f"steps.{k} references missing method '{c}'. RAW:\n{raw}")
+                raise PlanValidationError(f"steps.{k} references missing method '{c}'", raw)
 
     return plan
 
 
+def revalidate_cached_plan(plan: Dict[str, Any], strict_5: str, task: str) -> Dict[str, Any]:
+    """
+    Make a plan cached from another task safe to reuse for this one. Raises
+    PlanValidationError when it does not fit.
+      - schema check (parse_plan)
+      - page/steps class names re-derived from the new feature, so the write
+        stage never overwrites the source task's steps/page files
+      - the new Gherkin has exactly one step per Given/When/Then, matching the
+        plan's one non-empty call list per keyword
+      - every step of the new Gherkin matches exactly one definition of the
+        steps class that would be written for it
+    """
+    plan = parse_plan(json.dumps(plan))
+    raw = json.dumps(plan)
+
+    feature_name = extract_feature_name(normalize_feature_file(strict_5)) or task
+    class_base = to_pascal_case(feature_name)
+    plan["page"]["className"] = f"{class_base}Page"
+    plan["steps"]["className"] = f"{class_base}Steps"
+
+    steps = list(gherkin_parser.parse(strict_5).steps())
+    for kw, key in (("Given", "givenCalls"), ("When", "whenCalls"), ("Then", "thenCalls")):
+        n = sum(1 for st in steps if st.keyword == kw)
+        if n != 1 or not plan["steps"][key]:
+            raise PlanValidationError(
+                f"Cached plan has {len(plan['steps'][key])} {kw} call(s) for {n} {kw} step(s) in the new Gherkin", raw
+            )
+
+    calls = {"given": plan["steps"]["givenCalls"], "when": plan["steps"]["whenCalls"], "then": plan["steps"]["thenCalls"]}
+    code = render_steps(plan["steps"]["className"], plan["page"]["className"], strict_5, calls)
+    report = StepMatcher(extract_definitions(code, "steps")).match_all(
+        ("feature", st.text, st.line) for st in steps
+    )
+    problems = (
+        [f"invalid step expression {d['expression']!r}" for d in report["invalid_definitions"]]
+        + [f"no definition for {u['text']!r}" for u in report["unmatched"]]
+        + [f"ambiguous step {a['text']!r}" for a in report["ambiguous"]]
+    )
+    if problems:
+        raise PlanValidationError(f"Cached plan does not bind the new Gherkin: {'; '.join(problems[:3])}", raw)
+    return plan
+
+
 # =========================
 # Writers
 # =========================
@@ -499,12 +826,19 @@ def ensure_dirs() -> None:
     GENERATED_PAGES_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def write_feature(content: str, feature_name: str) -> Path:
+def _emit(path: Path, content: str, txn: Optional[ArtifactTransaction]) -> Path:
+    # with a transaction the file is only staged; commit() publishes the whole set
+    if txn is not None:
+        return txn.stage(path, content)
+    write_if_changed(path, content)
+    return path
+
+
+def write_feature(content: str, feature_name: str, txn: Optional[ArtifactTransaction] = None) -> Path:
     ensure_dirs()
     filename = f"{slugify(feature_name)}.feature"
     path = GENERATED_FEATURES_DIR / filename
-    path.write_text(content, encoding="utf-8")
-    return path
+    return _emit(path, content, txn)
 
 
 def _java_method_stub(name: str, comment: str) -> str:
@@ -521,7 +855,7 @@ def _java_method_stub(name: str, comment: str) -> str:
 """.rstrip()
 
 
-def write_page_object(page_class: str, methods: List[Dict[str, Any]]) -> Path:
+def write_page_object(page_class: str, methods: List[Dict[str, Any]], txn: Optional[ArtifactTransaction] = None) -> Path:
     ensure_dirs()
     path = GENERATED_PAGES_DIR / f"{page_class}.java"
 
@@ -542,22 +876,14 @@ public class {page_class} {{
 
 }}
 """
-    path.write_text(code, encoding="utf-8")
-    return path
-
-
-def write_steps(steps_class: str, page_class: str, strict_5: str, calls: Dict[str, List[str]]) -> Path:
-    ensure_dirs()
-    path = GENERATED_STEPS_DIR / f"{steps_class}.java"
+    return _emit(path, code, txn)
 
-    lines = [l.strip() for l in strict_5.splitlines() if l.strip()]
-    given_line = next(l for l in lines if l.startswith("Given "))
-    when_line = next(l for l in lines if l.startswith("When "))
-    then_line = next(l for l in lines if l.startswith("Then "))
 
-    given_text = given_line[len("Given "):].strip()
-    when_text = when_line[len("When "):].strip()
-    then_text = then_line[len("Then "):].strip()
+def render_steps(steps_class: str, page_class: str, strict_5: str, calls: Dict[str, List[str]]) -> str:
+    first: Dict[str, str] = {}
+    for st in gherkin_parser.parse(strict_5).steps():
+        first.setdefault(st.keyword, st.text)
+    given_text, when_text, then_text = first["Given"], first["When"], first["Then"]
 
     def chain(method_list: List[str]) -> str:
         return "\n".join([f"        page.{m}();" for m in method_list])
@@ -590,39 +916,39 @@ public class {steps_class} {{
     }}
 }}
 """
-    path.write_text(code, encoding="utf-8")
-    return path
+    return code
 
 
-def write_meta(meta: Dict[str, Any]) -> None:
-    GENERATED_DIR.mkdir(parents=True, exist_ok=True)
-    META_PATH.write_text(json.dumps(meta, indent=2, ensure_ascii=False), encoding="utf-8")
-
+def write_steps(steps_class: str, page_class: str, strict_5: str, calls: Dict[str, List[str]], txn: Optional[ArtifactTransaction] = None) -> Path:
+    ensure_dirs()
+    path = GENERATED_STEPS_DIR / f"{steps_class}.java"
+    return _emit(path, render_steps(steps_class, page_class, strict_5, calls), txn)
 
-# =========================
-# Main
-# =========================
-if __name__ == "__main__":
-    if len(sys.argv) < 2 or not sys.argv[1].strip():
-        usage_exit()
 
-    task = sys.argv[1].strip()
+def write_meta(meta: Dict[str, Any], status: str = "ok") -> int:
+    """
+    Append the run to the ledger (history) and refresh META_PATH as a
+    "latest run" convenience copy. Returns the ledger run id.
+    """
+    GENERATED_DIR.mkdir(parents=True, exist_ok=True)
+    run_id = run_ledger.append_run(meta, status=status)
+    meta["run_id"] = run_id
 
-    ensure_env()
+    tmp = META_PATH.with_name(f".{META_PATH.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(meta, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, META_PATH)
+    return run_id
 
-    models = list_models()
-    print("LOCAL_LLM_READY: /v1/models OK")
-    print("MODELS:", models[:5], "..." if len(models) > 5 else "")
 
-    rag_results = retrieve(task, top_k=RAG_TOP_K)
-    rag_context = "\n".join([f"[{r['doc']}#{r['chunk']}] {r.get('content','')}" for r in rag_results]).strip()
-    rag_available = bool(rag_context)
-    rag_context_hash = sha256(rag_context) if rag_available else "EMPTY"
+# =========================
+# Pipeline
+# =========================
+def build_rag_context(rag_results: List[Dict[str, Any]]) -> str:
+    return "\n".join([f"[{r['doc']}#{r['chunk']}] {r.get('content','')}" for r in rag_results]).strip()
 
-    contracts = load_contracts()
-    contract_checksum = sha256(contracts)
 
-    strict_prompt = f"""
+def build_strict_prompt(task: str, contracts: str, rag_context: str) -> str:
+    return f"""
 SYSTEM:
 You are a STRICT Gherkin generator.
 
@@ -648,41 +974,228 @@ REMINDER:
 Return ONLY the 5 lines.
 """.strip()
 
-    raw1 = completions(strict_prompt, max_tokens=220, temperature=0.0, stop=None)
-    strict_5 = extract_strict_5_lines(raw1)
 
-    print("=== RAW LLM OUTPUT START (STRICT 5) ===")
-    print(strict_5)
-    print("=== RAW LLM OUTPUT END (STRICT 5) ===")
+def generate(
+    task: str,
+    verbose: bool = True,
+    force: bool = False,
+    candidates: int = DEFAULT_CANDIDATES,
+    artifacts: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """
+    Run retrieval -> strict Gherkin -> plan -> write artifacts for one task.
+    Returns the run meta (also written to META_PATH). Env must already be loaded.
 
-    validate_llm_output_strict_gherkin(strict_5)
-    feature_file_text = normalize_feature_file(strict_5)
+    If the task's manifest shows identical inputs (task, contracts, RAG context,
+    PROMPT_VERSION, model) and untouched outputs, the LLM stages are skipped and
+    the previous meta is returned with cache.status == "hit" (unless force=True).
 
-    feature_name = extract_feature_name(feature_file_text) or task
-    class_base = to_pascal_case(feature_name)
-    page_class = f"{class_base}Page"
-    steps_class = f"{class_base}Steps"
-
-    plan = plan_granular_steps(
-        task=task,
-        contracts=contracts,
-        rag_context=rag_context,
-        strict_5=strict_5
-    )
+    candidates > 1 samples that many outputs per LLM stage and keeps the first valid one.
+
+    `artifacts`, if given, is filled with {feature_file/page_file/steps_file: content}
+    as this run wrote (or, on a manifest hit, verified) them; concurrent runs
+    that map to the same files can overwrite each other on disk afterwards.
+    """
+    with token_usage.recording() as llm_calls:
+        return _generate(task, verbose=verbose, force=force, candidates=candidates, llm_calls=llm_calls,
+                         artifacts={} if artifacts is None else artifacts)
 
-    page_class = plan["page"].get("className") or page_class
-    steps_class = plan["steps"].get("className") or steps_class
-    methods = plan["page"]["methods"]
 
-    calls = {
-        "given": plan["steps"]["givenCalls"],
-        "when": plan["steps"]["whenCalls"],
-        "then": plan["steps"]["thenCalls"],
+def _load_contract_rules() -> Dict[str, str]:
+    contracts = load_contracts()
+    checksum = sha256(contracts)
+    if CONTRACT_MODE == "full":
+        return {"checksum": checksum, "gherkin": contracts, "plan": contracts}
+    digest = contract_compiler.load_digest(contracts, checksum)
+    return {
+        "checksum": checksum,
+        "gherkin": contract_compiler.render_rules(digest, "gherkin"),
+        "plan": contract_compiler.render_rules(digest, "plan"),
     }
 
-    feature_path = write_feature(feature_file_text, feature_name)
-    page_path = write_page_object(page_class, methods)
-    steps_path = write_steps(steps_class, page_class, strict_5, calls)
+
+def _generate(
+    task: str,
+    verbose: bool,
+    force: bool,
+    candidates: int,
+    llm_calls: List[Dict[str, Any]],
+    artifacts: Dict[str, str],
+) -> Dict[str, Any]:
+    log = print if verbose else (lambda *a, **k: None)
+    timings: Dict[str, float] = {}
+    t_start = time.perf_counter()
+    # independent stages overlap; LLM calls made inside a stage are attributed to it in meta["tokens"]
+    runner = StageRunner(around=token_usage.stage, timings=timings)
+
+    model = os.getenv("LOCAL_LLM_MODEL", DEFAULT_MODEL)
+    prompt_version = PROMPT_VERSION if CONTRACT_MODE != "full" else f"{PROMPT_VERSION}+full_contracts"
+
+    def check(r: Dict[str, Any]) -> Dict[str, Any]:
+        rules = r["load_contracts"]
+        rag_context = build_rag_context(r["retrieve"])
+        inputs = generation_manifest.input_fingerprint(
+            task=task,
+            contract_checksum=rules["checksum"],
+            rag_context_hash=sha256(rag_context) if rag_context else "EMPTY",
+            prompt_version=prompt_version,
+            model=model,
+        )
+        status, manifest = generation_manifest.check_manifest(task, inputs)
+        return {"inputs": inputs, "status": status, "manifest": manifest}
+
+    prep = runner.run([
+        Stage("retrieve", lambda r: retrieve(task, top_k=RAG_TOP_K)),
+        Stage("load_contracts", lambda r: _load_contract_rules()),
+        Stage("manifest_check", check, deps=("retrieve", "load_contracts")),
+    ])
+    rag_results = prep["retrieve"]
+    rag_context = build_rag_context(rag_results)
+    rag_available = bool(rag_context)
+    rag_context_hash = sha256(rag_context) if rag_available else "EMPTY"
+    contract_checksum = prep["load_contracts"]["checksum"]
+    gherkin_rules = prep["load_contracts"]["gherkin"]
+    plan_rules = prep["load_contracts"]["plan"]
+    inputs = prep["manifest_check"]["inputs"]
+    cache_status = prep["manifest_check"]["status"]
+    manifest = prep["manifest_check"]["manifest"]
+
+    hit_contents = None
+    if cache_status == generation_manifest.HIT and not force and manifest is not None:
+        # re-read + re-hash in one go: the files may have changed since check_manifest
+        hit_contents = generation_manifest.read_outputs(manifest.get("outputs", {}))
+        if hit_contents is None:
+            cache_status = generation_manifest.OUTPUTS_CHANGED
+    if hit_contents is not None:
+        meta = dict(manifest["meta"])
+        artifacts.update({k: hit_contents.get(meta[k], "") for k in ARTIFACT_KEYS})
+        timings["total"] = round((time.perf_counter() - t_start) * 1000, 1)
+        meta["cache"] = {"status": cache_status, "fingerprint": inputs["fingerprint"], "generated_utc": meta.get("timestamp_utc")}
+        meta["timings_ms"] = timings
+        meta["stages"] = runner.report()
+        meta["tokens"] = {"calls": [], "summary": token_usage.summarize_calls([])}
+        meta["run_id"] = run_ledger.append_run(meta)
+        log("SKIPPED_UNCHANGED:", task)
+        return meta
+
+    # the digest already carries the contracts: don't send the RAG copy too
+    prompt_rag_results = rag_results if CONTRACT_MODE == "full" else contract_compiler.without_contract_chunks(rag_results)
+    prompt_rag_context = build_rag_context(prompt_rag_results)
+    strict_prompt = build_strict_prompt(task, gherkin_rules, prompt_rag_context)
+    plan_scope = {"contract_checksum": contract_checksum, "prompt_version": prompt_version, "model": model}
+
+    def strict_gherkin(r: Dict[str, Any]) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+        return sample_valid("gherkin", strict_prompt, parse_strict_gherkin, max_tokens=220, n=candidates, log=log)
+
+    def prompt_sizes(r: Dict[str, Any]) -> Dict[str, Any]:
+        # tokenizer work runs alongside the plan stage instead of in front of it
+        strict_5 = r["llm_strict_gherkin"][0]
+        return {
+            "strict_gherkin": token_usage.section_breakdown(
+                strict_prompt, {"contracts": gherkin_rules, "rag_context": prompt_rag_context, "task": task}
+            ),
+            "plan": token_usage.section_breakdown(
+                build_plan_prompt(task, plan_rules, prompt_rag_context, strict_5),
+                {"contracts": plan_rules, "rag_context": prompt_rag_context, "strict_gherkin": strict_5, "task": task},
+            ),
+        }
+
+    def cached_plan(r: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+        # near-duplicate task with the same contracts/prompt/model: reuse its validated plan
+        try:
+            strict_5 = r["llm_strict_gherkin"][0]
+            return plan_cache.lookup(
+                task, strict_5, plan_scope, validate=lambda p: revalidate_cached_plan(p, strict_5, task)
+            )
+        except Exception as e:
+            # the cache is an optimization: never fail a run because of it
+            return None, {"status": "error", "reason": str(e)}
+
+    plan_repair: Dict[str, Any] = {}
+    plan_sampling: Dict[str, Any] = {}
+
+    def llm_plan(r: Dict[str, Any]) -> Dict[str, Any]:
+        plan = r["plan_cache"][0]
+        if plan is not None:
+            return plan
+        return plan_granular_steps(
+            task=task,
+            contracts=plan_rules,
+            rag_context=prompt_rag_context,
+            strict_5=r["llm_strict_gherkin"][0],
+            repair_log=plan_repair,
+            candidates=candidates,
+            sampling_log=plan_sampling,
+            log=log,
+        )
+
+    def write(r: Dict[str, Any]) -> Dict[str, Any]:
+        strict_5, plan = r["llm_strict_gherkin"][0], r["llm_plan"]
+        feature_file_text = normalize_feature_file(strict_5)
+        feature_name = extract_feature_name(feature_file_text) or task
+        class_base = to_pascal_case(feature_name)
+        page_class = plan["page"].get("className") or f"{class_base}Page"
+        steps_class = plan["steps"].get("className") or f"{class_base}Steps"
+        calls = {
+            "given": plan["steps"]["givenCalls"],
+            "when": plan["steps"]["whenCalls"],
+            "then": plan["steps"]["thenCalls"],
+        }
+
+        txn = ArtifactTransaction()
+        feature_path = write_feature(feature_file_text, feature_name, txn=txn)
+        page_path = write_page_object(page_class, plan["page"]["methods"], txn=txn)
+        steps_path = write_steps(steps_class, page_class, strict_5, calls, txn=txn)
+        return {
+            "feature_name": feature_name,
+            "paths": (feature_path, page_path, steps_path),
+            "report": txn.commit(),
+            "contents": {
+                "feature_file": txn.content(feature_path),
+                "page_file": txn.content(page_path),
+                "steps_file": txn.content(steps_path),
+            },
+        }
+
+    out = runner.run([
+        # the prompts are built from the prep batch: declare it so the critical path crosses the batch boundary
+        Stage("llm_strict_gherkin", strict_gherkin, deps=("retrieve", "load_contracts", "manifest_check")),
+        Stage("prompt_sections", prompt_sizes, deps=("llm_strict_gherkin",)),
+        Stage("plan_cache", cached_plan, deps=("llm_strict_gherkin",)),
+        Stage("llm_plan", llm_plan, deps=("plan_cache",)),
+        Stage("write", write, deps=("llm_plan",)),
+    ])
+
+    strict_5, gherkin_sampling, gherkin_repair = out["llm_strict_gherkin"]
+    plan_cache_info = out["plan_cache"][1]
+    plan = out["llm_plan"]
+    prompt_sections = out["prompt_sections"]
+    feature_name = out["write"]["feature_name"]
+    feature_path, page_path, steps_path = out["write"]["paths"]
+    write_report = out["write"]["report"]
+    artifacts.update(out["write"]["contents"])
+
+    log("=== RAW LLM OUTPUT START (STRICT 5) ===")
+    log(strict_5)
+    log("=== RAW LLM OUTPUT END (STRICT 5) ===")
+    if gherkin_repair["attempts"]:
+        log(f"REPAIRED_STRICT_GHERKIN: attempts={gherkin_repair['attempts']} violations={gherkin_repair['violations']}")
+    if plan_cache_info.get("status") == "hit":
+        # no plan prompt was sent
+        prompt_sections.pop("plan", None)
+        log(f"PLAN_CACHE_HIT: similarity={plan_cache_info['similarity']} source_run_id={plan_cache_info['source_run_id']}")
+    if plan_repair.get("attempts"):
+        log(f"REPAIRED_PLAN: attempts={plan_repair['attempts']} violations={plan_repair['violations']}")
+    log(f"ARTIFACTS: written={len(write_report['written'])} unchanged={len(write_report['unchanged'])}")
+    # without a tokenizer the sections are chars/4 estimates: scale them to what the backend counted
+    for name, stage_name in (("strict_gherkin", "llm_strict_gherkin"), ("plan", "llm_plan")):
+        if name in prompt_sections:
+            prompt_sections[name] = token_usage.calibrate(
+                prompt_sections[name], token_usage.stage_prompt_tokens(llm_calls, stage_name)
+            )
+
+    timings["total"] = round((time.perf_counter() - t_start) * 1000, 1)
+    cache_info = {"status": "forced" if force else cache_status, "fingerprint": inputs["fingerprint"]}
 
     meta = {
         "timestamp_utc": datetime.now(timezone.utc).isoformat(),
@@ -693,6 +1206,12 @@ Return ONLY the 5 lines.
         "page_file": str(page_path),
         "steps_file": str(steps_path),
         "contract_checksum": contract_checksum,
+        "contracts": {
+            "mode": CONTRACT_MODE,
+            "gherkin_rules_chars": len(gherkin_rules),
+            "plan_rules_chars": len(plan_rules),
+            "rag_contract_chunks_suppressed": len(rag_results) - len(prompt_rag_results),
+        },
         "rag": {
             "enabled": True,
             "top_k": RAG_TOP_K,
@@ -702,25 +1221,167 @@ Return ONLY the 5 lines.
             "docs": [f"{r['doc']}#{r['chunk']}" for r in rag_results],
         },
         "local_llm_base_url": os.getenv("LOCAL_LLM_BASE_URL", ""),
-        "local_llm_model": os.getenv("LOCAL_LLM_MODEL", DEFAULT_MODEL),
+        "local_llm_model": model,
+        "timings_ms": timings,
+        "stages": runner.report(),
+        "cache": cache_info,
+        # scope is kept so index_valid_plans() can add the plan once validation passes
+        "plan_cache": {**plan_cache_info, "scope": plan_scope},
+        "artifacts": write_report,
         "generation": {
             "strict_gherkin_5": strict_5,
             "plan": plan,
         },
+        "repair": {
+            "strict_gherkin": gherkin_repair,
+            "plan": plan_repair,
+        },
+        "sampling": {
+            "strict_gherkin": gherkin_sampling,
+            "plan": plan_sampling,
+        },
+        "tokens": {
+            "summary": token_usage.summarize_calls(llm_calls),
+            "calls": list(llm_calls),
+            "prompt_sections": prompt_sections,
+        },
     }
+    generation_manifest.write_manifest(task, inputs, [feature_path, page_path, steps_path], meta)
     write_meta(meta)
+    return meta
+
+
+ARTIFACT_KEYS = ("feature_file", "page_file", "steps_file")
+
+
+def run_validation(metas: List[Dict[str, Any]]) -> validate_artifacts.ValidationReport:
+    """Validate, in-process, only the artifacts these runs produced."""
+    paths = list(dict.fromkeys(m[k] for m in metas for k in ARTIFACT_KEYS))
+    return validate_artifacts.validate_paths(paths)
+
+
+def valid_run_ids(metas: List[Dict[str, Any]], report: validate_artifacts.ValidationReport) -> Tuple[List[int], List[int]]:
+    bad = {v.path for v in report.violations}
+    ok_ids = [m["run_id"] for m in metas if not any(m[k] in bad for k in ARTIFACT_KEYS)]
+    return ok_ids, [m["run_id"] for m in metas if m["run_id"] not in ok_ids]
+
 
-    print("PROMPT_VERSION:", PROMPT_VERSION)
-    print("CONTRACT_CHECKSUM:", contract_checksum)
-    print("RAG_AVAILABLE:", rag_available)
-    print("FEATURE_WRITTEN:", feature_path)
-    print("PAGE_WRITTEN:", page_path)
-    print("STEPS_WRITTEN:", steps_path)
-    print("META_WRITTEN:", META_PATH)
-
-    print("RUNNING validate_artifacts.py")
-    result = subprocess.run([sys.executable, "validate_artifacts.py"], capture_output=True, text=True)
-    print(result.stdout)
-    if result.returncode != 0:
-        print(result.stderr)
-        sys.exit(result.returncode)
\ No newline at end of file
+def index_valid_plans(metas: List[Dict[str, Any]], valid_ids: List[int]) -> None:
+    """
+    Add the plans of runs whose artifacts passed validation to the plan cache.
+    Reused plans (plan cache hits) already have their source entry, and manifest
+    hits were indexed when they were generated.
+    """
+    valid = set(valid_ids)
+    for meta in metas:
+        info = meta.get("plan_cache") or {}
+        if (meta.get("run_id") not in valid or "scope" not in info or info.get("status") == "hit"
+                or meta["cache"]["status"] == generation_manifest.HIT):
+            continue
+        try:
+            plan_cache.add(meta["task"], meta["generation"]["strict_gherkin_5"], meta["run_id"], info["scope"])
+        except Exception as e:
+            print(f"PLAN_CACHE_ADD_FAILED: {e}")
+
+
+# =========================
+# Main
+# =========================
+def _read_tasks_file(path: str) -> List[str]:
+    lines = Path(path).read_text(encoding="utf-8").splitlines()
+    return [l.strip() for l in lines if l.strip() and not l.strip().startswith("#")]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Generate feature/page/steps artifacts for a task.")
+    ap.add_argument("task", nargs="?", default="", help='e.g. "Cancel pending order in Salesforce Order History"')
+    ap.add_argument("--tasks-file", default="", help="one task per line (# comments allowed)")
+    ap.add_argument("--force", action="store_true", help="regenerate even if the manifest says nothing changed")
+    ap.add_argument("--revalidate", action="store_true", help="run validation even when every task was skipped")
+    ap.add_argument("--candidates", type=int, default=DEFAULT_CANDIDATES, help="samples per LLM stage; first valid wins")
+    args = ap.parse_args(argv)
+
+    tasks = _read_tasks_file(args.tasks_file) if args.tasks_file else []
+    if args.task.strip():
+        tasks.insert(0, args.task.strip())
+    if not tasks:
+        usage_exit()
+
+    ensure_env()
+
+    def warm_rag(r: Dict[str, Any]) -> None:
+        try:
+            warm_up()
+        except Exception as e:
+            # retrieve() raises the same error per task; just report it early
+            print(f"RAG_WARMUP_FAILED: {type(e).__name__}: {e}")
+
+    # readiness check, embedding model/index load and contract parsing don't depend on each other
+    ready = StageRunner().run([
+        Stage("list_models", lambda r: list_models()),
+        Stage("warm_rag", warm_rag),
+        Stage("load_contracts", lambda r: _load_contract_rules()),
+    ])
+    models = ready["list_models"]
+    print("LOCAL_LLM_READY: /v1/models OK")
+    print("MODELS:", models[:5], "..." if len(models) > 5 else "")
+
+    regenerated = 0
+    failed = 0
+    metas: List[Dict[str, Any]] = []
+    for task in tasks:
+        try:
+            meta = generate(task, force=args.force, candidates=args.candidates)
+        except Exception as e:
+            failed += 1
+            run_ledger.append_run({
+                "timestamp_utc": datetime.now(timezone.utc).isoformat(),
+                "task": task,
+                "prompt_version": PROMPT_VERSION,
+                "local_llm_model": os.getenv("LOCAL_LLM_MODEL", DEFAULT_MODEL),
+                "error": f"{type(e).__name__}: {e}",
+            }, status="error")
+            if len(tasks) == 1:
+                raise
+            print(f"TASK_FAILED: {task}\n{type(e).__name__}: {e}")
+            continue
+
+        metas.append(meta)
+        if meta["cache"]["status"] == generation_manifest.HIT:
+            continue
+        regenerated += 1
+
+        print("PROMPT_VERSION:", PROMPT_VERSION)
+        print("CONTRACT_CHECKSUM:", meta["contract_checksum"])
+        print("RAG_AVAILABLE:", meta["rag"]["available"])
+        print("FEATURE_WRITTEN:", meta["feature_file"])
+        print("PAGE_WRITTEN:", meta["page_file"])
+        print("STEPS_WRITTEN:", meta["steps_file"])
+        tok = meta["tokens"]["summary"]
+        print(f"TOKENS: prompt={tok['prompt_tokens']} completion={tok['completion_tokens']} tokens_per_s={tok['tokens_per_s']}")
+        print("META_WRITTEN:", META_PATH)
+
+    print(f"TASKS: {len(tasks)} regenerated={regenerated} skipped={len(tasks) - regenerated - failed} failed={failed}")
+
+    if regenerated == 0 and not args.revalidate:
+        print("NOTHING_CHANGED: skipping validation (use --revalidate to force)")
+        return 1 if failed else 0
+
+    print(f"VALIDATING: {len(metas)} task(s)")
+    report = run_validation(metas)
+    ok_ids, bad_ids = valid_run_ids(metas, report)
+    run_ledger.set_valid(ok_ids, True)
+    run_ledger.set_valid(bad_ids, False)
+    index_valid_plans(metas, ok_ids)
+    if not report.ok:
+        for v in report.violations:
+            print(f"VALIDATION FAILED: {v}")
+        return 1
+    print("VALIDATION PASSED")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
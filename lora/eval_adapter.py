@@ -0,0 +1,266 @@
+"""
+Offline evaluation of the base model vs LoRA adapter(s) on a held-out prompt set.
+
+Every target runs the same JSONL prompt set; each output is scored with
+test_adapter.extract_first_json + validate_generation.validate, and per target
+we report validity / JSON-parse / reference-match rates, request latency
+percentiles and generated tokens/s. Compare base and adapter before deploying:
+
+  python lora/eval_adapter.py --data lora/data/eval.jsonl -t local:base -t local:lora/out/adapter
+  python lora/eval_adapter.py --data lora/data/eval.jsonl -t openai:deepseek-v2-lite-lora-merged -c 8
+  python lora/eval_adapter.py --data lora/data/train.jsonl -t standin       # harness check, no model
+
+Targets (-t, repeatable) are backend[:name]:
+  local:base | local:<adapter dir> | local:tiny   transformers via local_infer (batched, KV cache;
+                                                  tiny = offline random-weight model)
+  openai[:<model>]                                the OpenAI-compatible server (LOCAL_LLM_BASE_URL,
+                                                  model defaults to LOCAL_LLM_MODEL), concurrent requests
+  standin                                         echoes each record's expected output (upper bound)
+
+Records are {"prompt": ..., "expected": {...}} or training-style {"text": "... Expected Output: {...}"}
+(the prompt then ends at "Expected Output:", as in training). Latency for local targets is the
+latency of the batch a prompt ran in. Results go to bench_results/adapter_eval_<ts>.json.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from test_adapter import BASE_MODEL, extract_first_json
+from validate_generation import validate  # also puts the repo root on sys.path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+RESULTS_DIR = REPO_ROOT / "bench_results"
+EXPECTED_MARKER = "Expected Output:"
+
+DEFAULT_MAX_NEW_TOKENS = 512
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_CONCURRENCY = 4
+
+
+# =========================
+# Data
+# =========================
+def load_records(path: str) -> List[Dict[str, Any]]:
+    out = []
+    for n, line in enumerate(Path(path).read_text(encoding="utf-8").splitlines(), 1):
+        if not line.strip():
+            continue
+        obj = json.loads(line)
+        if "prompt" in obj:
+            prompt, expected = obj["prompt"], obj.get("expected")
+        else:
+            text = obj.get("text", "")
+            i = text.find(EXPECTED_MARKER)
+            if i < 0:
+                prompt, expected = text, None
+            else:
+                prompt = text[:i + len(EXPECTED_MARKER)]
+                try:
+                    expected = json.loads(extract_first_json(text[i:]))
+                except ValueError:
+                    expected = None
+        if isinstance(expected, str):
+            expected = json.loads(expected)
+        out.append({"id": obj.get("id", f"{Path(path).name}:{n}"), "prompt": prompt, "expected": expected})
+    return out
+
+
+# =========================
+# Backends
+# =========================
+# each returns (outputs aligned with records: {text, new_tokens, latency_s, error}, wall seconds)
+def _run_concurrent(call: Callable[[Dict[str, Any]], Dict[str, Any]], records: List[Dict[str, Any]], concurrency: int):
+    def one(rec):
+        t0 = time.perf_counter()
+        try:
+            out = call(rec)
+            out.setdefault("error", None)
+        except Exception as e:
+            out = {"text": "", "new_tokens": 0, "error": f"{type(e).__name__}: {str(e)[:200]}"}
+        out["latency_s"] = round(time.perf_counter() - t0, 3)
+        return out
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        outputs = list(pool.map(one, records))
+    return outputs, time.perf_counter() - t0
+
+
+def run_local(name: str, records: List[Dict[str, Any]], args: argparse.Namespace):
+    import local_infer
+
+    if name == "tiny":
+        model, tokenizer = local_infer.tiny_random_model()
+    else:
+        model, tokenizer = local_infer.load_model(args.base_model, None if name == "base" else name)
+    try:
+        results, stats = local_infer.generate(
+            model, tokenizer, [r["prompt"] for r in records],
+            max_new_tokens=args.max_new_tokens, batch_size=args.batch_size,
+        )
+    finally:
+        del model
+        if local_infer.torch.cuda.is_available():
+            local_infer.torch.cuda.empty_cache()
+    outputs = [{"text": r["text"], "new_tokens": r["new_tokens"], "latency_s": r["latency_s"], "error": None}
+               for r in results]
+    return outputs, stats["seconds"]
+
+
+def run_openai(name: str, records: List[Dict[str, Any]], args: argparse.Namespace):
+    from tools.llm import local_client
+
+    def call(rec):
+        res = local_client.completion(rec["prompt"], model=name or None, temperature=0.0,
+                                      max_tokens=args.max_new_tokens, retries=0)
+        return {"text": res["text"], "new_tokens": int(res["usage"].get("completion_tokens", 0))}
+
+    return _run_concurrent(call, records, args.concurrency)
+
+
+def run_standin(name: str, records: List[Dict[str, Any]], args: argparse.Namespace):
+    def call(rec):
+        time.sleep(args.standin_delay_ms / 1000.0)
+        text = json.dumps(rec["expected"], ensure_ascii=False) if rec["expected"] is not None else ""
+        return {"text": text, "new_tokens": len(text) // 4}  # ~4 chars/token
+
+    return _run_concurrent(call, records, args.concurrency)
+
+
+BACKENDS = {"local": run_local, "openai": run_openai, "standin": run_standin}
+
+
+# =========================
+# Scoring
+# =========================
+def score(text: str, expected: Optional[Any]) -> Dict[str, Any]:
+    try:
+        parsed = json.loads(extract_first_json(text))
+    except ValueError as e:
+        return {"json_ok": False, "valid": False, "ref_match": False if expected is not None else None,
+                "error": f"json: {e}"}
+    error = validate(parsed)
+    return {
+        "json_ok": True,
+        "valid": error is None,
+        "ref_match": (parsed == expected) if expected is not None else None,
+        "error": error,
+    }
+
+
+def _pct(sorted_vals: List[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    i = min(len(sorted_vals) - 1, int(round(p / 100.0 * (len(sorted_vals) - 1))))
+    return round(sorted_vals[i], 1)
+
+
+def summarize(rows: List[Dict[str, Any]], wall_s: float) -> Dict[str, Any]:
+    n = len(rows)
+    lat = sorted(r["latency_s"] * 1000.0 for r in rows)
+    with_ref = [r for r in rows if r["ref_match"] is not None]
+    tokens = sum(r["new_tokens"] for r in rows)
+    errors = Counter(r["backend_error"] or r["error"] for r in rows if not r["valid"])
+    return {
+        "n": n,
+        "backend_errors": sum(1 for r in rows if r["backend_error"]),
+        "json_rate": round(sum(r["json_ok"] for r in rows) / n, 3) if n else 0.0,
+        "valid_rate": round(sum(r["valid"] for r in rows) / n, 3) if n else 0.0,
+        "ref_match_rate": round(sum(r["ref_match"] for r in with_ref) / len(with_ref), 3) if with_ref else None,
+        "latency_ms": {"p50": _pct(lat, 50), "p90": _pct(lat, 90), "p99": _pct(lat, 99),
+                       "max": round(lat[-1], 1) if lat else 0.0},
+        "new_tokens": tokens,
+        "wall_s": round(wall_s, 3),
+        "tokens_per_s": round(tokens / wall_s, 1) if wall_s else 0.0,
+        "top_errors": errors.most_common(3),
+    }
+
+
+def evaluate(target: str, records: List[Dict[str, Any]], args: argparse.Namespace) -> Dict[str, Any]:
+    backend, _, name = target.partition(":")
+    if backend not in BACKENDS:
+        raise SystemExit(f"unknown backend {backend!r} in target {target!r} (use {', '.join(BACKENDS)})")
+    if backend == "local" and not name:
+        name = "base"
+    if backend == "openai" and not name:
+        name = os.getenv("LOCAL_LLM_MODEL", "")
+
+    outputs, wall_s = BACKENDS[backend](name, records, args)
+    rows = []
+    for rec, out in zip(records, outputs):
+        s = score(out["text"], rec["expected"]) if not out["error"] else {
+            "json_ok": False, "valid": False, "ref_match": False if rec["expected"] is not None else None,
+            "error": None}
+        rows.append({"id": rec["id"], "text": out["text"], "new_tokens": out["new_tokens"],
+                     "latency_s": out["latency_s"], "backend_error": out["error"], **s})
+    return {"target": target, "summary": summarize(rows, wall_s), "records": rows}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Evaluate base model / LoRA adapters on a held-out prompt set.")
+    ap.add_argument("--data", required=True, help="held-out JSONL ({'prompt','expected'} or training-style {'text'})")
+    ap.add_argument("-t", "--target", action="append", default=[], help="backend[:name], repeatable (default local:base)")
+    ap.add_argument("--limit", type=int, default=0, help="only the first N records")
+    ap.add_argument("--base-model", default=BASE_MODEL)
+    ap.add_argument("--max-new-tokens", type=int, default=DEFAULT_MAX_NEW_TOKENS)
+    ap.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="local backend batch size")
+    ap.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="openai/standin in-flight requests")
+    ap.add_argument("--standin-delay-ms", type=float, default=0.0)
+    ap.add_argument("--min-valid", type=float, default=None, help="exit 1 if any target's valid rate is below this")
+    ap.add_argument("--out", default="", help=f"report path (default {RESULTS_DIR.name}/adapter_eval_<ts>.json)")
+    args = ap.parse_args(argv)
+
+    records = load_records(args.data)
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        ap.error(f"no records in {args.data}")
+    targets = args.target or ["local:base"]
+
+    reports = []
+    for target in targets:
+        print(f"EVAL_START: target={target} records={len(records)}")
+        rep = evaluate(target, records, args)
+        s = rep["summary"]
+        ref = f"{s['ref_match_rate']:.0%}" if s["ref_match_rate"] is not None else "-"
+        print(f"EVAL: target={target} valid={s['valid_rate']:.0%} json={s['json_rate']:.0%} ref={ref} "
+              f"p50={s['latency_ms']['p50']}ms p90={s['latency_ms']['p90']}ms p99={s['latency_ms']['p99']}ms "
+              f"tokens={s['new_tokens']} tokens_per_s={s['tokens_per_s']} backend_errors={s['backend_errors']}")
+        for err, count in s["top_errors"]:
+            print(f"  {count}x {err}")
+        reports.append(rep)
+
+    if len(reports) > 1:
+        base = reports[0]["summary"]
+        for rep in reports[1:]:
+            s = rep["summary"]
+            print(f"EVAL_DELTA: {rep['target']} vs {reports[0]['target']}: "
+                  f"valid {s['valid_rate'] - base['valid_rate']:+.0%} "
+                  f"p50 {s['latency_ms']['p50'] - base['latency_ms']['p50']:+.1f}ms "
+                  f"tokens_per_s {s['tokens_per_s'] - base['tokens_per_s']:+.1f}")
+
+    out_path = Path(args.out) if args.out else RESULTS_DIR / f"adapter_eval_{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps({
+        "data": args.data,
+        "base_model": args.base_model,
+        "max_new_tokens": args.max_new_tokens,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "targets": reports,
+    }, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"EVAL_REPORT: {out_path}")
+
+    if args.min_valid is not None and any(r["summary"]["valid_rate"] < args.min_valid for r in reports):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,353 @@
+"""
+Local batched generation for the base model / LoRA adapter (transformers + peft).
+
+  - KV cache on: DeepSeek-V2's remote modeling code still calls DynamicCache
+    APIs newer transformers removed (seen_tokens, get_max_length,
+    get_usable_length). patch_dynamic_cache() puts them back, so we no longer
+    need use_cache=False (which re-runs the whole prefix for every new token).
+  - many prompts per forward pass: left padding, prompts bucketed by length
+  - greedy (default) or sampling; per-row early exit on EOS or stop strings
+  - reports new tokens and tokens/s per batch and overall
+
+  python lora/local_infer.py --prompt "..." [--adapter lora/out/adapter]
+  python lora/local_infer.py --prompts prompts.jsonl --batch-size 8 --stop "\\n\\n\\n" --out results.jsonl
+  python lora/local_infer.py --tiny --prompt "hello"      # random-weight tiny model, CPU, offline
+  python lora/local_infer.py --tiny-hub --prompt "hello"  # same, from the base model's Hub config + remote code
+
+--tiny builds a randomly initialised DeepSeek MLA/MoE model from the checked-in
+lora/tiny_model/config.json (transformers' built-in deepseek_v3, a few layers and
+experts, small dims) with a character-level tokenizer, so the whole path (cache,
+padding, stops) runs on CPU in seconds without network. --tiny-hub shrinks the
+base model's own config instead (fetches config, tokenizer and remote code) to
+also exercise the DynamicCache patch. lora/test_local_infer.py runs the
+offline model under pytest.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import torch
+from transformers import AutoConfig, AutoModelForCausalLM, AutoTokenizer, StoppingCriteria, StoppingCriteriaList
+
+BASE_MODEL = "deepseek-ai/DeepSeek-Coder-V2-Lite-Instruct"
+ADAPTER_PATH = "lora/out/adapter"
+
+TINY_CONFIG_DIR = Path(__file__).resolve().parent / "tiny_model"
+
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_MAX_NEW_TOKENS = 512
+
+# config fields shrunk for --tiny (only the ones the config actually has are touched)
+TINY_OVERRIDES = {
+    "num_hidden_layers": 2,
+    "hidden_size": 64,
+    "intermediate_size": 128,
+    "moe_intermediate_size": 32,
+    "num_attention_heads": 4,
+    "num_key_value_heads": 4,
+    "n_routed_experts": 4,
+    "n_shared_experts": 1,
+    "num_experts_per_tok": 2,
+    "topk_group": 1,
+    "n_group": 1,
+    "first_k_dense_replace": 1,
+    "kv_lora_rank": 16,
+    "q_lora_rank": None,
+    "qk_rope_head_dim": 8,
+    "qk_nope_head_dim": 8,
+    "v_head_dim": 8,
+    "head_dim": 16,
+    "max_position_embeddings": 2048,
+}
+
+
+# =========================
+# Cache compatibility
+# =========================
+def patch_dynamic_cache() -> None:
+    """Re-add the DynamicCache methods older remote modeling code expects (idempotent)."""
+    try:
+        from transformers.cache_utils import DynamicCache
+    except ImportError:  # very old transformers: tuples, nothing to patch
+        return
+
+    if not hasattr(DynamicCache, "seen_tokens"):
+        DynamicCache.seen_tokens = property(lambda self: self.get_seq_length())
+
+    if not hasattr(DynamicCache, "get_max_length"):
+        def get_max_length(self) -> Optional[int]:
+            shape = getattr(self, "get_max_cache_shape", None)
+            size = shape() if shape else None
+            return size if size is not None and size > 0 else None
+        DynamicCache.get_max_length = get_max_length
+
+    if not hasattr(DynamicCache, "get_usable_length"):
+        def get_usable_length(self, new_seq_length: int, layer_idx: Optional[int] = 0) -> int:
+            previous = self.get_seq_length(layer_idx)
+            max_length = self.get_max_length()
+            if max_length is not None and previous + new_seq_length > max_length:
+                return max_length - new_seq_length
+            return previous
+        DynamicCache.get_usable_length = get_usable_length
+
+
+# =========================
+# Loading
+# =========================
+def _prepare_tokenizer(tokenizer):
+    # decoder-only batching: pad on the left so every row's last token is real
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    return tokenizer
+
+
+def load_model(
+    base_model: str = BASE_MODEL,
+    adapter: Optional[str] = None,
+    dtype: Optional[torch.dtype] = None,
+    device_map: Optional[str] = "auto",
+):
+    """(model, tokenizer) for the base model, with the LoRA adapter applied when given."""
+    patch_dynamic_cache()
+    tokenizer = _prepare_tokenizer(AutoTokenizer.from_pretrained(base_model, trust_remote_code=True))
+    if dtype is None:
+        dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+    model = AutoModelForCausalLM.from_pretrained(
+        base_model,
+        trust_remote_code=True,
+        torch_dtype=dtype,
+        device_map=device_map if torch.cuda.is_available() else None,
+    )
+    if adapter:
+        from peft import PeftModel
+
+        model = PeftModel.from_pretrained(model, adapter)
+    model.eval()
+    return model, tokenizer
+
+
+def char_tokenizer():
+    """Offline character-level tokenizer (printable ASCII + newline) for the tiny model."""
+    import string
+
+    from tokenizers import Tokenizer, decoders, models
+    from transformers import PreTrainedTokenizerFast
+
+    vocab = {"<pad>": 0, "<eos>": 1, "<unk>": 2}
+    for ch in "\n" + "".join(c for c in string.printable if c.isprintable()):
+        vocab.setdefault(ch, len(vocab))
+    # BPE without merges = one token per character
+    tok = Tokenizer(models.BPE(vocab=vocab, merges=[], unk_token="<unk>"))
+    tok.decoder = decoders.Fuse()
+    return _prepare_tokenizer(PreTrainedTokenizerFast(
+        tokenizer_object=tok, pad_token="<pad>", eos_token="<eos>", unk_token="<unk>",
+    ))
+
+
+def tiny_random_model(base_model: Optional[str] = None, seed: int = 0, dtype: torch.dtype = torch.float32):
+    """
+    Random-weight model shrunk to CPU size. Outputs are gibberish; it is for
+    exercising the generation path, not quality. Without base_model it is built
+    offline from TINY_CONFIG_DIR + char_tokenizer(); with one, from that model's
+    own (remote-code) config and tokenizer, shrunk by TINY_OVERRIDES.
+    """
+    patch_dynamic_cache()
+    torch.manual_seed(seed)
+    if base_model is None:
+        tokenizer = char_tokenizer()
+        config = AutoConfig.from_pretrained(str(TINY_CONFIG_DIR))
+        config.vocab_size = len(tokenizer)
+        config.pad_token_id, config.eos_token_id = tokenizer.pad_token_id, tokenizer.eos_token_id
+        model = AutoModelForCausalLM.from_config(config, torch_dtype=dtype)
+    else:
+        tokenizer = _prepare_tokenizer(AutoTokenizer.from_pretrained(base_model, trust_remote_code=True))
+        config = AutoConfig.from_pretrained(base_model, trust_remote_code=True)
+        for key, value in TINY_OVERRIDES.items():
+            if hasattr(config, key):
+                setattr(config, key, value)
+        if hasattr(config, "rope_scaling"):
+            config.rope_scaling = None
+        model = AutoModelForCausalLM.from_config(config, trust_remote_code=True, torch_dtype=dtype)
+    model.eval()
+    return model, tokenizer
+
+
+# =========================
+# Generation
+# =========================
+class StopOnStrings(StoppingCriteria):
+    """Marks a row done once its generated text contains any stop string (checks only a recent tail)."""
+
+    def __init__(self, tokenizer, stops: Sequence[str], prompt_len: int) -> None:
+        self.tokenizer = tokenizer
+        self.stops = [s for s in stops if s]
+        self.prompt_len = prompt_len
+        # a stop string can't span more tokens than characters (+ slack for merges)
+        self.tail = max((len(s) for s in self.stops), default=0) + 8
+        self.done: Optional[torch.Tensor] = None
+        # row -> generated length when its stop string completed; later tokens are padding
+        self.stopped_at: Dict[int, int] = {}
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        if self.done is None:
+            self.done = torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+        if self.stops:
+            gen = input_ids[:, self.prompt_len:]
+            for i in range(gen.shape[0]):
+                if not self.done[i]:
+                    text = self.tokenizer.decode(gen[i, -self.tail:], skip_special_tokens=True)
+                    if any(s in text for s in self.stops):
+                        self.done[i] = True
+                        self.stopped_at[i] = gen.shape[1]
+        # per-row result: generate() keeps padding finished rows and exits when all are done
+        return self.done.clone()
+
+
+def _truncate(text: str, stops: Sequence[str]) -> Tuple[str, bool]:
+    cut = min((text.find(s) for s in stops if s and s in text), default=-1)
+    return (text[:cut], True) if cut >= 0 else (text, False)
+
+
+def generate(
+    model,
+    tokenizer,
+    prompts: Sequence[str],
+    max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    stop: Sequence[str] = (),
+    do_sample: bool = False,
+    temperature: float = 0.7,
+    top_p: float = 0.95,
+    use_cache: bool = True,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Returns (results in prompt order, stats). Each result: text (cut at the
+    first stop string), new_tokens, finish ("eos" | "stop" | "length"), batch
+    latency_s. Prompts are bucketed by token length so padding stays small.
+    use_cache=False only exists to check cached decoding against the uncached path.
+    """
+    patch_dynamic_cache()
+    device = next(model.parameters()).device
+    eos_id = tokenizer.eos_token_id
+    order = sorted(range(len(prompts)), key=lambda i: len(tokenizer(prompts[i])["input_ids"]))
+    results: List[Optional[Dict[str, Any]]] = [None] * len(prompts)
+    stats = {"prompts": len(prompts), "batches": 0, "new_tokens": 0, "seconds": 0.0}
+
+    for start in range(0, len(order), batch_size):
+        idx = order[start:start + batch_size]
+        enc = tokenizer([prompts[i] for i in idx], return_tensors="pt", padding=True).to(device)
+        prompt_len = enc["input_ids"].shape[1]
+        stopper = StopOnStrings(tokenizer, stop, prompt_len)
+        kwargs: Dict[str, Any] = {}
+        if do_sample:
+            kwargs.update(temperature=temperature, top_p=top_p)
+
+        t0 = time.perf_counter()
+        with torch.no_grad():
+            out = model.generate(
+                **enc,
+                max_new_tokens=max_new_tokens,
+                do_sample=do_sample,
+                use_cache=use_cache,
+                pad_token_id=tokenizer.pad_token_id,
+                eos_token_id=eos_id,
+                stopping_criteria=StoppingCriteriaList([stopper]),
+                **kwargs,
+            )
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+        elapsed = time.perf_counter() - t0
+
+        gen = out[:, prompt_len:].tolist()
+        for row, i in enumerate(idx):
+            # rows that finish early are padded while the rest of the batch decodes:
+            # count only up to the stop string or the first eos
+            tokens = gen[row][:stopper.stopped_at.get(row, len(gen[row]))]
+            finish = "length"
+            if eos_id in tokens:
+                tokens = tokens[:tokens.index(eos_id)]
+                finish = "eos"
+            text, stopped = _truncate(tokenizer.decode(tokens, skip_special_tokens=True), stop)
+            if stopped:
+                finish = "stop"
+            results[i] = {"prompt": prompts[i], "text": text, "new_tokens": len(tokens), "finish": finish,
+                          "latency_s": round(elapsed, 3)}
+            stats["new_tokens"] += len(tokens)
+        stats["batches"] += 1
+        stats["seconds"] += elapsed
+
+    stats["seconds"] = round(stats["seconds"], 3)
+    stats["tokens_per_s"] = round(stats["new_tokens"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+    return results, stats
+
+
+def read_prompts(path: str) -> List[str]:
+    """JSONL with {"prompt": ...} (or {"text": ...}) per line, or plain text with one prompt per line."""
+    out = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError:
+            out.append(line)
+            continue
+        out.append((obj.get("prompt") or obj.get("text") or "") if isinstance(obj, dict) else str(obj))
+    return out
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Batched local generation with KV cache.")
+    ap.add_argument("--prompt", action="append", default=[])
+    ap.add_argument("--prompts", default="", help="JSONL ({'prompt': ...}) or text file, one prompt per line")
+    ap.add_argument("--base-model", default=BASE_MODEL)
+    ap.add_argument("--adapter", default="", help=f"LoRA adapter dir (e.g. {ADAPTER_PATH})")
+    ap.add_argument("--tiny", action="store_true", help="random-weight tiny model from the checked-in config (CPU, offline)")
+    ap.add_argument("--tiny-hub", action="store_true", help="random-weight tiny model from the base model's Hub config")
+    ap.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    ap.add_argument("--max-new-tokens", type=int, default=DEFAULT_MAX_NEW_TOKENS)
+    ap.add_argument("--stop", action="append", default=[], help="stop string (repeatable)")
+    ap.add_argument("--sample", action="store_true", help="sample instead of greedy decoding")
+    ap.add_argument("--temperature", type=float, default=0.7)
+    ap.add_argument("--out", default="", help="write results as JSONL")
+    args = ap.parse_args(argv)
+
+    prompts = list(args.prompt) + (read_prompts(args.prompts) if args.prompts else [])
+    if not prompts:
+        ap.error("no prompts (--prompt or --prompts)")
+
+    t0 = time.perf_counter()
+    if args.tiny:
+        model, tokenizer = tiny_random_model()
+        loaded = f"tiny {TINY_CONFIG_DIR}"
+    elif args.tiny_hub:
+        model, tokenizer = tiny_random_model(args.base_model)
+        loaded = f"tiny {args.base_model}"
+    else:
+        model, tokenizer = load_model(args.base_model, args.adapter or None)
+        loaded = args.base_model + (f" + {args.adapter}" if args.adapter else "")
+    print(f"MODEL_LOADED: {loaded} in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+    results, stats = generate(
+        model, tokenizer, prompts,
+        max_new_tokens=args.max_new_tokens, batch_size=args.batch_size, stop=args.stop,
+        do_sample=args.sample, temperature=args.temperature,
+    )
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    else:
+        for r in results:
+            print(r["text"])
+    print(f"GENERATED: prompts={stats['prompts']} batches={stats['batches']} new_tokens={stats['new_tokens']} "
+          f"seconds={stats['seconds']} tokens_per_s={stats['tokens_per_s']}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,6 @@
+import argparse
 import json
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
-from peft import PeftModel
+import sys
 
 BASE_MODEL = "deepseek-ai/DeepSeek-Coder-V2-Lite-Instruct"
 ADAPTER_PATH = "lora/out/adapter"
@@ -76,45 +75,44 @@ def extract_first_json(text: str) -> str:
 def main():
     # Avoid transformers importing torchvision stuff
     # (export TRANSFORMERS_NO_TORCHVISION=1 is still recommended in shell)
-    device_map = "auto"
-    dtype = torch.float16
-
-    tokenizer = AutoTokenizer.from_pretrained(BASE_MODEL, trust_remote_code=True)
-
-    base_model = AutoModelForCausalLM.from_pretrained(
-        BASE_MODEL,
-        trust_remote_code=True,
-        torch_dtype=dtype,
-        device_map=device_map,
+    ap = argparse.ArgumentParser(description="Generate test cases with the LoRA adapter and print the parsed JSON.")
+    ap.add_argument("--prompts", default="", help="JSONL ({'prompt': ...}) to run instead of the built-in PROMPT")
+    ap.add_argument("--tiny", action="store_true", help="random-weight tiny model (CPU smoke test of the pipeline)")
+    ap.add_argument("--batch-size", type=int, default=8)
+    ap.add_argument("--max-new-tokens", type=int, default=512)
+    args = ap.parse_args()
+
+    # imported here so extract_first_json stays usable without torch (eval_adapter.py)
+    from local_infer import generate, load_model, read_prompts, tiny_random_model
+
+    prompts = read_prompts(args.prompts) if args.prompts else [PROMPT]
+    if args.tiny:
+        model, tokenizer = tiny_random_model()
+    else:
+        model, tokenizer = load_model(BASE_MODEL, ADAPTER_PATH)
+
+    # Greedy (deterministic), KV cache on (local_infer patches the DynamicCache/seen_tokens
+    # crash that used to force use_cache=False), all prompts batched with left padding.
+    results, stats = generate(
+        model, tokenizer, prompts,
+        max_new_tokens=args.max_new_tokens,
+        batch_size=args.batch_size,
     )
 
-    model = PeftModel.from_pretrained(base_model, ADAPTER_PATH)
-    model.eval()
-
-    inputs = tokenizer(PROMPT, return_tensors="pt")
-    inputs = {k: v.to(model.device) for k, v in inputs.items()}
-
-    # ✅ The important fix:
-    # - do_sample=False (deterministic)
-    # - use_cache=False (avoids DynamicCache/seen_tokens crash you hit)
-    with torch.no_grad():
-        outputs = model.generate(
-            input_ids=inputs["input_ids"],
-            attention_mask=inputs.get("attention_mask", None),
-            max_new_tokens=512,
-            do_sample=False,
-            use_cache=False,
-            pad_token_id=tokenizer.eos_token_id,
-            eos_token_id=tokenizer.eos_token_id,
-        )
-
-    raw = tokenizer.decode(outputs[0], skip_special_tokens=True)
-
-    json_text = extract_first_json(raw)
-    parsed = json.loads(json_text)
+    failed = 0
+    for r in results:
+        try:
+            parsed = json.loads(extract_first_json(r["text"]))
+        except ValueError as e:
+            failed += 1
+            print(f"JSON EXTRACTION FAILED: {e} (finish={r['finish']}, new_tokens={r['new_tokens']})")
+            continue
+        print(json.dumps(parsed, indent=2, ensure_ascii=False))
 
-    print(json.dumps(parsed, indent=2, ensure_ascii=False))
+    print(f"GENERATED: prompts={stats['prompts']} new_tokens={stats['new_tokens']} "
+          f"seconds={stats['seconds']} tokens_per_s={stats['tokens_per_s']}", file=sys.stderr)
+    return 1 if failed else 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
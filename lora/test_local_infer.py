@@ -0,0 +1,84 @@
+"""
+CPU checks for local_infer.generate on the offline tiny random-weight model
+(lora/tiny_model/config.json + char tokenizer; no network, no GPU):
+
+  python -m pytest -q lora/test_local_infer.py
+
+Skipped when torch / transformers / tokenizers are not installed.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("tokenizers")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import torch  # noqa: E402
+
+import local_infer  # noqa: E402
+
+PROMPTS = ["Given a login page", "When", "Then the order total is shown\n", "ab"]
+MAX_NEW_TOKENS = 24
+
+
+@pytest.fixture(scope="module")
+def tiny():
+    try:
+        # float64: greedy argmax over random logits must not flip on rounding differences
+        return local_infer.tiny_random_model(seed=0, dtype=torch.float64)
+    except (KeyError, ValueError) as e:  # transformers too old for deepseek_v3
+        pytest.skip(f"tiny model unavailable: {e}")
+
+
+def _texts(results):
+    return [(r["text"], r["finish"]) for r in results]
+
+
+def test_cached_matches_uncached(tiny):
+    model, tokenizer = tiny
+    cached, _ = local_infer.generate(model, tokenizer, PROMPTS, max_new_tokens=MAX_NEW_TOKENS, batch_size=1)
+    uncached, _ = local_infer.generate(model, tokenizer, PROMPTS, max_new_tokens=MAX_NEW_TOKENS, batch_size=1,
+                                       use_cache=False)
+    assert _texts(cached) == _texts(uncached)
+
+
+def test_left_padded_batch_matches_single(tiny):
+    model, tokenizer = tiny
+    single, _ = local_infer.generate(model, tokenizer, PROMPTS, max_new_tokens=MAX_NEW_TOKENS, batch_size=1)
+    batched, stats = local_infer.generate(model, tokenizer, PROMPTS, max_new_tokens=MAX_NEW_TOKENS,
+                                          batch_size=len(PROMPTS))
+    assert stats["batches"] == 1
+    assert len({len(tokenizer(p)["input_ids"]) for p in PROMPTS}) > 1  # rows really are padded
+    assert [r["prompt"] for r in batched] == PROMPTS
+    assert _texts(batched) == _texts(single)
+
+
+def test_stop_string_truncates(tiny):
+    model, tokenizer = tiny
+    full, _ = local_infer.generate(model, tokenizer, PROMPTS, max_new_tokens=MAX_NEW_TOKENS, batch_size=1)
+    picked = next((r for r in full if len(r["text"]) >= 6), None)
+    if picked is None:
+        pytest.skip("tiny model ended every prompt too early to carve a stop string")
+    text = picked["text"]
+    stop = text[3:5]
+    expected = text[:text.find(stop)]
+
+    results, _ = local_infer.generate(model, tokenizer, [picked["prompt"]], max_new_tokens=MAX_NEW_TOKENS,
+                                      batch_size=1, stop=[stop])
+    assert results[0]["finish"] == "stop"
+    assert results[0]["text"] == expected
+    # decoding halted at the stop string rather than only being cut afterwards
+    assert results[0]["new_tokens"] < picked["new_tokens"]
+
+    # same prompt inside a batch whose other rows keep decoding: its padding must not be counted
+    batched, stats = local_infer.generate(model, tokenizer, PROMPTS, max_new_tokens=MAX_NEW_TOKENS,
+                                          batch_size=len(PROMPTS), stop=[stop])
+    row = batched[PROMPTS.index(picked["prompt"])]
+    assert row["finish"] == "stop"
+    assert row["text"] == expected
+    assert row["new_tokens"] == results[0]["new_tokens"]
+    assert stats["new_tokens"] == sum(r["new_tokens"] for r in batched)
@@ -1,31 +1,28 @@
 import json
-import re
 import sys
 from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import gherkin_parser  # noqa: E402
+from step_matcher import StepMatcher, extract_definitions  # noqa: E402
 
 REQUIRED_KEYS = {"feature_file", "step_definitions", "page_objects", "notes"}
+TEST_CASE_KEYS = {"sl_no", "test_case_id", "jira_ref", "description", "preconditions", "test_data", "steps", "priority"}
+
+class ValidationError(Exception):
+    pass
 
 def fail(msg):
-    print("VALIDATION_FAILED:", msg)
-    sys.exit(2)
+    raise ValidationError(msg)
 
 def validate_feature(text: str):
-    if "Feature:" not in text:
+    doc = gherkin_parser.parse(text)
+    if doc.feature is None:
         fail("feature_file missing 'Feature:'")
-    if "Scenario" not in text:
+    if not doc.scenarios:
         fail("feature_file missing 'Scenario' or 'Scenario Outline'")
-    bad_lines = []
-    for line in text.splitlines():
-        s = line.strip()
-        if not s:
-            continue
-        if s.startswith(("Feature:", "Scenario", "Scenario Outline:", "Background:", "@")):
-            continue
-        if re.match(r"^(Given|When|Then|And|But)\b", s):
-            continue
-        if s.startswith("#"):
-            continue
-        bad_lines.append(s)
+    bad_lines = [t for _, t in doc.free_text()]
     if bad_lines:
         fail(f"feature_file contains non-Gherkin lines: {bad_lines[:3]}")
 
@@ -38,23 +35,21 @@ def validate_steps(step_obj: dict, feature_text: str):
     if "@Given" not in code and "@When" not in code and "@Then" not in code:
         fail("Java step definitions missing @Given/@When/@Then annotations")
 
-    steps = []
-    for line in feature_text.splitlines():
-        s = line.strip()
-        m = re.match(r"^(Given|When|Then|And|But)\s+(.*)$", s)
-        if m:
-            steps.append(m.group(2))
+    # outline steps are matched per Examples row, with <placeholders> filled in
+    steps = [("feature_file", text, st.line) for st, text in gherkin_parser.parse(feature_text).expanded_steps()]
     if not steps:
         fail("No steps extracted from feature_file")
 
-    # lightweight check: ensure at least half steps have some corresponding annotation regex text in code
-    hits = 0
-    for st in steps:
-        token = re.sub(r'["\']', "", st).split(" ")[0]
-        if token and token in code:
-            hits += 1
-    if hits < max(1, len(steps)//2):
-        fail("Step definitions don't appear to align with feature steps (low match score)")
+    matcher = StepMatcher(extract_definitions(code, "step_definitions"))
+    report = matcher.match_all(steps)
+    if report["invalid_definitions"]:
+        bad = [f"{d['expression']} ({d['error']})" for d in report["invalid_definitions"]]
+        fail(f"Invalid step expressions: {bad[:3]}")
+    if report["unmatched"]:
+        fail(f"Feature steps without a step definition: {list(dict.fromkeys(u['text'] for u in report['unmatched']))[:5]}")
+    if report["ambiguous"]:
+        amb = list(dict.fromkeys(f"{a['text']} -> {a['definitions']}" for a in report["ambiguous"]))
+        fail(f"Ambiguous feature steps: {amb[:3]}")
 
 def validate_pages(pages):
     if not isinstance(pages, list) or len(pages) == 0:
@@ -69,6 +64,43 @@ def validate_pages(pages):
         if "By." not in p["code"] and "@FindBy" not in p["code"]:
             fail(f"page object {p['name']} missing locators (By.* or @FindBy)")
 
+def validate_test_cases(data: dict):
+    cases = data.get("test_cases")
+    if not isinstance(cases, list) or not cases:
+        fail("test_cases must be a non-empty list")
+    for i, tc in enumerate(cases, 1):
+        if not isinstance(tc, dict):
+            fail(f"test case #{i} must be an object")
+        missing = TEST_CASE_KEYS - set(tc)
+        if missing:
+            fail(f"test case #{i} missing keys: {sorted(missing)}")
+        if not isinstance(tc["steps"], list) or not tc["steps"]:
+            fail(f"test case #{i} steps must be a non-empty list")
+        for st in tc["steps"]:
+            if not isinstance(st, dict) or "action" not in st or "expected_result" not in st:
+                fail(f"test case #{i} steps must have {{action, expected_result}}")
+
+def validate(data) -> Optional[str]:
+    """First validation error for a parsed generation (test cases or artifacts), None when valid."""
+    try:
+        if not isinstance(data, dict):
+            fail("output must be a JSON object")
+        if "test_cases" in data:
+            validate_test_cases(data)
+            return None
+        missing = REQUIRED_KEYS - set(data.keys())
+        if missing:
+            fail(f"Missing keys: {sorted(missing)}")
+        validate_feature(data["feature_file"])
+        validate_steps(data["step_definitions"], data["feature_file"])
+        validate_pages(data["page_objects"])
+    except ValidationError as e:
+        return str(e)
+    except (TypeError, AttributeError, KeyError) as e:
+        # wrong value types (e.g. code as a list) are invalid output, not a crash
+        return f"malformed output: {e!r}"
+    return None
+
 def main():
     if len(sys.argv) != 2:
         print("Usage: python lora/validate_generation.py <output.json>")
@@ -76,13 +108,10 @@ def main():
 
     data = json.loads(Path(sys.argv[1]).read_text(encoding="utf-8"))
 
-    missing = REQUIRED_KEYS - set(data.keys())
-    if missing:
-        fail(f"Missing keys: {sorted(missing)}")
-
-    validate_feature(data["feature_file"])
-    validate_steps(data["step_definitions"], data["feature_file"])
-    validate_pages(data["page_objects"])
+    error = validate(data)
+    if error:
+        print("VALIDATION_FAILED:", error)
+        sys.exit(2)
 
     print("VALIDATION_PASSED")
 
@@ -0,0 +1,544 @@
+"""
+Test runners for generate-and-run loops.
+
+  runner = make_runner("/workspace/selenium-poc")        # auto: mvnd > warm JVM > mvn
+  run = runner.run(["ExampleTest"], on_case=print)       # streams TestCase results
+  runner.close()
+
+Backends (same API; same results within the limits noted below):
+  mvn   cold `mvn -q -Dtest=... test` per run (JVM start + plugin resolution + full compile)
+  mvnd  the Maven daemon: same command, but the build JVM and its plugins stay warm
+  warm  one long-lived JVM (tools/warm_runner/WarmRunner.java) that compiles only the
+        changed test sources -- plus the sources that reference their types -- into
+        target/test-classes with the javax.tools compiler API and runs JUnit through
+        the Platform Launcher. Class files of removed sources are deleted. The
+        dependency class path is resolved with Maven once per pom.xml hash.
+
+The warm runner's dependency tracking is by simple type name (java_precheck),
+not javac's own: a type referenced only by its fully qualified name is not
+followed, and only the test sources are tracked (main sources and resources are
+whatever Maven last built). When in doubt, delete target/_runner/compiled.json
+to force a full recompile.
+
+Results stream back per test case as they finish (warm) or per test class as
+Surefire writes its report (mvn/mvnd). The warm runner writes Surefire-format
+TEST-*.xml reports too, so everything reading target/surefire-reports keeps working.
+
+  python maven_runner.py [--project DIR] [--runner auto|mvn|mvnd|warm] ExampleTest [...]
+  python maven_runner.py --stdin     # one test class (comma list) per line, back to back
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+import java_precheck
+
+REPO_ROOT = Path(__file__).resolve().parent
+WARM_RUNNER_SOURCE = REPO_ROOT / "tools" / "warm_runner" / "WarmRunner.java"
+
+TEST_SOURCE_ROOT = Path("src/test/java")
+TEST_CLASSES_DIR = Path("target/test-classes")
+REPORTS_DIR = Path("target/surefire-reports")
+RUNNER_DIR = Path("target/_runner")
+# bump when the warm runner's compiled.json layout changes (forces a full recompile)
+COMPILE_STATE_VERSION = 2
+
+OnCase = Callable[["TestCase"], None]
+OnOutput = Callable[[str], None]
+
+
+class TestCase:
+    def __init__(self, classname: str, name: str, time_s: float, status: str, message: str = "") -> None:
+        self.classname = classname
+        self.name = name
+        self.time_s = time_s
+        self.status = status  # passed | failed | error | skipped
+        self.message = message
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ("passed", "skipped")
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "classname": self.classname,
+            "name": self.name,
+            "time_s": self.time_s,
+            "status": self.status,
+            "message": self.message,
+        }
+
+    def __str__(self) -> str:
+        tail = f" - {self.message.splitlines()[0]}" if self.message and not self.ok else ""
+        return f"{self.status.upper()} {self.classname}.{self.name} ({self.time_s:.3f}s){tail}"
+
+
+class TestRun:
+    def __init__(self, runner: str) -> None:
+        self.runner = runner
+        self.cases: List[TestCase] = []
+        self.compile_errors: List[str] = []
+        self.compiled: List[str] = []
+        self.compile_ms = 0
+        self.elapsed_ms = 0
+        self.returncode = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.compile_errors and all(c.ok for c in self.cases)
+
+    def counts(self) -> Dict[str, int]:
+        out = {"tests": len(self.cases), "passed": 0, "failed": 0, "error": 0, "skipped": 0}
+        for c in self.cases:
+            out[c.status] = out.get(c.status, 0) + 1
+        return out
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "runner": self.runner,
+            "ok": self.ok,
+            "returncode": self.returncode,
+            "counts": self.counts(),
+            "compiled": self.compiled,
+            "compile_errors": self.compile_errors,
+            "compile_ms": self.compile_ms,
+            "elapsed_ms": self.elapsed_ms,
+            "cases": [c.to_dict() for c in self.cases],
+        }
+
+
+# =========================
+# Surefire reports
+# =========================
+def parse_surefire_xml(path: Path) -> List[TestCase]:
+    root = ET.parse(str(path)).getroot()
+    cases = []
+    for tc in root.iter("testcase"):
+        status, message = "passed", ""
+        for tag in ("failure", "error", "skipped"):
+            el = tc.find(tag)
+            if el is not None:
+                status = "failed" if tag == "failure" else tag
+                message = el.get("message") or (el.text or "").strip()
+                break
+        cases.append(TestCase(tc.get("classname", ""), tc.get("name", ""), float(tc.get("time") or 0), status, message))
+    return cases
+
+
+def write_surefire_xml(path: Path, classname: str, cases: Sequence[TestCase]) -> None:
+    suite = ET.Element("testsuite", {
+        "name": classname,
+        "time": f"{sum(c.time_s for c in cases):.3f}",
+        "tests": str(len(cases)),
+        "errors": str(sum(c.status == "error" for c in cases)),
+        "skipped": str(sum(c.status == "skipped" for c in cases)),
+        "failures": str(sum(c.status == "failed" for c in cases)),
+    })
+    for c in cases:
+        tc = ET.SubElement(suite, "testcase", {"name": c.name, "classname": c.classname, "time": f"{c.time_s:.3f}"})
+        if c.status in ("failed", "error", "skipped"):
+            el = ET.SubElement(tc, "failure" if c.status == "failed" else c.status, {"message": c.message})
+            el.text = c.message
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    ET.ElementTree(suite).write(str(tmp), encoding="utf-8", xml_declaration=True)
+    os.replace(tmp, path)
+
+
+def _unescape(field: str) -> str:
+    # WarmRunner.escape(): \\ \t \n
+    return re.sub(r"\\(.)", lambda m: {"n": "\n", "t": "\t"}.get(m.group(1), m.group(1)), field)
+
+
+def _sha256_file(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+# =========================
+# Runners
+# =========================
+class Runner:
+    name = "base"
+
+    def __init__(self, project_dir: os.PathLike, on_output: Optional[OnOutput] = None) -> None:
+        self.project = Path(project_dir).resolve()
+        self.on_output = on_output or (lambda line: None)
+
+    def run(self, test_classes: Sequence[str], on_case: Optional[OnCase] = None) -> TestRun:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "Runner":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class MavenRunner(Runner):
+    """`mvn`/`mvnd` per run; Surefire reports are picked up as each test class finishes."""
+
+    def __init__(self, project_dir: os.PathLike, executable: str = "mvn", on_output: Optional[OnOutput] = None) -> None:
+        super().__init__(project_dir, on_output)
+        self.executable = executable
+        self.name = Path(executable).name
+
+    def run(self, test_classes: Sequence[str], on_case: Optional[OnCase] = None) -> TestRun:
+        run = TestRun(self.name)
+        t0 = time.perf_counter()
+        reports = self.project / REPORTS_DIR
+        started_ns = time.time_ns()
+        cmd = [self.executable, "-q", f"-Dtest={','.join(test_classes)}", "-Dsurefire.failIfNoSpecifiedTests=false", "test"]
+        proc = subprocess.Popen(cmd, cwd=str(self.project), stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                text=True, bufsize=1)
+
+        def pump() -> None:
+            for line in proc.stdout:
+                self.on_output(line.rstrip("\n"))
+
+        reader = threading.Thread(target=pump, daemon=True)
+        reader.start()
+
+        seen: Dict[str, int] = {}
+
+        def report_files() -> Iterable[Path]:
+            for cls in test_classes:
+                cls = cls.split("#", 1)[0]  # -Dtest=Class#method
+                # Surefire names reports by the fully qualified class; a simple name matches the suffix
+                yield reports / f"TEST-{cls}.xml"
+                yield from reports.glob(f"TEST-*.{cls}.xml")
+
+        def collect() -> None:
+            for p in set(report_files()):
+                try:
+                    mtime = p.stat().st_mtime_ns
+                except OSError:
+                    continue
+                if mtime < started_ns or seen.get(str(p)) == mtime:
+                    continue
+                try:
+                    cases = parse_surefire_xml(p)
+                except ET.ParseError:
+                    continue  # still being written; next poll
+                seen[str(p)] = mtime
+                names = {c.classname for c in cases}
+                run.cases = [c for c in run.cases if c.classname not in names] + cases
+                for c in cases:
+                    if on_case:
+                        on_case(c)
+
+        while proc.poll() is None:
+            collect()
+            time.sleep(0.2)
+        reader.join()
+        collect()
+
+        run.returncode = proc.returncode
+        run.elapsed_ms = int((time.perf_counter() - t0) * 1000)
+        return run
+
+
+class WarmJvmRunner(Runner):
+    """One persistent JVM: incremental javac (compiler API) + JUnit Platform Launcher."""
+
+    name = "warm"
+
+    def __init__(
+        self,
+        project_dir: os.PathLike,
+        source_roots: Iterable[os.PathLike] = (TEST_SOURCE_ROOT,),
+        on_output: Optional[OnOutput] = None,
+    ) -> None:
+        super().__init__(project_dir, on_output)
+        self.source_roots = [self.project / r for r in source_roots]
+        self.classes_dir = self.project / TEST_CLASSES_DIR
+        self.runner_dir = self.project / RUNNER_DIR
+        self.state_path = self.runner_dir / "compiled.json"
+        self.proc: Optional[subprocess.Popen] = None
+
+    # ---- setup ----
+    def _classpath(self) -> str:
+        """Test-scope dependency class path, resolved by Maven once per pom.xml content."""
+        cp_file = self.runner_dir / "classpath.txt"
+        key_file = self.runner_dir / "classpath.pom.sha256"
+        key = _sha256_file(self.project / "pom.xml")
+        if cp_file.exists() and key_file.exists() and key_file.read_text().strip() == key:
+            return cp_file.read_text(encoding="utf-8").strip()
+        self.runner_dir.mkdir(parents=True, exist_ok=True)
+        subprocess.run(
+            ["mvn", "-q", "dependency:build-classpath", "-Dmdep.includeScope=test", f"-Dmdep.outputFile={cp_file}"],
+            cwd=str(self.project), check=True,
+        )
+        key_file.write_text(key, encoding="utf-8")
+        return cp_file.read_text(encoding="utf-8").strip()
+
+    def _start(self) -> None:
+        deps = self._classpath()
+        helper_dir = self.runner_dir / "classes"
+        helper_key = self.runner_dir / "helper.sha256"
+        key = _sha256_file(WARM_RUNNER_SOURCE)
+        if not (helper_dir / "WarmRunner.class").exists() or not helper_key.exists() or helper_key.read_text() != key:
+            helper_dir.mkdir(parents=True, exist_ok=True)
+            subprocess.run(["javac", "-d", str(helper_dir), "-cp", deps, str(WARM_RUNNER_SOURCE)], check=True)
+            helper_key.write_text(key, encoding="utf-8")
+
+        self.proc = subprocess.Popen(
+            ["java", "-cp", os.pathsep.join([str(helper_dir), deps]), "WarmRunner"],
+            cwd=str(self.project), stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1,
+            encoding="utf-8",
+        )
+        first = self.proc.stdout.readline().strip()
+        if first != "READY":
+            raise RuntimeError(f"Warm runner failed to start: {first!r}")
+
+    def _send(self, *fields: str) -> None:
+        if self.proc is None or self.proc.poll() is not None:
+            self._start()
+        self.proc.stdin.write("\t".join(fields) + "\n")
+        self.proc.stdin.flush()
+
+    def _read(self) -> List[str]:
+        line = self.proc.stdout.readline()
+        if not line:
+            self.proc = None
+            raise RuntimeError("Warm runner JVM exited")
+        return [_unescape(p) for p in line.rstrip("\n").split("\t")]
+
+    # ---- incremental compile ----
+    def _sources(self) -> Dict[str, str]:
+        return {str(p): _sha256_file(p) for r in self.source_roots if r.is_dir() for p in sorted(r.rglob("*.java"))}
+
+    def _load_state(self) -> Optional[Dict[str, Dict]]:
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if state.get("version") != COMPILE_STATE_VERSION:
+            return None
+        return state
+
+    def _class_files(self, source: str) -> List[str]:
+        """Class files (relative to the classes dir) javac produced for a source's top-level types."""
+        unit = java_precheck.parse(Path(source).read_text(encoding="utf-8", errors="replace"))
+        pkg_dir = self.classes_dir.joinpath(*(unit.package or "").split(".")) if unit.package else self.classes_dir
+        out: List[str] = []
+        for t in unit.types:
+            for f in [pkg_dir / f"{t.name}.class", *pkg_dir.glob(f"{t.name}$*.class")]:
+                if f.exists():
+                    out.append(str(f.relative_to(self.classes_dir)))
+        return sorted(out)
+
+    def _remove_classes(self, rel_paths: Iterable[str]) -> None:
+        for rel in rel_paths:
+            try:
+                (self.classes_dir / rel).unlink()
+            except OSError:
+                pass
+
+    def _dependents(self, sources: Iterable[str], changed: Iterable[str], removed_types: Iterable[str]) -> List[str]:
+        """
+        Sources that (transitively) reference a type declared in a changed or removed
+        source, by simple name. None of this knows javac's real dependency graph:
+        it may over-select (same simple name in another package), and a type that
+        is only ever referenced fully qualified is missed -- so when a file does
+        not parse, everything is recompiled instead.
+        """
+        declared: Dict[str, Set[str]] = {}
+        refs: Dict[str, Set[str]] = {}
+        for src in sources:
+            unit = java_precheck.parse(Path(src).read_text(encoding="utf-8", errors="replace"))
+            if unit.errors:
+                return list(sources)
+            declared[src] = {t.name for t in unit.all_types()}
+            refs[src] = set(unit.referenced)
+        dirty = set(changed)
+        names = set(removed_types)
+        for src in dirty:
+            names |= declared.get(src, set())
+        while names:
+            hit = {src for src, r in refs.items() if src not in dirty and r & names}
+            dirty |= hit
+            names = set().union(*(declared[src] for src in hit)) if hit else set()
+        return sorted(dirty)
+
+    @staticmethod
+    def _type_names(class_files: Iterable[str]) -> Set[str]:
+        # a deleted source can't be parsed any more: Outer$Inner.class -> Outer, Inner (anonymous $1 skipped)
+        return {n for f in class_files for n in Path(f).stem.split("$") if n and not n.isdigit()}
+
+    def compile_changed(self, run: TestRun) -> None:
+        """
+        Recompile changed sources plus every source that references a type they
+        declare (transitively), and delete the class files of removed or
+        recompiled sources first, so a stale class can't make the warm run differ
+        from `mvn test`. Without usable state (first run, `mvn clean`, older
+        state file) all class files are dropped and everything is compiled.
+        """
+        state = self._load_state()
+        sources = self._sources()
+        if state is None or not self.classes_dir.is_dir():
+            if self.classes_dir.is_dir():
+                self._remove_classes(str(f.relative_to(self.classes_dir)) for f in self.classes_dir.rglob("*.class"))
+            state = {"version": COMPILE_STATE_VERSION, "sources": {}, "classes": {}}
+            to_compile = list(sources)
+        else:
+            old = state["sources"]
+            changed = [p for p, h in sources.items() if old.get(p) != h]
+            removed = [p for p in old if p not in sources]
+            if not changed and not removed:
+                run.compiled = []
+                return
+            # types the removed sources and the old versions of the changed ones declared
+            removed_types = self._type_names(f for p in removed + changed for f in state["classes"].get(p, []))
+            to_compile = self._dependents(list(sources), changed, removed_types)
+            for p in removed + to_compile:
+                self._remove_classes(state["classes"].pop(p, []))
+            for p in removed:
+                state["sources"].pop(p, None)
+        run.compiled = to_compile
+        if not to_compile:
+            self._save_state(state)
+            return
+
+        self._send("COMPILE", str(self.classes_dir), *to_compile)
+        while True:
+            msg = self._read()
+            if msg[0] == "DIAG" and msg[1] == "ERROR":
+                run.compile_errors.append(f"{msg[2]}:{msg[3]}: {msg[4]}")
+            elif msg[0] == "COMPILED":
+                run.compile_ms = int(msg[2])
+                break
+            elif msg[0] == "ERROR":
+                run.compile_errors.append(msg[1])
+                break
+
+        if run.compile_errors:
+            # the recompiled files lose their state entry: they (and their classes) are redone next run
+            for p in to_compile:
+                state["sources"].pop(p, None)
+            self._save_state(state)
+            return
+        for p in to_compile:
+            state["sources"][p] = sources[p]
+            state["classes"][p] = self._class_files(p)
+        self._save_state(state)
+
+    def _save_state(self, state: Dict) -> None:
+        self.runner_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_name(f".{self.state_path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp, self.state_path)
+
+    # ---- run ----
+    def run(self, test_classes: Sequence[str], on_case: Optional[OnCase] = None) -> TestRun:
+        run = TestRun(self.name)
+        t0 = time.perf_counter()
+        self.compile_changed(run)
+        if run.compile_errors:
+            for e in run.compile_errors:
+                self.on_output(f"COMPILE ERROR: {e}")
+            run.returncode = 1
+            run.elapsed_ms = int((time.perf_counter() - t0) * 1000)
+            return run
+
+        self._send("TEST", str(self.classes_dir), *test_classes)
+        while True:
+            msg = self._read()
+            if msg[0] == "CASE":
+                _, status, cls, method, ms, message = (msg + [""] * 6)[:6]
+                case = TestCase(cls, method, int(ms) / 1000.0, status, message)
+                run.cases.append(case)
+                if on_case:
+                    on_case(case)
+            elif msg[0] == "DONE":
+                break
+            elif msg[0] == "ERROR":
+                self.on_output(f"RUNNER ERROR: {msg[1]}")
+                run.returncode = 1
+                break
+
+        by_class: Dict[str, List[TestCase]] = {}
+        for c in run.cases:
+            by_class.setdefault(c.classname, []).append(c)
+        for cls, cases in by_class.items():
+            write_surefire_xml(self.project / REPORTS_DIR / f"TEST-{cls}.xml", cls, cases)
+
+        if run.returncode == 0 and not all(c.ok for c in run.cases):
+            run.returncode = 1
+        run.elapsed_ms = int((time.perf_counter() - t0) * 1000)
+        return run
+
+    def close(self) -> None:
+        if self.proc is not None and self.proc.poll() is None:
+            try:
+                self.proc.stdin.write("QUIT\n")
+                self.proc.stdin.flush()
+                self.proc.wait(timeout=10)
+            except (OSError, subprocess.TimeoutExpired):
+                self.proc.kill()
+        self.proc = None
+
+
+def make_runner(project_dir: os.PathLike, kind: str = "auto", on_output: Optional[OnOutput] = None) -> Runner:
+    """auto: mvnd when installed, else the warm JVM when a JDK is on PATH, else plain mvn."""
+    if kind == "auto":
+        if shutil.which("mvnd"):
+            kind = "mvnd"
+        elif shutil.which("java") and shutil.which("javac"):
+            kind = "warm"
+        else:
+            kind = "mvn"
+    if kind == "warm":
+        return WarmJvmRunner(project_dir, on_output=on_output)
+    if kind in ("mvn", "mvnd"):
+        return MavenRunner(project_dir, executable=kind, on_output=on_output)
+    raise ValueError(f"Unknown runner: {kind}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Run generated tests through a (warm) Maven/JVM runner.")
+    ap.add_argument("tests", nargs="*", help="test classes to run")
+    ap.add_argument("--project", default=".")
+    ap.add_argument("--runner", default="auto", choices=("auto", "mvn", "mvnd", "warm"))
+    ap.add_argument("--stdin", action="store_true", help="read test classes (comma separated) per line and run each")
+    ap.add_argument("--json", dest="json_path", default="", help="write the last run as JSON")
+    args = ap.parse_args(argv)
+
+    batches = [args.tests] if args.tests else []
+    if args.stdin:
+        batches = ([t.strip() for t in line.split(",") if t.strip()] for line in sys.stdin)
+
+    rc = 0
+    last: Optional[TestRun] = None
+    with make_runner(args.project, args.runner, on_output=print) as runner:
+        for tests in batches:
+            if not tests:
+                continue
+            last = runner.run(tests, on_case=lambda c: print(f"TEST {c}"))
+            c = last.counts()
+            print(f"RUN {'PASSED' if last.ok else 'FAILED'}: runner={last.runner} tests={c['tests']} "
+                  f"failed={c['failed']} errors={c['error']} skipped={c['skipped']} "
+                  f"compiled={len(last.compiled)} compile_ms={last.compile_ms} elapsed_ms={last.elapsed_ms}",
+                  flush=True)
+            rc = rc or (0 if last.ok else 1)
+
+    if args.json_path and last is not None:
+        Path(args.json_path).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.json_path).write_text(json.dumps(last.to_dict(), indent=2), encoding="utf-8")
+    return rc
+
+
+if __name__ == "__main__":
+    sys.exit(main())
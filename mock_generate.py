@@ -30,15 +30,15 @@ def write_feature(tc: dict):
 
 def write_steps(tc: dict):
     # Exactly 1 Given, 1 When, 1 Then. Granular helpers inside.
-    content = """package steps;
+    content = """package generated.steps;
 
 import io.cucumber.java.en.Given;
 import io.cucumber.java.en.When;
 import io.cucumber.java.en.Then;
 
-import pages.OrderHistoryPage;
-import pages.OrderDetailsPage;
-import pages.CancellationConfirmationDialog;
+import generated.pages.OrderHistoryPage;
+import generated.pages.OrderDetailsPage;
+import generated.pages.CancellationConfirmationDialog;
 
 public class CancelOrderSteps {
 
@@ -112,7 +112,7 @@ public class CancelOrderSteps {
 
 def write_pages(tc: dict):
     # Atomic public methods only (as per validator prefixes)
-    order_history = """package pages;
+    order_history = """package generated.pages;
 
 public class OrderHistoryPage {
 
@@ -125,7 +125,7 @@ public class OrderHistoryPage {
     }
 }
 """
-    order_details = """package pages;
+    order_details = """package generated.pages;
 
 public class OrderDetailsPage {
 
@@ -138,7 +138,7 @@ public class OrderDetailsPage {
     }
 }
 """
-    dialog = """package pages;
+    dialog = """package generated.pages;
 
 public class CancellationConfirmationDialog {
 
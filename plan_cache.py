@@ -0,0 +1,209 @@
+"""
+Semantic plan cache: reuse the plan of a near-duplicate task.
+
+Tasks + their strict Gherkin are embedded with the RAG MiniLM model and kept in
+a FAISS inner-product index (normalized vectors -> cosine similarity). Each
+entry points at a run in the run ledger; on a hit the stored plan is loaded
+from that run's meta and must pass the caller's validator before it is reused
+(llm_generate.revalidate_cached_plan: the plan must bind the new Gherkin, and
+its class names are re-derived from the new feature). Below the threshold the
+caller falls back to the LLM.
+
+Writers in several processes are serialized with an flock on
+generated/_cache/plan_cache/.lock, and each add() re-reads the files under it,
+so no process drops another's entries.
+
+Only entries with the same contract checksum, prompt version and model are
+eligible, so contract/prompt changes never reuse stale plans; the search widens
+past SEARCH_K until an eligible neighbour is found, and add() prunes entries a
+contract/prompt bump has superseded. Only runs whose artifacts passed
+validation are added (llm_generate.index_valid_plans). Hit rate and mean hit
+similarity are aggregated by `run_ledger.py stats`.
+
+Layout: generated/_cache/plan_cache/{index.faiss, entries.jsonl}
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: only threads of one process are serialized
+    fcntl = None
+
+import faiss
+import numpy as np
+
+import run_ledger
+from rag.retrieve import encode
+
+REPO_ROOT = Path(__file__).resolve().parent
+CACHE_DIR = REPO_ROOT / "generated" / "_cache" / "plan_cache"
+INDEX_FILE = CACHE_DIR / "index.faiss"
+ENTRIES_FILE = CACHE_DIR / "entries.jsonl"
+LOCK_FILE = CACHE_DIR / ".lock"
+
+ENABLED = os.getenv("PLAN_CACHE", "1") == "1"
+SIMILARITY_THRESHOLD = float(os.getenv("PLAN_CACHE_THRESHOLD", "0.92"))
+SEARCH_K = 8
+# a new entry with these differing from an older entry of the same model supersedes it
+PRUNE_KEYS = ("contract_checksum", "prompt_version")
+
+_LOCK = threading.Lock()
+_STATE: Optional[Tuple[Tuple[int, int], Any, List[Dict[str, Any]]]] = None
+
+
+def _embed(task: str, strict_5: str) -> np.ndarray:
+    vec = np.ascontiguousarray(encode([f"{task}\n{strict_5}"]), dtype=np.float32)
+    faiss.normalize_L2(vec)
+    return vec
+
+
+def _load(fresh: bool = False) -> Tuple[Any, List[Dict[str, Any]]]:
+    global _STATE
+    if not INDEX_FILE.exists() or not ENTRIES_FILE.exists():
+        return None, []
+    stamp = (INDEX_FILE.stat().st_mtime_ns, ENTRIES_FILE.stat().st_mtime_ns)
+    state = _STATE
+    if fresh or state is None or state[0] != stamp:
+        index = faiss.read_index(str(INDEX_FILE))
+        entries = [json.loads(l) for l in ENTRIES_FILE.read_text(encoding="utf-8").splitlines() if l.strip()]
+        # entries are written before the index: drop any tail entry whose vector never landed
+        entries = entries[:index.ntotal]
+        state = (stamp, index, entries)
+        _STATE = state
+    return state[1], state[2]
+
+
+def _in_scope(entry: Dict[str, Any], scope: Dict[str, str]) -> bool:
+    return all(entry.get(k) == v for k, v in scope.items())
+
+
+def _nearest_in_scope(
+    index: Any, entries: List[Dict[str, Any]], vec: np.ndarray, scope: Dict[str, str]
+) -> Optional[Tuple[float, Dict[str, Any]]]:
+    """
+    Most similar entry within scope. The search widens (SEARCH_K, 2x, 4x, ...)
+    until an in-scope neighbour shows up or the whole index was searched, so
+    out-of-scope near-duplicates can never hide an eligible entry.
+    """
+    k = min(SEARCH_K, len(entries))
+    while True:
+        sims, ids = index.search(vec, k)
+        for sim, i in zip(sims[0], ids[0]):
+            if 0 <= i < len(entries) and _in_scope(entries[i], scope):
+                return float(sim), entries[i]
+        if k >= len(entries):
+            return None
+        k = min(k * 2, len(entries))
+
+
+def lookup(
+    task: str,
+    strict_5: str,
+    scope: Dict[str, str],
+    validate: Callable[[Dict[str, Any]], Dict[str, Any]],
+    threshold: float = SIMILARITY_THRESHOLD,
+) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Returns (plan or None, info). `scope` holds contract_checksum/prompt_version/model;
+    `validate` re-checks the cached plan against the new Gherkin (and may adapt
+    it, e.g. class names) and returns the plan to use; it raises to reject.
+    info["status"]: disabled | empty | miss | hit | rejected
+    """
+    if not ENABLED:
+        return None, {"status": "disabled"}
+
+    with _LOCK:
+        index, entries = _load()
+    if index is None or not entries:
+        return None, {"status": "empty"}
+
+    best = _nearest_in_scope(index, entries, _embed(task, strict_5), scope)
+    if best is None:
+        return None, {"status": "miss", "similarity": None}
+
+    sim, entry = best
+    info: Dict[str, Any] = {
+        "similarity": round(sim, 4),
+        "threshold": threshold,
+        "source_run_id": entry["run_id"],
+        "source_task": entry["task"],
+    }
+    if sim < threshold:
+        return None, {**info, "status": "miss"}
+
+    meta = run_ledger.get_meta(entry["run_id"])
+    plan = ((meta or {}).get("generation") or {}).get("plan")
+    if not plan:
+        return None, {**info, "status": "rejected", "reason": "source run has no plan"}
+    try:
+        plan = validate(json.loads(json.dumps(plan)))
+    except Exception as e:
+        return None, {**info, "status": "rejected", "reason": getattr(e, "violation", None) or str(e)}
+    return plan, {**info, "status": "hit"}
+
+
+@contextmanager
+def _write_lock() -> Iterator[None]:
+    """Exclusive across threads (_LOCK) and, where flock exists, across processes."""
+    with _LOCK:
+        if fcntl is None:
+            yield
+            return
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(LOCK_FILE, "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _prune(index: Any, entries: List[Dict[str, Any]], scope: Dict[str, str]) -> Tuple[Any, List[Dict[str, Any]]]:
+    """
+    Drop entries superseded by `scope`: same model but another contract checksum
+    or prompt version can never be eligible again. Other models' entries stay.
+    """
+    stale = [
+        i for i, e in enumerate(entries)
+        if e.get("model") == scope.get("model") and any(e.get(k) != scope.get(k) for k in PRUNE_KEYS)
+    ]
+    if not stale:
+        return index, entries
+    drop = set(stale)
+    keep = [i for i in range(len(entries)) if i not in drop]
+    pruned = faiss.IndexFlatIP(index.d)
+    if keep:
+        pruned.add(np.ascontiguousarray(index.reconstruct_n(0, index.ntotal)[keep], dtype=np.float32))
+    return pruned, [entries[i] for i in keep]
+
+
+def add(task: str, strict_5: str, run_id: int, scope: Dict[str, str]) -> None:
+    """Index a validated run's plan; entries made stale by a contract/prompt bump are pruned."""
+    if not ENABLED:
+        return
+    vec = _embed(task, strict_5)
+    with _write_lock():
+        # re-read under the lock: another process may have added entries since our last load
+        index, entries = _load(fresh=True)
+        if index is None:
+            index = faiss.IndexFlatIP(vec.shape[1])
+        else:
+            index, entries = _prune(index, entries, scope)
+        index.add(vec)
+        entries = entries + [{"run_id": run_id, "task": task, **scope}]
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+        # entries first, then the index (both temp + rename); _load() trims
+        # entries to index.ntotal, so a crash in between cannot misalign them
+        tmp = ENTRIES_FILE.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries), encoding="utf-8")
+        os.replace(tmp, ENTRIES_FILE)
+
+        tmp = INDEX_FILE.with_suffix(f".{os.getpid()}.tmp")
+        faiss.write_index(index, str(tmp))
+        os.replace(tmp, INDEX_FILE)
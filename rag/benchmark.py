@@ -0,0 +1,470 @@
+# rag/benchmark.py
+"""
+Retrieval quality + latency benchmark for the rag_docs corpus.
+
+Runs the labeled query set (rag/bench_queries.json) against every
+(embedding model x index type x chunking) configuration, plus the "production"
+config -- rag.retrieve.retrieve() over the real rag_index / rag_sources.pkl
+built by rag_build.py -- and reports:
+  - recall@k and MRR
+  - query encode / index search latency percentiles (ms)
+  - index build + load time, index size on disk
+  - process RSS (current + peak)
+
+Results are written as JSON so runs can be diffed between commits:
+  python rag/benchmark.py
+  python rag/benchmark.py --scale 2000 --index flat_l2,hnsw
+  python rag/benchmark.py --compare bench_results/rag_<old>.json
+  python rag/benchmark.py --skip-production      # only the rebuilt candidate configs
+
+For "production", index_load_s is the cold load of rag_index + rag_sources.pkl
+and retrieve_ms is end-to-end retrieve() latency; --scale does not apply to it.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))  # rag.retrieve when run as a script
+RAG_DOCS_DIR = REPO_ROOT / "rag_docs"
+QUERIES_FILE = Path(__file__).resolve().parent / "bench_queries.json"
+RESULTS_DIR = REPO_ROOT / "bench_results"
+
+DEFAULT_MODELS = ["all-MiniLM-L6-v2"]
+DEFAULT_INDEXES = ["flat_l2", "flat_ip", "hnsw"]
+DEFAULT_CHUNKING = ["doc", "para"]
+DEFAULT_KS = [1, 3, 5]
+
+SYNTHETIC_PREFIX = "synthetic_"
+
+
+# =========================
+# Corpus
+# =========================
+def load_docs(docs_dir: Path = RAG_DOCS_DIR) -> List[Tuple[str, str]]:
+    files = sorted([p for p in docs_dir.glob("*.*") if p.is_file() and p.suffix.lower() in {".md", ".txt"}])
+    return [(p.name, p.read_text(encoding="utf-8", errors="ignore")) for p in files]
+
+
+def synthesize_docs(docs: List[Tuple[str, str]], count: int, seed: int = 13) -> List[Tuple[str, str]]:
+    """
+    Grow the corpus with `count` distractor docs built by shuffling lines and
+    words of the real docs. Deterministic for a given seed so results stay
+    comparable across commits.
+    """
+    if count <= 0:
+        return []
+
+    rng = random.Random(seed)
+    lines = [l.strip() for _, text in docs for l in text.splitlines() if l.strip()]
+    words = [w for l in lines for w in l.split()]
+    if not lines:
+        return []
+
+    out = []
+    for i in range(count):
+        paras = []
+        for _ in range(rng.randint(1, 3)):
+            picked = rng.sample(lines, k=min(len(lines), rng.randint(2, 5)))
+            mutated = []
+            for l in picked:
+                toks = l.split()
+                # swap a few tokens so distractors are near-duplicates, not copies
+                for _ in range(max(1, len(toks) // 4)):
+                    toks[rng.randrange(len(toks))] = rng.choice(words)
+                mutated.append(" ".join(toks))
+            paras.append("\n".join(mutated))
+        out.append((f"{SYNTHETIC_PREFIX}{i:06d}.txt", "\n\n".join(paras)))
+    return out
+
+
+def chunk_docs(docs: List[Tuple[str, str]], chunking: str) -> List[Dict[str, Any]]:
+    """
+    doc:  one chunk per file (what rag_build.py / rag/retrieve.py index today)
+    para: split on blank lines (what rag/build_index.py does)
+    """
+    chunks: List[Dict[str, Any]] = []
+    for name, text in docs:
+        if chunking == "doc":
+            chunks.append({"doc": name, "chunk": 0, "text": text})
+            continue
+        for i, part in enumerate(text.split("\n\n")):
+            part = part.strip()
+            if part:
+                chunks.append({"doc": name, "chunk": i, "text": part})
+    return chunks
+
+
+def load_queries(path: Path = QUERIES_FILE) -> List[Dict[str, Any]]:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    return data["queries"]
+
+
+# =========================
+# Metrics
+# =========================
+def _is_relevant(chunk: Dict[str, Any], expected: List[str], chunking: str) -> bool:
+    for e in expected:
+        doc, _, ch = e.partition("#")
+        if chunk["doc"] != doc:
+            continue
+        # whole-doc chunking cannot distinguish paragraphs: a doc hit is a hit
+        if not ch or chunking == "doc" or int(ch) == chunk["chunk"]:
+            return True
+    return False
+
+
+def _expected_units(expected: List[str], chunking: str) -> int:
+    if chunking == "doc":
+        return len({e.partition("#")[0] for e in expected})
+    return len(expected)
+
+
+def score_ranking(ranked: List[Dict[str, Any]], expected: List[str], chunking: str, ks: List[int]) -> Dict[str, Any]:
+    hits_at: Dict[int, float] = {}
+    total = max(1, _expected_units(expected, chunking))
+    seen = set()
+    rr = 0.0
+    for rank, ch in enumerate(ranked, start=1):
+        if not _is_relevant(ch, expected, chunking):
+            continue
+        unit = ch["doc"] if chunking == "doc" else (ch["doc"], ch["chunk"])
+        if rr == 0.0:
+            rr = 1.0 / rank
+        if unit in seen:
+            continue
+        seen.add(unit)
+        for k in ks:
+            if rank <= k:
+                hits_at[k] = hits_at.get(k, 0) + 1
+    return {"rr": rr, "recall": {k: min(1.0, hits_at.get(k, 0) / total) for k in ks}}
+
+
+def percentiles(values_ms: List[float]) -> Dict[str, float]:
+    if not values_ms:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0}
+    arr = np.asarray(values_ms, dtype=np.float64)
+    return {
+        "p50": round(float(np.percentile(arr, 50)), 3),
+        "p95": round(float(np.percentile(arr, 95)), 3),
+        "p99": round(float(np.percentile(arr, 99)), 3),
+        "mean": round(float(arr.mean()), 3),
+    }
+
+
+def rss_mb() -> Dict[str, float]:
+    current = 0.0
+    try:
+        pages = int(Path("/proc/self/statm").read_text().split()[1])
+        current = pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except Exception:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    return {"current": round(current, 1), "peak": round(peak_mb, 1)}
+
+
+# =========================
+# Index
+# =========================
+def build_index(kind: str, embeddings: np.ndarray) -> "faiss.Index":
+    dim = embeddings.shape[1]
+    if kind == "flat_l2":
+        index = faiss.IndexFlatL2(dim)
+    elif kind == "flat_ip":
+        # cosine similarity: vectors are normalized by the caller
+        index = faiss.IndexFlatIP(dim)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, 32)
+        index.hnsw.efSearch = 64
+    else:
+        raise ValueError(f"Unknown index type: {kind}")
+    index.add(embeddings)
+    return index
+
+
+def _prepare(kind: str, vecs: np.ndarray) -> np.ndarray:
+    vecs = np.ascontiguousarray(vecs, dtype=np.float32)
+    if kind == "flat_ip":
+        faiss.normalize_L2(vecs)
+    return vecs
+
+
+def run_config(
+    model: SentenceTransformer,
+    model_name: str,
+    kind: str,
+    chunking: str,
+    chunks: List[Dict[str, Any]],
+    embeddings: np.ndarray,
+    queries: List[Dict[str, Any]],
+    ks: List[int],
+    repeats: int,
+) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    index = build_index(kind, _prepare(kind, embeddings))
+    build_s = time.perf_counter() - t0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.index")
+        faiss.write_index(index, path)
+        size_bytes = os.path.getsize(path)
+        t0 = time.perf_counter()
+        index = faiss.read_index(path)
+        load_s = time.perf_counter() - t0
+
+    top = min(max(ks), len(chunks))
+    encode_ms: List[float] = []
+    search_ms: List[float] = []
+    rr_sum = 0.0
+    recall_sum = {k: 0.0 for k in ks}
+    per_query = []
+
+    for q in queries:
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            qvec = model.encode([q["query"]], convert_to_numpy=True)
+            encode_ms.append((time.perf_counter() - t0) * 1000)
+
+            qvec = _prepare(kind, qvec)
+            t0 = time.perf_counter()
+            _, ids = index.search(qvec, top)
+            search_ms.append((time.perf_counter() - t0) * 1000)
+
+        ranked = [chunks[i] for i in ids[0] if 0 <= i < len(chunks)]
+        s = score_ranking(ranked, q["expected"], chunking, ks)
+        rr_sum += s["rr"]
+        for k in ks:
+            recall_sum[k] += s["recall"][k]
+        per_query.append({
+            "query": q["query"],
+            "rr": round(s["rr"], 4),
+            "top": [f"{c['doc']}#{c['chunk']}" for c in ranked[:max(ks)]],
+        })
+
+    n = max(1, len(queries))
+    return {
+        "model": model_name,
+        "index": kind,
+        "chunking": chunking,
+        "corpus_chunks": len(chunks),
+        "mrr": round(rr_sum / n, 4),
+        "recall": {f"@{k}": round(recall_sum[k] / n, 4) for k in ks},
+        "encode_ms": percentiles(encode_ms),
+        "search_ms": percentiles(search_ms),
+        "index_build_s": round(build_s, 4),
+        "index_load_s": round(load_s, 4),
+        "index_bytes": size_bytes,
+        "rss_mb": rss_mb(),
+        "queries": per_query,
+    }
+
+
+def run_production(queries: List[Dict[str, Any]], ks: List[int], repeats: int) -> Optional[Dict[str, Any]]:
+    """The retriever llm_generate actually calls, over the index on disk (None if not built)."""
+    from rag import retrieve as prod
+
+    if not prod.INDEX_FILE.exists() or not prod.SOURCES_FILE.exists():
+        print(f"RAG_BENCH_SKIP production: build {prod.INDEX_FILE.name} / {prod.SOURCES_FILE.name} with rag_build.py")
+        return None
+
+    t0 = time.perf_counter()
+    prod._get_model()
+    model_load_s = time.perf_counter() - t0
+
+    # cold index load, as after a restart or a rag_build.py rewrite
+    prod._INDEX_STATE = None
+    t0 = time.perf_counter()
+    index, sources = prod._get_index()
+    load_s = time.perf_counter() - t0
+
+    top = min(max(ks), len(sources))
+    encode_ms: List[float] = []
+    search_ms: List[float] = []
+    retrieve_ms: List[float] = []
+    rr_sum = 0.0
+    recall_sum = {k: 0.0 for k in ks}
+    per_query = []
+
+    for q in queries:
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            qvec = prod.encode([q["query"]])
+            encode_ms.append((time.perf_counter() - t0) * 1000)
+            t0 = time.perf_counter()
+            index.search(qvec, top)
+            search_ms.append((time.perf_counter() - t0) * 1000)
+
+            t0 = time.perf_counter()
+            ranked = prod.retrieve(q["query"], top_k=top)
+            retrieve_ms.append((time.perf_counter() - t0) * 1000)
+
+        s = score_ranking(ranked, q["expected"], "doc", ks)
+        rr_sum += s["rr"]
+        for k in ks:
+            recall_sum[k] += s["recall"][k]
+        per_query.append({
+            "query": q["query"],
+            "rr": round(s["rr"], 4),
+            "top": [f"{c['doc']}#{c['chunk']}" for c in ranked[:max(ks)]],
+        })
+
+    n = max(1, len(queries))
+    return {
+        "model": prod.EMBED_MODEL,
+        "index": "production",
+        "chunking": "doc",
+        "corpus_chunks": len(sources),
+        "mrr": round(rr_sum / n, 4),
+        "recall": {f"@{k}": round(recall_sum[k] / n, 4) for k in ks},
+        "encode_ms": percentiles(encode_ms),
+        "search_ms": percentiles(search_ms),
+        "retrieve_ms": percentiles(retrieve_ms),
+        "index_build_s": None,
+        "index_load_s": round(load_s, 4),
+        "index_bytes": os.path.getsize(prod.INDEX_FILE) + os.path.getsize(prod.SOURCES_FILE),
+        "model_load_s": round(model_load_s, 4),
+        "rss_mb": rss_mb(),
+        "queries": per_query,
+    }
+
+
+def _print_result(r: Dict[str, Any]) -> None:
+    print(
+        f"RAG_BENCH {_config_key(r)} chunks={r['corpus_chunks']} mrr={r['mrr']:.3f} "
+        + " ".join(f"recall{k}={v:.3f}" for k, v in r["recall"].items())
+        + f" search_p95={r['search_ms']['p95']:.2f}ms encode_p95={r['encode_ms']['p95']:.2f}ms"
+        + (f" retrieve_p95={r['retrieve_ms']['p95']:.2f}ms" if "retrieve_ms" in r else "")
+        + f" load={r['index_load_s']:.4f}s rss={r['rss_mb']['current']}MB"
+    )
+
+
+# =========================
+# Output / compare
+# =========================
+def _git_sha() -> str:
+    try:
+        r = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=str(REPO_ROOT), capture_output=True, text=True)
+        return (r.stdout or "").strip() or "nogit"
+    except Exception:
+        return "nogit"
+
+
+def _config_key(r: Dict[str, Any]) -> str:
+    return f"{r['model']}|{r['index']}|{r['chunking']}"
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    old_by = {_config_key(r): r for r in old.get("results", [])}
+    lines = []
+    for r in new.get("results", []):
+        key = _config_key(r)
+        o = old_by.get(key)
+        if not o:
+            lines.append(f"{key}: NEW")
+            continue
+        parts = [f"mrr {o['mrr']:.3f}->{r['mrr']:.3f}"]
+        for k, v in r["recall"].items():
+            parts.append(f"recall{k} {o['recall'].get(k, 0):.3f}->{v:.3f}")
+        parts.append(f"search_p95 {o['search_ms']['p95']:.2f}->{r['search_ms']['p95']:.2f}ms")
+        parts.append(f"encode_p95 {o['encode_ms']['p95']:.2f}->{r['encode_ms']['p95']:.2f}ms")
+        if "retrieve_ms" in r and "retrieve_ms" in o:
+            parts.append(f"retrieve_p95 {o['retrieve_ms']['p95']:.2f}->{r['retrieve_ms']['p95']:.2f}ms")
+        parts.append(f"load {o['index_load_s']:.4f}->{r['index_load_s']:.4f}s")
+        lines.append(f"{key}: " + ", ".join(parts))
+    return lines
+
+
+def _csv(s: str) -> List[str]:
+    return [x.strip() for x in s.split(",") if x.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark RAG retrieval quality and latency.")
+    ap.add_argument("--models", default=",".join(DEFAULT_MODELS), help="comma-separated SentenceTransformer models")
+    ap.add_argument("--index", default=",".join(DEFAULT_INDEXES), help="flat_l2,flat_ip,hnsw")
+    ap.add_argument("--chunking", default=",".join(DEFAULT_CHUNKING), help="doc,para")
+    ap.add_argument("--k", default=",".join(str(k) for k in DEFAULT_KS), help="recall cut-offs")
+    ap.add_argument("--scale", type=int, default=0, help="add N synthetic distractor docs")
+    ap.add_argument("--seed", type=int, default=13)
+    ap.add_argument("--repeats", type=int, default=3, help="timing repeats per query")
+    ap.add_argument("--queries", default=str(QUERIES_FILE))
+    ap.add_argument("--out", default="", help="output JSON path (default bench_results/rag_<sha>_<ts>.json)")
+    ap.add_argument("--compare", default="", help="previous results JSON to diff against")
+    ap.add_argument("--skip-production", action="store_true", help="don't benchmark rag.retrieve over rag_index")
+    args = ap.parse_args(argv)
+
+    ks = sorted({int(k) for k in _csv(args.k)})
+    queries = load_queries(Path(args.queries))
+    docs = load_docs()
+    if not docs:
+        raise RuntimeError("No documents found in rag_docs (.md/.txt)")
+    docs = docs + synthesize_docs(docs, args.scale, seed=args.seed)
+
+    results = []
+    for model_name in _csv(args.models):
+        t0 = time.perf_counter()
+        model = SentenceTransformer(model_name)
+        model_load_s = time.perf_counter() - t0
+
+        for chunking in _csv(args.chunking):
+            chunks = chunk_docs(docs, chunking)
+            t0 = time.perf_counter()
+            embeddings = model.encode([c["text"] for c in chunks], convert_to_numpy=True, batch_size=64)
+            corpus_encode_s = time.perf_counter() - t0
+
+            for kind in _csv(args.index):
+                r = run_config(model, model_name, kind, chunking, chunks, embeddings, queries, ks, args.repeats)
+                r["model_load_s"] = round(model_load_s, 4)
+                r["corpus_encode_s"] = round(corpus_encode_s, 4)
+                results.append(r)
+                _print_result(r)
+
+    if not args.skip_production:
+        r = run_production(queries, ks, args.repeats)
+        if r is not None:
+            results.append(r)
+            _print_result(r)
+
+    sha = _git_sha()
+    out = {
+        "timestamp_utc": datetime.now(timezone.utc).isoformat(),
+        "git_sha": sha,
+        "scale": args.scale,
+        "seed": args.seed,
+        "num_queries": len(queries),
+        "ks": ks,
+        "results": results,
+    }
+
+    out_path = Path(args.out) if args.out else RESULTS_DIR / f"rag_{sha}_{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(out, indent=2), encoding="utf-8")
+    print("RAG_BENCH_WRITTEN:", out_path)
+
+    if args.compare:
+        old = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        print(f"=== COMPARE {old.get('git_sha', '?')} -> {sha} ===")
+        for line in compare(old, out):
+            print(line)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,8 @@
 # rag/retrieve.py
+import pickle
+import threading
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
 import faiss
 from sentence_transformers import SentenceTransformer
@@ -16,22 +18,62 @@ RAG_DOCS_DIR = REPO_ROOT / "rag_docs"
 EMBED_MODEL = "all-MiniLM-L6-v2"
 
 
-def retrieve(query: str, top_k: int = 3) -> List[Dict[str, Any]]:
+# =========================
+# Warm state (process-wide)
+# =========================
+# The embedding model is the expensive part (seconds); index/sources are reloaded
+# only when rag_build.py rewrites them (mtime change).
+_LOCK = threading.Lock()
+_MODEL: Optional[SentenceTransformer] = None
+_INDEX_STATE: Optional[Tuple[Tuple[float, float], Any, List[str]]] = None
+
+
+def _get_model() -> SentenceTransformer:
+    global _MODEL
+    if _MODEL is None:
+        with _LOCK:
+            if _MODEL is None:
+                _MODEL = SentenceTransformer(EMBED_MODEL)
+    return _MODEL
+
+
+def _get_index() -> Tuple[Any, List[str]]:
+    global _INDEX_STATE
     if not INDEX_FILE.exists():
         raise FileNotFoundError(f"Missing FAISS index file: {INDEX_FILE}")
 
     if not SOURCES_FILE.exists():
         raise FileNotFoundError(f"Missing sources file: {SOURCES_FILE}")
 
-    # Load index
-    index = faiss.read_index(str(INDEX_FILE))
+    stamp = (INDEX_FILE.stat().st_mtime, SOURCES_FILE.stat().st_mtime)
+    state = _INDEX_STATE
+    if state is None or state[0] != stamp:
+        with _LOCK:
+            state = _INDEX_STATE
+            if state is None or state[0] != stamp:
+                index = faiss.read_index(str(INDEX_FILE))
+                sources: List[str] = pickle.loads(SOURCES_FILE.read_bytes())
+                state = (stamp, index, sources)
+                _INDEX_STATE = state
+    return state[1], state[2]
+
 
-    # Load sources
-    import pickle
-    sources: List[str] = pickle.loads(SOURCES_FILE.read_bytes())
+def encode(texts: List[str]) -> Any:
+    """Embed texts with the shared warm model (float32 numpy array, one row per text)."""
+    return _get_model().encode(texts, convert_to_numpy=True)
+
+
+def warm_up() -> None:
+    """Load model + index ahead of the first query (used by long-running services)."""
+    _get_model()
+    _get_index()
+
+
+def retrieve(query: str, top_k: int = 3) -> List[Dict[str, Any]]:
+    index, sources = _get_index()
 
     # Embed query
-    model = SentenceTransformer(EMBED_MODEL)
+    model = _get_model()
     qvec = model.encode([query], convert_to_numpy=True)
 
     k = min(top_k, len(sources))
@@ -55,4 +97,4 @@ def retrieve(query: str, top_k: int = 3) -> List[Dict[str, Any]]:
             "score": float(distances[0][rank]),
         })
 
-    return results
\ No newline at end of file
+    return results
@@ -1,8 +1,11 @@
 from pathlib import Path
+import os
 import pickle
 import hashlib
+from typing import Callable, Dict, List, Optional
 
 import faiss
+import numpy as np
 from sentence_transformers import SentenceTransformer
 
 
@@ -13,6 +16,9 @@ SOURCES_PATH = Path("rag_sources.pkl")
 DRIFT_MARKER = Path("rag_contracts.sha256")
 CONTRACTS_SOURCE = RAG_DOCS_DIR / "contracts.md"
 
+# per-document embeddings keyed by content sha256: a rebuild only encodes new/changed docs
+EMBED_CACHE_PATH = Path("rag_embeddings.pkl")
+
 MODEL_NAME = "all-MiniLM-L6-v2"
 
 
@@ -27,7 +33,30 @@ def load_sources():
     return files
 
 
-def main():
+def _load_embed_cache() -> Dict[str, np.ndarray]:
+    try:
+        data = pickle.loads(EMBED_CACHE_PATH.read_bytes())
+        if data.get("model") == MODEL_NAME:
+            return data["vectors"]
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError, AttributeError):
+        pass
+    return {}
+
+
+def _replace(path: Path, write: Callable[[str], None]) -> None:
+    # temp + rename: rag.retrieve reloads on mtime and must never see a half-written file
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    write(str(tmp))
+    os.replace(tmp, path)
+
+
+def build(encode: Optional[Callable[[List[str]], np.ndarray]] = None, verbose: bool = True) -> Dict[str, object]:
+    """
+    (Re)build rag_index + rag_sources.pkl. Only documents whose content hash is
+    not in the embedding cache are encoded; the flat index itself is rebuilt
+    from the cached vectors (cheap). `encode` lets long-running callers pass a
+    warm model.
+    """
     if not RAG_DOCS_DIR.exists():
         raise FileNotFoundError(f"Missing folder: {RAG_DOCS_DIR.resolve()}")
 
@@ -38,33 +67,55 @@ def main():
     if not files:
         raise RuntimeError("No documents found in rag_docs (.md/.txt)")
 
-    model = SentenceTransformer(MODEL_NAME)
-
     texts = [p.read_text(encoding="utf-8", errors="ignore") for p in files]
-    embeddings = model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
-
+    hashes = [hashlib.sha256(t.encode("utf-8")).hexdigest() for t in texts]
+
+    cache = _load_embed_cache()
+    missing = [i for i, h in enumerate(hashes) if h not in cache]
+    if missing:
+        if encode is None:
+            model = SentenceTransformer(MODEL_NAME)
+            encode = lambda batch: model.encode(batch, convert_to_numpy=True, show_progress_bar=verbose)  # noqa: E731
+        vectors = encode([texts[i] for i in missing])
+        for i, vec in zip(missing, vectors):
+            cache[hashes[i]] = np.asarray(vec, dtype=np.float32)
+
+    embeddings = np.stack([cache[h] for h in hashes]).astype(np.float32)
     dim = embeddings.shape[1]
     index = faiss.IndexFlatL2(dim)
     index.add(embeddings)
 
-    faiss.write_index(index, str(INDEX_PATH))
-
     sources = [p.name for p in files]
-    with open(SOURCES_PATH, "wb") as f:
-        pickle.dump(sources, f)
+    _replace(INDEX_PATH, lambda tmp: faiss.write_index(index, tmp))
+    _replace(SOURCES_PATH, lambda tmp: Path(tmp).write_bytes(pickle.dumps(sources)))
+    # drop vectors of docs that no longer exist
+    live = {h: cache[h] for h in hashes}
+    _replace(EMBED_CACHE_PATH, lambda tmp: Path(tmp).write_bytes(pickle.dumps({"model": MODEL_NAME, "vectors": live})))
 
     # --- DRIFT MARKER ---
     marker_hash = sha256_file(CONTRACTS_SOURCE)
     DRIFT_MARKER.write_text(marker_hash, encoding="utf-8")
 
+    return {
+        "sources": sources,
+        "encoded": [files[i].name for i in missing],
+        "reused": len(files) - len(missing),
+        "contracts_sha": marker_hash,
+    }
+
+
+def main():
+    result = build()
+
     print("RAG_BUILD_COMPLETE")
-    print("Indexed:", len(sources))
+    print("Indexed:", len(result["sources"]))
+    print("Encoded:", len(result["encoded"]), "Reused:", result["reused"])
     print("Wrote:", INDEX_PATH)
     print("Wrote:", SOURCES_PATH)
     print("Wrote:", DRIFT_MARKER)
-    print("ContractsSHA:", marker_hash)
-    print("Sources:", sources)
+    print("ContractsSHA:", result["contracts_sha"])
+    print("Sources:", result["sources"])
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
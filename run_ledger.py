@@ -0,0 +1,285 @@
+"""
+Append-only run ledger for llm_generate runs (SQLite, WAL mode).
+
+Every generation (including cache hits and failures) appends one row, so
+batch/concurrent runs no longer clobber each other the way the single
+generated/_meta.json did. Queries stream rows from SQLite, so the ledger
+stays usable at hundreds of thousands of runs.
+
+CLI:
+  python run_ledger.py list  [--task T] [--model M] [--prompt-version V] [--limit N] [--json]
+  python run_ledger.py stats [--task T] [--model M] [--prompt-version V] [--group-by model|prompt_version|task|cache_status]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parent
+LEDGER_PATH = Path(os.getenv("RUN_LEDGER_PATH", str(REPO_ROOT / "generated" / "_runs.sqlite")))
+
+BUSY_TIMEOUT_MS = 30000
+GROUP_BY_COLUMNS = ("model", "prompt_version", "task", "cache_status", "status")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts TEXT NOT NULL,
+    task TEXT NOT NULL,
+    model TEXT,
+    prompt_version TEXT,
+    contract_checksum TEXT,
+    rag_context_hash TEXT,
+    cache_status TEXT,
+    status TEXT NOT NULL,
+    valid INTEGER,
+    total_ms REAL,
+    timings_json TEXT,
+    meta_json TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_task ON runs(task);
+CREATE INDEX IF NOT EXISTS idx_runs_model ON runs(model);
+CREATE INDEX IF NOT EXISTS idx_runs_prompt_version ON runs(prompt_version);
+CREATE INDEX IF NOT EXISTS idx_runs_ts ON runs(ts);
+CREATE INDEX IF NOT EXISTS idx_runs_total_ms ON runs(total_ms);
+"""
+
+# plan cache outcome of a run (disabled/empty/error runs are not lookups)
+_PLAN_CACHE_STATUS = "json_extract(meta_json, '$.plan_cache.status')"
+
+_LOCAL = threading.local()
+
+
+def connect(path: Path = LEDGER_PATH) -> sqlite3.Connection:
+    """One connection per thread per path; WAL lets readers run while writers append."""
+    conns: Dict[str, sqlite3.Connection] = getattr(_LOCAL, "conns", None) or {}
+    _LOCAL.conns = conns
+    key = str(path)
+    conn = conns.get(key)
+    if conn is None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(key, timeout=BUSY_TIMEOUT_MS / 1000.0, isolation_level=None)
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        conns[key] = conn
+    return conn
+
+
+# =========================
+# Writers
+# =========================
+def append_run(meta: Dict[str, Any], status: str = "ok", valid: Optional[bool] = None, path: Path = LEDGER_PATH) -> int:
+    timings = meta.get("timings_ms", {}) or {}
+    row = (
+        meta.get("timestamp_utc") or "",
+        meta.get("task") or "",
+        meta.get("local_llm_model"),
+        meta.get("prompt_version"),
+        meta.get("contract_checksum"),
+        (meta.get("rag") or {}).get("context_hash"),
+        (meta.get("cache") or {}).get("status"),
+        status,
+        None if valid is None else int(bool(valid)),
+        timings.get("total"),
+        json.dumps(timings),
+        json.dumps(meta, ensure_ascii=False),
+    )
+    conn = connect(path)
+    # BEGIN IMMEDIATE takes the write lock up front; busy_timeout queues concurrent writers
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        cur = conn.execute(
+            "INSERT INTO runs (ts, task, model, prompt_version, contract_checksum, rag_context_hash,"
+            " cache_status, status, valid, total_ms, timings_json, meta_json)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            row,
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return int(cur.lastrowid)
+
+
+def set_valid(run_ids: List[int], valid: bool, path: Path = LEDGER_PATH) -> None:
+    """Record the validation outcome for runs (validation happens after the run row is appended)."""
+    if not run_ids:
+        return
+    conn = connect(path)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany("UPDATE runs SET valid = ? WHERE id = ?", [(int(bool(valid)), rid) for rid in run_ids])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+# =========================
+# Queries
+# =========================
+def _where(task: Optional[str] = None, model: Optional[str] = None, prompt_version: Optional[str] = None) -> Tuple[str, List[Any]]:
+    clauses: List[str] = []
+    params: List[Any] = []
+    for col, val in (("task", task), ("model", model), ("prompt_version", prompt_version)):
+        if val:
+            clauses.append(f"{col} = ?")
+            params.append(val)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def iter_runs(
+    task: Optional[str] = None,
+    model: Optional[str] = None,
+    prompt_version: Optional[str] = None,
+    limit: Optional[int] = None,
+    path: Path = LEDGER_PATH,
+) -> Iterator[Dict[str, Any]]:
+    where, params = _where(task, model, prompt_version)
+    sql = ("SELECT id, ts, task, model, prompt_version, cache_status, status, valid, total_ms, timings_json"
+           f" FROM runs{where} ORDER BY id DESC")
+    if limit:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    cur = connect(path).execute(sql, params)
+    cols = [d[0] for d in cur.description]
+    for r in cur:
+        row = dict(zip(cols, r))
+        row["timings_ms"] = json.loads(row.pop("timings_json") or "{}")
+        yield row
+
+
+def iter_meta(
+    task: Optional[str] = None,
+    model: Optional[str] = None,
+    prompt_version: Optional[str] = None,
+    limit: Optional[int] = None,
+    path: Path = LEDGER_PATH,
+) -> Iterator[Dict[str, Any]]:
+    """Full run meta, newest first, one row at a time."""
+    where, params = _where(task, model, prompt_version)
+    sql = f"SELECT meta_json FROM runs{where} ORDER BY id DESC"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    for (meta_json,) in connect(path).execute(sql, params):
+        if meta_json:
+            yield json.loads(meta_json)
+
+
+def get_meta(run_id: int, path: Path = LEDGER_PATH) -> Optional[Dict[str, Any]]:
+    r = connect(path).execute("SELECT meta_json FROM runs WHERE id = ?", (run_id,)).fetchone()
+    return json.loads(r[0]) if r and r[0] else None
+
+
+def _percentile(conn: sqlite3.Connection, where: str, params: List[Any], count: int, p: float) -> Optional[float]:
+    if count <= 0:
+        return None
+    offset = min(count - 1, int(round(p / 100.0 * (count - 1))))
+    cond = (where + " AND" if where else " WHERE") + " total_ms IS NOT NULL"
+    r = conn.execute(f"SELECT total_ms FROM runs{cond} ORDER BY total_ms LIMIT 1 OFFSET ?", params + [offset]).fetchone()
+    return round(r[0], 1) if r else None
+
+
+def stats(
+    task: Optional[str] = None,
+    model: Optional[str] = None,
+    prompt_version: Optional[str] = None,
+    group_by: Optional[str] = None,
+    path: Path = LEDGER_PATH,
+) -> List[Dict[str, Any]]:
+    """
+    Latency/validity aggregates computed inside SQLite (no full load into Python).
+    Percentiles use an indexed ORDER BY ... OFFSET per group. plan_cache_hit_rate
+    is hits / (hit + miss + rejected) lookups; plan_cache_hit_similarity is the
+    mean similarity of the hits.
+    """
+    if group_by and group_by not in GROUP_BY_COLUMNS:
+        raise ValueError(f"group_by must be one of {GROUP_BY_COLUMNS}")
+
+    conn = connect(path)
+    where, params = _where(task, model, prompt_version)
+    groups: List[Optional[str]] = [None]
+    if group_by:
+        groups = [r[0] for r in conn.execute(f"SELECT DISTINCT {group_by} FROM runs{where}", params)]
+
+    out = []
+    for g in groups:
+        gw, gp = where, list(params)
+        if group_by:
+            gw = (gw + " AND" if gw else " WHERE") + (f" {group_by} IS ?")
+            gp.append(g)
+        r = conn.execute(
+            "SELECT COUNT(*), SUM(status = 'ok'), SUM(valid = 1), SUM(valid IS NOT NULL),"
+            " SUM(cache_status = 'hit'), AVG(total_ms), COUNT(total_ms),"
+            f" SUM({_PLAN_CACHE_STATUS} IN ('hit', 'miss', 'rejected')), SUM({_PLAN_CACHE_STATUS} = 'hit'),"
+            f" AVG(CASE WHEN {_PLAN_CACHE_STATUS} = 'hit' THEN json_extract(meta_json, '$.plan_cache.similarity') END)"
+            f" FROM runs{gw}",
+            gp,
+        ).fetchone()
+        runs, ok, valid, validated, hits, avg_ms, timed_n, plan_lookups, plan_hits, plan_sim = r
+        row: Dict[str, Any] = {
+            "runs": runs or 0,
+            "errors": (runs or 0) - (ok or 0),
+            "validity_rate": round((valid or 0) / validated, 4) if validated else None,
+            "cache_hit_rate": round((hits or 0) / runs, 4) if runs else None,
+            "plan_cache_hit_rate": round((plan_hits or 0) / plan_lookups, 4) if plan_lookups else None,
+            "plan_cache_hit_similarity": round(plan_sim, 4) if plan_sim is not None else None,
+            "avg_ms": round(avg_ms, 1) if avg_ms is not None else None,
+            "p50_ms": _percentile(conn, gw, gp, timed_n or 0, 50),
+            "p95_ms": _percentile(conn, gw, gp, timed_n or 0, 95),
+        }
+        if group_by:
+            row = {group_by: g, **row}
+        out.append(row)
+    return out
+
+
+# =========================
+# CLI
+# =========================
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Query the llm_generate run ledger.")
+    ap.add_argument("--db", default=str(LEDGER_PATH))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    for name in ("list", "stats"):
+        p = sub.add_parser(name)
+        p.add_argument("--task")
+        p.add_argument("--model")
+        p.add_argument("--prompt-version")
+        if name == "list":
+            p.add_argument("--limit", type=int, default=20)
+            p.add_argument("--json", action="store_true")
+        else:
+            p.add_argument("--group-by", choices=GROUP_BY_COLUMNS)
+
+    args = ap.parse_args(argv)
+    db = Path(args.db)
+    if not db.exists():
+        print(f"No ledger at {db}")
+        return 1
+
+    if args.cmd == "list":
+        for row in iter_runs(args.task, args.model, args.prompt_version, limit=args.limit, path=db):
+            if args.json:
+                print(json.dumps(row, ensure_ascii=False))
+                continue
+            valid = {None: "-", 1: "valid", 0: "INVALID"}[row["valid"]]
+            print(f"#{row['id']} {row['ts']} [{row['status']}/{row['cache_status'] or '-'}/{valid}] "
+                  f"{row['total_ms'] or 0:.0f}ms {row['model']} {row['prompt_version']} :: {row['task']}")
+        return 0
+
+    for row in stats(args.task, args.model, args.prompt_version, group_by=args.group_by, path=db):
+        print(json.dumps(row, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
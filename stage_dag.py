@@ -0,0 +1,134 @@
+"""
+Small stage DAG executor for the generation pipeline.
+
+Stages declare the stages they depend on; every stage whose dependencies are
+done is started on a thread pool, so independent I/O (model listing, FAISS
+retrieval, contract loading, manifest hashing) overlaps instead of running
+back to back. A runner can execute several batches: stages in a later batch
+may depend on stages finished in an earlier one.
+
+    runner = StageRunner(around=token_usage.stage)
+    out = runner.run([
+        Stage("retrieve", lambda r: retrieve(task)),
+        Stage("load_contracts", lambda r: load_contracts()),
+        Stage("manifest_check", check, deps=("retrieve", "load_contracts")),
+    ])
+    runner.report()   # per-stage offsets + critical path
+
+Stage functions receive the results dict (name -> return value). The first
+stage that raises cancels everything not yet started and the error is re-raised.
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Dict, Iterable, List, Optional, Sequence
+
+DEFAULT_WORKERS = 4
+
+
+class Stage:
+    def __init__(self, name: str, fn: Callable[[Dict[str, Any]], Any], deps: Sequence[str] = ()) -> None:
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+
+    def __repr__(self) -> str:
+        return f"Stage({self.name!r}, deps={list(self.deps)})"
+
+
+class StageRunner:
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_WORKERS,
+        around: Optional[Callable[[str], ContextManager[Any]]] = None,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> None:
+        self.max_workers = max_workers
+        # wraps each stage body, e.g. token_usage.stage to label LLM calls
+        self.around = around
+        # name -> duration ms (shared with the caller's meta["timings_ms"])
+        self.timings: Dict[str, float] = timings if timings is not None else {}
+        self.results: Dict[str, Any] = {}
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+
+    def _offset_ms(self) -> float:
+        return round((time.perf_counter() - self._t0) * 1000, 1)
+
+    def _call(self, stage: Stage) -> Any:
+        start = self._offset_ms()
+        t0 = time.perf_counter()
+        try:
+            with self.around(stage.name) if self.around else nullcontext():
+                return stage.fn(self.results)
+        finally:
+            ms = round((time.perf_counter() - t0) * 1000, 1)
+            with self._lock:
+                self.timings[stage.name] = ms
+                self._records[stage.name] = {"deps": list(stage.deps), "start_ms": start, "end_ms": self._offset_ms(), "ms": ms}
+
+    def run(self, stages: Iterable[Stage]) -> Dict[str, Any]:
+        pending: Dict[str, Stage] = {}
+        for s in stages:
+            if s.name in pending or s.name in self.results:
+                raise ValueError(f"Duplicate stage name: {s.name}")
+            pending[s.name] = s
+        for s in pending.values():
+            unknown = [d for d in s.deps if d not in pending and d not in self.results]
+            if unknown:
+                raise ValueError(f"Stage {s.name} depends on unknown stage(s): {unknown}")
+
+        running: Dict[Future, str] = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                ready = [s for s in pending.values() if all(d in self.results for d in s.deps)]
+                for s in ready:
+                    del pending[s.name]
+                    # each stage runs in a copy of the caller's context (token recording, stage labels)
+                    running[pool.submit(contextvars.copy_context().run, self._call, s)] = s.name
+                if not running:
+                    raise ValueError(f"Dependency cycle between stages: {sorted(pending)}")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name = running.pop(fut)
+                    err = fut.exception()
+                    if err is not None:
+                        # fail fast: nothing new starts; already-running stages finish on pool exit
+                        pending.clear()
+                        for f in running:
+                            f.cancel()
+                        raise err
+                    self.results[name] = fut.result()
+        return self.results
+
+    def critical_path(self) -> List[str]:
+        """Chain of stages that gated the end of the run: walk back from the last
+        stage to finish through whichever dependency finished last."""
+        if not self._records:
+            return []
+        name = max(self._records, key=lambda n: self._records[n]["end_ms"])
+        path = [name]
+        while True:
+            deps = [d for d in self._records[name]["deps"] if d in self._records]
+            if not deps:
+                break
+            name = max(deps, key=lambda d: self._records[d]["end_ms"])
+            path.append(name)
+        return list(reversed(path))
+
+    def report(self) -> Dict[str, Any]:
+        path = self.critical_path()
+        wall_ms = max((r["end_ms"] for r in self._records.values()), default=0.0)
+        busy_ms = sum(r["ms"] for r in self._records.values())
+        return {
+            "wall_ms": wall_ms,
+            "critical_path": path,
+            "critical_path_ms": round(sum(self._records[n]["ms"] for n in path), 1),
+            # time saved by running stages concurrently instead of back to back
+            "overlap_ms": round(max(0.0, busy_ms - wall_ms), 1),
+            "stages": dict(sorted(self._records.items(), key=lambda kv: kv[1]["start_ms"])),
+        }
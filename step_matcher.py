@@ -0,0 +1,305 @@
+"""
+Cucumber step matching: feature step text -> @Given/@When/@Then definitions.
+
+Expressions are compiled once (cached) to anchored regexes:
+  - Cucumber expressions: {int} {float} {word} {string} {} ..., optional text
+    "cucumber(s)", alternation "click/tap", "\\" escapes
+  - regular expressions: anything starting with ^ or ending with $ (Cucumber-JVM rule)
+
+StepMatcher builds a dispatch table so a step is only tried against the
+definitions that can possibly match it: literal expressions are a dict hit,
+parameterized ones sit in a trie keyed by their leading literal words, and
+nodes with many definitions (e.g. expressions starting with a parameter) are
+screened with combined alternation regexes. Results are memoized per step
+text (generated suites repeat steps a lot).
+
+    m = StepMatcher(extract_definitions(java_src))
+    report = m.match_all(feature_steps)   # {"unmatched": [...], "ambiguous": [...]}
+
+Keywords are ignored when matching, as in Cucumber.
+"""
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Tuple
+
+ANNOTATION_RE = re.compile(r'@(Given|When|Then|And|But)\(\s*"((?:[^"\\]|\\.)*)"\s*\)')
+
+PARAMETER_TYPES = {
+    "int": r"-?\d+",
+    "byte": r"-?\d+",
+    "short": r"-?\d+",
+    "long": r"-?\d+",
+    "biginteger": r"-?\d+",
+    "float": r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?",
+    "double": r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?",
+    "bigdecimal": r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?",
+    "word": r"[^\s]+",
+    "string": r"\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*'",
+    "": r".*",
+}
+
+
+def unescape_java(s: str) -> str:
+    return re.sub(r"\\(.)", lambda m: {"n": "\n", "t": "\t"}.get(m.group(1), m.group(1)), s)
+
+
+def extract_definitions(java_src: str, source: str = "") -> List[Dict[str, Any]]:
+    """@Given/@When/@Then("...") annotations of a Java steps class."""
+    return [
+        {
+            "keyword": m.group(1),
+            "expression": unescape_java(m.group(2)),
+            "source": source,
+            "line": java_src.count("\n", 0, m.start()) + 1,
+        }
+        for m in ANNOTATION_RE.finditer(java_src)
+    ]
+
+
+# =========================
+# Expression compilation
+# =========================
+def is_regex(expression: str) -> bool:
+    return expression.startswith("^") or expression.endswith("$")
+
+
+def _literal(text: str) -> str:
+    # alternation applies to whole words: "click/tap the button" -> (?:click|tap) the button
+    out = []
+    for part in re.split(r"(\s+)", text):
+        if "/" in part and not part.isspace():
+            alts = [re.escape(a) for a in part.split("/")]
+            out.append("(?:" + "|".join(alts) + ")")
+        else:
+            out.append(re.escape(part))
+    return "".join(out)
+
+
+def cucumber_to_regex(expression: str) -> str:
+    out: List[str] = []
+    buf: List[str] = []
+    i, n = 0, len(expression)
+
+    def flush() -> None:
+        if buf:
+            out.append(_literal("".join(buf)))
+            buf.clear()
+
+    while i < n:
+        c = expression[i]
+        if c == "\\" and i + 1 < n:
+            flush()
+            out.append(re.escape(expression[i + 1]))
+            i += 2
+            continue
+        if c == "{":
+            end = expression.find("}", i)
+            if end < 0:
+                raise ValueError(f"Unclosed parameter in: {expression}")
+            name = expression[i + 1:end]
+            if name not in PARAMETER_TYPES:
+                raise ValueError(f"Unknown parameter type {{{name}}} in: {expression}")
+            flush()
+            out.append(f"({PARAMETER_TYPES[name]})")
+            i = end + 1
+            continue
+        if c == "(":
+            end = expression.find(")", i)
+            if end < 0:
+                raise ValueError(f"Unclosed optional text in: {expression}")
+            flush()
+            out.append(f"(?:{re.escape(expression[i + 1:end])})?")
+            i = end + 1
+            continue
+        buf.append(c)
+        i += 1
+    flush()
+    return "^" + "".join(out) + "$"
+
+
+@lru_cache(maxsize=None)
+def compile_expression(expression: str) -> Pattern[str]:
+    if is_regex(expression):
+        pattern = expression
+        if not pattern.startswith("^"):
+            pattern = "^" + pattern
+        if not pattern.endswith("$"):
+            pattern += "$"
+        return re.compile(pattern)
+    return re.compile(cucumber_to_regex(expression))
+
+
+_REGEX_META = set(".^$*+?()[]{}|\\")
+
+
+def _has_top_level_alternation(pattern: str) -> bool:
+    """True if `|` splits the whole regex ("^I open home|^I close shop$"), not just a group."""
+    depth = 0
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            i += 2
+            continue
+        if in_class:
+            in_class = c != "]"
+        elif c == "[":
+            in_class = True
+        elif c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "|" and depth == 0:
+            return True
+        i += 1
+    return False
+
+
+def literal_prefix_words(expression: str) -> List[str]:
+    """
+    Complete literal words every match must start with ("open the {string} page"
+    -> ["open", "the"]). Empty when the expression starts with a parameter,
+    optional text or alternation, or is a regex with a top-level `|` (only the
+    first branch would be seen).
+    """
+    if is_regex(expression):
+        if not expression.startswith("^") or _has_top_level_alternation(expression):
+            return []
+        body, stops = expression[1:], _REGEX_META
+    else:
+        body, stops = expression, set("{}()/\\")
+    end = next((i for i, c in enumerate(body) if c in stops), len(body))
+    literal = body[:end]
+    if end == len(body):
+        # fully literal: every word is complete
+        return literal.split()
+    # the word touching the special char is incomplete ("cucumber(s)", "click/tap")
+    return literal.split()[:-1] if not literal.endswith(" ") else literal.split()
+
+
+def _is_literal(expression: str) -> bool:
+    return not is_regex(expression) and not any(c in expression for c in "{}()/\\")
+
+
+# =========================
+# Matcher
+# =========================
+class _Node:
+    __slots__ = ("defs", "next")
+
+    def __init__(self) -> None:
+        self.defs: List[int] = []
+        self.next: Dict[str, "_Node"] = {}
+
+
+# definitions per combined prefilter regex (one C-level scan rejects a whole chunk)
+PREFILTER_CHUNK = 64
+
+
+class StepMatcher:
+    def __init__(self, definitions: Iterable[Dict[str, Any]]) -> None:
+        self.definitions: List[Dict[str, Any]] = []
+        self.invalid: List[Tuple[Dict[str, Any], str]] = []
+        self._exact: Dict[str, List[int]] = {}
+        # word trie over literal prefixes: a step only meets definitions along its own words
+        self._root = _Node()
+        self._patterns: List[Optional[Pattern[str]]] = []
+        self._prefilters: Dict[int, List[Tuple[Pattern[str], List[int]]]] = {}
+        self._memo: Dict[str, List[int]] = {}
+
+        for d in definitions:
+            idx = len(self.definitions)
+            self.definitions.append(d)
+            expr = d["expression"]
+            if _is_literal(expr):
+                self._patterns.append(None)
+                self._exact.setdefault(expr, []).append(idx)
+                continue
+            try:
+                self._patterns.append(compile_expression(expr))
+            except (ValueError, re.error) as e:
+                self._patterns.append(None)
+                self.invalid.append((d, str(e)))
+                continue
+            node = self._root
+            for w in literal_prefix_words(expr):
+                node = node.next.setdefault(w, _Node())
+            node.defs.append(idx)
+
+        self._build_prefilters(self._root)
+
+    def _build_prefilters(self, node: _Node) -> None:
+        # large nodes (typically the root: expressions starting with a parameter) get
+        # combined alternation regexes so most chunks are rejected in one scan
+        if len(node.defs) > PREFILTER_CHUNK:
+            chunks = []
+            for i in range(0, len(node.defs), PREFILTER_CHUNK):
+                ids = node.defs[i:i + PREFILTER_CHUNK]
+                try:
+                    combined = re.compile("|".join(f"(?:{self._patterns[k].pattern})" for k in ids))
+                except re.error:
+                    combined = None
+                if combined is not None:
+                    chunks.append((combined, ids))
+                else:
+                    chunks.extend((self._patterns[k], [k]) for k in ids)
+            self._prefilters[id(node)] = chunks
+        for child in node.next.values():
+            self._build_prefilters(child)
+
+    def _candidates(self, node: _Node, text: str, out: List[int]) -> None:
+        chunks = self._prefilters.get(id(node))
+        if chunks is None:
+            out.extend(k for k in node.defs if self._patterns[k].match(text))
+            return
+        for combined, ids in chunks:
+            if combined.match(text):
+                out.extend(k for k in ids if self._patterns[k].match(text))
+
+    def match(self, text: str) -> List[Dict[str, Any]]:
+        """Every definition matching `text` (0 = undefined, >1 = ambiguous)."""
+        hit = self._memo.get(text)
+        if hit is None:
+            hit = list(self._exact.get(text, ()))
+            node = self._root
+            self._candidates(node, text, hit)
+            for w in text.split():
+                node = node.next.get(w)
+                if node is None:
+                    break
+                self._candidates(node, text, hit)
+            self._memo[text] = hit
+        return [self.definitions[i] for i in hit]
+
+    def match_all(self, steps: Iterable[Tuple[str, str, int]]) -> Dict[str, Any]:
+        """
+        steps: (source, text, line). Returns counts plus the exact unmatched and
+        ambiguous steps (with the competing definitions).
+        """
+        unmatched: List[Dict[str, Any]] = []
+        ambiguous: List[Dict[str, Any]] = []
+        total = 0
+        for source, text, line in steps:
+            total += 1
+            defs = self.match(text)
+            if not defs:
+                unmatched.append({"source": source, "line": line, "text": text})
+            elif len(defs) > 1:
+                ambiguous.append({
+                    "source": source,
+                    "line": line,
+                    "text": text,
+                    "definitions": [f"{d.get('source', '')}:{d.get('line', '')} {d['expression']}" for d in defs],
+                })
+        return {
+            "steps": total,
+            "definitions": len(self.definitions),
+            "matched": total - len(unmatched) - len(ambiguous),
+            "unmatched": unmatched,
+            "ambiguous": ambiguous,
+            "invalid_definitions": [
+                {"source": d.get("source", ""), "line": d.get("line"), "expression": d["expression"], "error": err}
+                for d, err in self.invalid
+            ],
+        }
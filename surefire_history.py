@@ -0,0 +1,410 @@
+"""
+Test history from Surefire reports: duration-balanced sharding, failure-first
+ordering and flaky-test quarantine.
+
+  python surefire_history.py ingest [--reports target/surefire-reports]
+  python surefire_history.py shard -n 4 [--index 2] [--json shards.json]
+  python surefire_history.py plan [--fail-fast] [--json plan.json]
+  python surefire_history.py flaky
+
+`ingest` folds every TEST-*.xml not seen before (by path + mtime) into a compact
+history (generated/_cache/test_history.json): per test case an exponentially
+weighted mean duration, the last duration, the run count and a rolling window
+of outcomes, each tagged with the hash of the artifacts the scenario ran
+(its own content + the steps classes it matched + the pages those use).
+
+`shard` estimates each generated feature's duration from the history (sum of
+its scenarios; scenarios without history get the median known scenario time)
+and partitions the features into N shards with longest-processing-time-first
+bin packing: features sorted by duration, each into the currently lightest
+shard. That keeps the slowest shard within 4/3 of the optimum, so parallel
+forks / CI runners finish together. Each shard comes with its
+-Dcucumber.features=... Maven argument. With --index only that shard's
+arguments are printed; a shard without features (more shards than features)
+prints nothing and exits with SHARD_EMPTY_EXIT, so CI must skip Maven then:
+
+  args=$(python surefire_history.py shard -n 4 --index $I); rc=$?
+  if [ $rc -eq 3 ]; then echo "empty shard, skipping"; elif [ $rc -eq 0 ]; then mvn test $args; else exit $rc; fi
+
+Cucumber (JUnit Platform) reports a scenario as testcase name=<scenario>,
+classname=<feature name>; the "long" naming strategy (name="<feature> - <scenario>")
+is understood too.
+
+`plan` orders the next run failures-first (scenarios that failed last, then by
+recent failure count, then fastest first) so the first failure shows up early,
+optionally with Surefire fail-fast. Scenarios that both passed and failed
+FLAKY_MIN_FLIPS times on the *same* artifact hash are flaky: the outcome changed
+while the code did not. They move to a separate quarantine run so they neither
+block nor hide real failures in the main run.
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import os
+import statistics
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import symbol_index
+from maven_runner import REPORTS_DIR, parse_surefire_xml
+from step_matcher import StepMatcher
+from test_selection import scenario_fingerprint
+
+HISTORY_VERSION = 1
+HISTORY_PATH = Path("generated/_cache/test_history.json")
+
+# weight of the newest duration in the moving average
+EWMA_ALPHA = 0.3
+# scenario estimate when nothing at all is known yet
+DEFAULT_SCENARIO_S = 1.0
+
+# outcomes kept per test case
+OUTCOME_WINDOW = 20
+# pass<->fail changes on one artifact hash before a test counts as flaky
+FLAKY_MIN_FLIPS = 2
+
+# `shard --index` exit code for a shard with no features (CI skips Maven)
+SHARD_EMPTY_EXIT = 3
+
+
+def test_key(classname: str, name: str) -> str:
+    return f"{classname}::{name}"
+
+
+def scenario_of(key: str) -> Tuple[str, str]:
+    """History key -> (feature name, scenario name), for either Cucumber naming strategy."""
+    classname, _, name = key.partition("::")
+    if name.startswith(f"{classname} - "):
+        name = name[len(classname) + 3:]
+    return classname, name
+
+
+# =========================
+# History
+# =========================
+def load_history(path: Path = HISTORY_PATH) -> Dict[str, Any]:
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        if data.get("version") == HISTORY_VERSION:
+            return data
+    except (OSError, ValueError):
+        pass
+    return {"version": HISTORY_VERSION, "tests": {}, "ingested": {}}
+
+
+def save_history(history: Dict[str, Any], path: Path = HISTORY_PATH) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".test_history.", dir=str(path.parent))
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(history, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def scenario_artifacts(files: Dict[str, Any]) -> Dict[Tuple[str, str], str]:
+    """
+    (feature name, scenario name) -> hash of everything the scenario runs: its own
+    content, the steps classes whose definitions its steps match and the page
+    objects those steps classes hold.
+    """
+    shas: Dict[str, str] = {}
+    for p in files:
+        try:
+            shas[p] = hashlib.sha256(Path(p).read_bytes()).hexdigest()
+        except OSError:
+            shas[p] = "MISSING"
+    page_path = {f["symbols"]["class"]: p for p, f in files.items() if f["kind"] == "page" and f["symbols"]["class"]}
+    pages_of = {
+        p: sorted(page_path[c] for c in set(f["symbols"]["fields"].values()) if c in page_path)
+        for p, f in files.items() if f["kind"] == "steps"
+    }
+    matcher = StepMatcher(
+        {"expression": expr, "source": path, "line": line}
+        for path, _, expr, line in symbol_index.step_definitions(files)
+    )
+
+    out: Dict[Tuple[str, str], str] = {}
+    for path, f in files.items():
+        if f["kind"] != "feature":
+            continue
+        for sc in f["symbols"]["scenarios"]:
+            steps = sorted({d["source"] for text in sc["steps"] for d in matcher.match(text)})
+            deps = steps + [pg for st in steps for pg in pages_of.get(st, [])]
+            parts = [scenario_fingerprint(sc)] + [f"{d}={shas[d]}" for d in sorted(set(deps))]
+            out[(f["symbols"]["name"] or "", sc["name"])] = hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+    return out
+
+
+def ingest(
+    history: Dict[str, Any],
+    reports: Iterable[Path],
+    artifacts: Optional[Dict[Tuple[str, str], str]] = None,
+) -> Dict[str, int]:
+    """
+    Fold new/updated reports into `history` (in place). `artifacts` (see
+    scenario_artifacts) tags each outcome with what was tested. Returns counts.
+    """
+    stats = {"reports": 0, "skipped": 0, "cases": 0, "unreadable": 0}
+    seen = history["ingested"]
+    for report in sorted(reports):
+        try:
+            mtime = report.stat().st_mtime_ns
+        except OSError:
+            continue
+        key = str(report)
+        if seen.get(key) == mtime:
+            stats["skipped"] += 1
+            continue
+        try:
+            cases = parse_surefire_xml(report)
+        except (ET.ParseError, OSError):
+            stats["unreadable"] += 1
+            continue
+        for c in cases:
+            if c.status == "skipped":
+                continue
+            entry = history["tests"].setdefault(test_key(c.classname, c.name), {"n": 0, "ewma": c.time_s})
+            entry["n"] += 1
+            entry["ewma"] = round(EWMA_ALPHA * c.time_s + (1 - EWMA_ALPHA) * entry["ewma"], 4)
+            entry["last"] = c.time_s
+            h = (artifacts or {}).get(scenario_of(test_key(c.classname, c.name)))
+            outcomes = entry.setdefault("outcomes", [])
+            outcomes.append(["P" if c.ok else "F", h])
+            del outcomes[:-OUTCOME_WINDOW]
+            stats["cases"] += 1
+        seen[key] = mtime
+        stats["reports"] += 1
+    return stats
+
+
+# =========================
+# Sharding
+# =========================
+def feature_durations(files: Dict[str, Any], history: Dict[str, Any]) -> Dict[str, Tuple[float, int, int]]:
+    """feature path -> (estimated seconds, scenarios, scenarios with history)."""
+    tests = history.get("tests", {})
+    known = {scenario_of(key): entry["ewma"] for key, entry in tests.items()}
+    default = statistics.median(known.values()) if known else DEFAULT_SCENARIO_S
+
+    out: Dict[str, Tuple[float, int, int]] = {}
+    for path, f in sorted(files.items()):
+        if f["kind"] != "feature":
+            continue
+        feature = f["symbols"]["name"] or ""
+        total, hits = 0.0, 0
+        scenarios = f["symbols"]["scenarios"]
+        for sc in scenarios:
+            t = known.get((feature, sc["name"]))
+            if t is not None:
+                hits += 1
+            total += default if t is None else t
+        out[path] = (round(total, 3), len(scenarios), hits)
+    return out
+
+
+def lpt_shards(durations: Dict[str, float], n: int) -> List[Dict[str, Any]]:
+    """Longest-processing-time-first: heaviest item into the lightest shard."""
+    shards = [{"index": i, "features": [], "estimated_s": 0.0} for i in range(max(1, n))]
+    heap = [(0.0, i) for i in range(len(shards))]
+    for path, secs in sorted(durations.items(), key=lambda kv: (-kv[1], kv[0])):
+        load, i = heapq.heappop(heap)
+        shards[i]["features"].append(path)
+        shards[i]["estimated_s"] = round(load + secs, 3)
+        heapq.heappush(heap, (load + secs, i))
+    for s in shards:
+        s["maven_args"] = [f"-Dcucumber.features={','.join(s['features'])}"] if s["features"] else []
+    return shards
+
+
+# =========================
+# Failure-first ordering / flaky quarantine
+# =========================
+def flips(outcomes: List[List[Any]]) -> Dict[Optional[str], int]:
+    """Pass<->fail changes between successive outcomes recorded for the same artifact hash."""
+    out: Dict[Optional[str], int] = {}
+    prev: Dict[Optional[str], str] = {}
+    for status, h in outcomes:
+        if h is None:
+            continue  # unknown artifacts: a change may be a real fix or regression
+        if h in prev and prev[h] != status:
+            out[h] = out.get(h, 0) + 1
+        prev[h] = status
+    return out
+
+
+def flaky_tests(history: Dict[str, Any], min_flips: int = FLAKY_MIN_FLIPS) -> Dict[str, Dict[str, Any]]:
+    out: Dict[str, Dict[str, Any]] = {}
+    for key, entry in history.get("tests", {}).items():
+        per_hash = flips(entry.get("outcomes", []))
+        if per_hash and max(per_hash.values()) >= min_flips:
+            h = max(per_hash, key=per_hash.get)
+            same = [s for s, hh in entry["outcomes"] if hh == h]
+            out[key] = {"artifact": h, "flips": per_hash[h], "passed": same.count("P"), "failed": same.count("F")}
+    return out
+
+
+def plan(
+    files: Dict[str, Any],
+    history: Dict[str, Any],
+    features: Optional[Iterable[str]] = None,
+    fail_fast: bool = False,
+    min_flips: int = FLAKY_MIN_FLIPS,
+) -> Dict[str, Any]:
+    """
+    Main run ordered failures-first (feature order; scenarios keep file order within
+    a feature, as Cucumber runs them) plus a separate quarantine run of flaky scenarios.
+    """
+    tests = history.get("tests", {})
+    by_scenario = {scenario_of(k): e for k, e in tests.items()}
+    flaky = {scenario_of(k): v for k, v in flaky_tests(history, min_flips).items()}
+    wanted = {f.split(":", 1)[0] for f in features} if features is not None else None
+    default = statistics.median([e["ewma"] for e in tests.values()]) if tests else DEFAULT_SCENARIO_S
+
+    main_rows: List[Tuple[Tuple[int, int, float], str, List[int], int]] = []
+    quarantine: List[Dict[str, Any]] = []
+    for path, f in sorted(files.items()):
+        if f["kind"] != "feature" or (wanted is not None and path not in wanted):
+            continue
+        feature = f["symbols"]["name"] or ""
+        lines: List[int] = []
+        last_failed = recent_failures = 0
+        secs = 0.0
+        for sc in f["symbols"]["scenarios"]:
+            key = (feature, sc["name"])
+            if key in flaky:
+                quarantine.append({"feature": path, "line": sc["line"], "name": sc["name"], **flaky[key]})
+                continue
+            lines.append(sc["line"])
+            e = by_scenario.get(key, {})
+            outcomes = e.get("outcomes", [])
+            last_failed += bool(outcomes) and outcomes[-1][0] == "F"
+            recent_failures += sum(1 for s, _ in outcomes if s == "F")
+            secs += e.get("ewma", default)
+        if lines:
+            total = len(f["symbols"]["scenarios"])
+            main_rows.append(((-last_failed, -recent_failures, secs), path, lines, total))
+
+    main_rows.sort()
+    main_filters = [p if len(lines) == total else ":".join([p] + [str(n) for n in lines]) for _, p, lines, total in main_rows]
+    q_by_feature: Dict[str, List[int]] = {}
+    for q in quarantine:
+        q_by_feature.setdefault(q["feature"], []).append(q["line"])
+    q_filters = [":".join([p] + [str(n) for n in lines]) for p, lines in sorted(q_by_feature.items())]
+
+    main_args = [f"-Dcucumber.features={','.join(main_filters)}"] if main_filters else []
+    if main_args and fail_fast:
+        main_args.append("-Dsurefire.skipAfterFailureCount=1")
+    return {
+        "main": {
+            "features": [
+                {"filter": flt, "last_failed": -k[0], "recent_failures": -k[1], "estimated_s": round(k[2], 3)}
+                for (k, _, _, _), flt in zip(main_rows, main_filters)
+            ],
+            "maven_args": main_args,
+        },
+        "quarantine": {
+            "scenarios": quarantine,
+            # flaky scenarios run on their own and never fail the build
+            "maven_args": [f"-Dcucumber.features={','.join(q_filters)}", "-Dmaven.test.failure.ignore=true"] if q_filters else [],
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Surefire timing history and duration-balanced sharding.")
+    ap.add_argument("--history", default=str(HISTORY_PATH))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    ing = sub.add_parser("ingest", help="fold Surefire reports into the history")
+    ing.add_argument("--reports", default=str(REPORTS_DIR))
+    ing.add_argument("--root", default=".")
+
+    sh = sub.add_parser("shard", help="partition generated features into N balanced shards")
+    sh.add_argument("-n", "--shards", type=int, required=True)
+    sh.add_argument("--index", type=int, default=None, help="print only this shard's Maven arguments")
+    sh.add_argument("--features", nargs="*", default=None, help="only these feature files (e.g. a test selection)")
+    sh.add_argument("--root", default=".")
+    sh.add_argument("--json", dest="json_path", default="")
+
+    pl = sub.add_parser("plan", help="failure-first main run + flaky quarantine run")
+    pl.add_argument("--fail-fast", action="store_true", help="stop the main run at the first failure")
+    pl.add_argument("--features", nargs="*", default=None, help="only these feature files (e.g. a test selection)")
+    pl.add_argument("--min-flips", type=int, default=FLAKY_MIN_FLIPS)
+    pl.add_argument("--root", default=".")
+    pl.add_argument("--json", dest="json_path", default="")
+
+    fl = sub.add_parser("flaky", help="list flaky tests")
+    fl.add_argument("--min-flips", type=int, default=FLAKY_MIN_FLIPS)
+    args = ap.parse_args(argv)
+
+    history = load_history(Path(args.history))
+
+    if args.cmd == "ingest":
+        files, _ = symbol_index.update(args.root)
+        stats = ingest(history, Path(args.reports).glob("TEST-*.xml"), scenario_artifacts(files))
+        save_history(history, Path(args.history))
+        print(f"HISTORY_INGESTED: reports={stats['reports']} unchanged={stats['skipped']} "
+              f"cases={stats['cases']} unreadable={stats['unreadable']} tests={len(history['tests'])}")
+        return 0
+
+    if args.cmd == "flaky":
+        found = flaky_tests(history, args.min_flips)
+        for key, v in sorted(found.items()):
+            print(f"FLAKY: {key} flips={v['flips']} passed={v['passed']} failed={v['failed']} artifact={v['artifact']}")
+        print(f"FLAKY_TESTS: {len(found)}")
+        return 0
+
+    files, _ = symbol_index.update(args.root)
+    if args.cmd == "plan":
+        result = plan(files, history, args.features, fail_fast=args.fail_fast, min_flips=args.min_flips)
+        print(f"PLAN: main={len(result['main']['features'])} features "
+              f"quarantined={len(result['quarantine']['scenarios'])} scenarios")
+        for row in result["main"]["features"]:
+            print(f"  {row['filter']} last_failed={row['last_failed']} recent_failures={row['recent_failures']} "
+                  f"est={row['estimated_s']:.1f}s")
+        for q in result["quarantine"]["scenarios"]:
+            print(f"  QUARANTINED {q['feature']}:{q['line']} {q['name']} (flips={q['flips']})")
+        print(f"MAIN_ARGS: {' '.join(result['main']['maven_args'])}")
+        print(f"QUARANTINE_ARGS: {' '.join(result['quarantine']['maven_args'])}")
+        if args.json_path:
+            Path(args.json_path).parent.mkdir(parents=True, exist_ok=True)
+            Path(args.json_path).write_text(json.dumps(result, indent=2), encoding="utf-8")
+        return 0
+
+    est = feature_durations(files, history)
+    if args.features is not None:
+        wanted = {f.split(":", 1)[0] for f in args.features}
+        est = {p: v for p, v in est.items() if p in wanted}
+    shards = lpt_shards({p: v[0] for p, v in est.items()}, args.shards)
+
+    if args.index is not None:
+        if not 0 <= args.index < len(shards):
+            ap.error(f"--index must be in 0..{len(shards) - 1}")
+        shard = shards[args.index]
+        if not shard["features"]:
+            # empty args would make `mvn test` run the whole suite on this runner
+            print(f"SHARD_EMPTY: shard {args.index} of {len(shards)} has no features", file=sys.stderr)
+            return SHARD_EMPTY_EXIT
+        print(" ".join(shard["maven_args"]))
+        return 0
+
+    known = sum(v[2] for v in est.values())
+    scenarios = sum(v[1] for v in est.values())
+    loads = [s["estimated_s"] for s in shards]
+    print(f"SHARDS: n={len(shards)} features={len(est)} scenarios={scenarios} with_history={known} "
+          f"max={max(loads):.1f}s min={min(loads):.1f}s total={sum(loads):.1f}s")
+    for s in shards:
+        print(f"SHARD {s['index']}: est={s['estimated_s']:.1f}s features={len(s['features'])} {' '.join(s['maven_args'])}")
+
+    if args.json_path:
+        Path(args.json_path).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.json_path).write_text(json.dumps({"shards": shards, "features": est}, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
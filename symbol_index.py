@@ -0,0 +1,298 @@
+"""
+Cross-artifact symbol index for generated/.
+
+One pass over the artifacts records:
+  pages:    page class -> public methods (with lines)
+  steps:    steps class -> page fields, annotated step expressions -> page calls
+  features: feature file -> step lines, scenarios (line, name, tags, step texts)
+
+and the checks run off dict lookups (linear in the number of symbols):
+  missing-binding    page.X() called from a step but not defined on the page class
+  duplicate-step     the same step expression defined more than once (any keyword;
+                     Cucumber ignores Given/When/Then when matching)
+  ambiguous-step     expressions that differ only in their parameters ({string} vs {word})
+  undefined-step     a feature step no definition matches (step_matcher)
+  ambiguous-match    a feature step more than one definition matches
+  unused-method      public page methods no step calls (warning)
+
+The index is persisted in generated/_cache/symbol_index.json; a rebuild only
+re-reads files whose size/mtime changed and drops deleted ones.
+
+  python symbol_index.py [--root .] [--json out.json] [--strict-unused]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import gherkin_parser
+from step_matcher import ANNOTATION_RE, StepMatcher, unescape_java
+from validate_artifacts import FEATURE_DIR, PAGES_DIR, STEPS_DIR, Violation
+
+INDEX_VERSION = 3
+INDEX_PATH = Path("generated/_cache/symbol_index.json")
+
+CLASS_RE = re.compile(r"\bclass\s+([A-Za-z_]\w*)")
+PUBLIC_METHOD_RE = re.compile(r"^\s*public\s+(?:static\s+)?[\w\<\>\[\],\s]+?\s+([A-Za-z_]\w*)\s*\(", re.M)
+FIELD_RE = re.compile(r"^\s*(?:(?:private|protected|public|final|static)\s+)*([A-Z]\w*)\s+([a-z_]\w*)\s*(?:=|;)", re.M)
+CALL_RE = re.compile(r"\b([a-z_]\w*)\.([A-Za-z_]\w*)\s*\(")
+# {string} {int} {word} ... and regex groups: two expressions that only differ here can match the same text
+_PARAM_RE = re.compile(r"\{[^}]*\}|\([^)]*\)")
+
+
+def _line_of(text: str, pos: int) -> int:
+    return text.count("\n", 0, pos) + 1
+
+
+# =========================
+# Per-file extraction
+# =========================
+def scan_page(text: str) -> Dict[str, Any]:
+    m = CLASS_RE.search(text)
+    return {
+        "class": m.group(1) if m else None,
+        "methods": {mm.group(1): _line_of(text, mm.start(1)) for mm in PUBLIC_METHOD_RE.finditer(text)},
+    }
+
+
+def scan_steps(text: str) -> Dict[str, Any]:
+    m = CLASS_RE.search(text)
+    fields = {f.group(2): f.group(1) for f in FIELD_RE.finditer(text)}
+
+    steps: List[Dict[str, Any]] = []
+    annotations = list(ANNOTATION_RE.finditer(text))
+    for i, a in enumerate(annotations):
+        # the step body runs until the next annotation (or end of class)
+        end = annotations[i + 1].start() if i + 1 < len(annotations) else len(text)
+        calls = [
+            [c.group(1), c.group(2), _line_of(text, c.start())]
+            for c in CALL_RE.finditer(text, a.end(), end)
+            if c.group(1) in fields
+        ]
+        steps.append({
+            "keyword": a.group(1),
+            "expression": unescape_java(a.group(2)),
+            "line": _line_of(text, a.start()),
+            "calls": calls,
+        })
+    return {"class": m.group(1) if m else None, "fields": fields, "steps": steps}
+
+
+def scan_feature(text: str) -> Dict[str, Any]:
+    doc = gherkin_parser.parse_lines(text.splitlines())
+    return {
+        "name": doc.feature.name if doc.feature else None,
+        # outline steps expanded per Examples row: these are the texts Cucumber matches
+        "steps": [[st.effective_keyword, text, st.line] for st, text in doc.expanded_steps()],
+        # per scenario (background included): what test selection maps to step definitions
+        "scenarios": [
+            {"line": sc.line, "name": sc.name, "tags": sc.tags, "steps": doc.scenario_texts(sc)}
+            for sc in doc.scenarios
+        ],
+    }
+
+
+SCANNERS = {
+    "page": (PAGES_DIR, "*.java", scan_page),
+    "steps": (STEPS_DIR, "*.java", scan_steps),
+    "feature": (FEATURE_DIR, "*.feature", scan_feature),
+}
+
+
+# =========================
+# Index build / persistence
+# =========================
+def _load(path: Path) -> Dict[str, Any]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("version") == INDEX_VERSION:
+            return data["files"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+
+def _save(path: Path, files: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".symbol_index.", dir=str(path.parent))
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"version": INDEX_VERSION, "files": files}, f)
+    os.replace(tmp, path)
+
+
+def update(root: str = ".", index_path: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """
+    Bring the persisted index up to date with the tree under `root`.
+    Returns (files, stats); files maps path -> {"kind", "stat", "symbols"}.
+    """
+    rootp = Path(root)
+    ipath = Path(index_path) if index_path else rootp / INDEX_PATH
+    prev = _load(ipath)
+    files: Dict[str, Any] = {}
+    stats = {"files": 0, "rescanned": 0, "reused": 0, "removed": 0}
+
+    for kind, (d, pattern, scan) in SCANNERS.items():
+        base = rootp / d
+        if not base.is_dir():
+            continue
+        for p in sorted(base.rglob(pattern)):
+            key = str(p)
+            st = p.stat()
+            stat = [st.st_size, st.st_mtime_ns]
+            old = prev.get(key)
+            stats["files"] += 1
+            if old and old.get("stat") == stat and old.get("kind") == kind:
+                files[key] = old
+                stats["reused"] += 1
+                continue
+            files[key] = {"kind": kind, "stat": stat, "symbols": scan(p.read_text(encoding="utf-8", errors="ignore"))}
+            stats["rescanned"] += 1
+
+    stats["removed"] = len(set(prev) - set(files))
+    if stats["rescanned"] or stats["removed"] or not ipath.exists():
+        _save(ipath, files)
+    return files, stats
+
+
+# =========================
+# Checks
+# =========================
+def _expression_shape(expr: str) -> str:
+    return _PARAM_RE.sub("{}", expr.strip())
+
+
+def check(files: Dict[str, Any]) -> Tuple[List[Violation], List[Violation]]:
+    """Returns (errors, warnings)."""
+    errors: List[Violation] = []
+    warnings: List[Violation] = []
+
+    # page class -> (path, methods)
+    pages: Dict[str, Tuple[str, Dict[str, int]]] = {}
+    for path, f in files.items():
+        if f["kind"] == "page" and f["symbols"]["class"]:
+            pages[f["symbols"]["class"]] = (path, f["symbols"]["methods"])
+
+    used: Dict[str, set] = {cls: set() for cls in pages}
+    by_expr: Dict[str, List[Tuple[str, int]]] = {}
+    by_shape: Dict[str, Dict[str, Tuple[str, int]]] = {}
+
+    for path, f in files.items():
+        if f["kind"] != "steps":
+            continue
+        sym = f["symbols"]
+        for step in sym["steps"]:
+            expr = step["expression"]
+            by_expr.setdefault(expr, []).append((path, step["line"]))
+            by_shape.setdefault(_expression_shape(expr), {}).setdefault(expr, (path, step["line"]))
+
+            for var, method, line in step["calls"]:
+                cls = sym["fields"].get(var)
+                if cls not in pages:
+                    # not a page field (or page missing: validate_artifacts reports that)
+                    continue
+                used[cls].add(method)
+                if method not in pages[cls][1]:
+                    errors.append(Violation(
+                        path, line, "missing-binding",
+                        f"{var}.{method}() is not defined on {cls} ({pages[cls][0]})",
+                    ))
+
+    for expr, locs in by_expr.items():
+        if len(locs) > 1:
+            for path, line in locs[1:]:
+                errors.append(Violation(
+                    path, line, "duplicate-step",
+                    f'Step expression "{expr}" already defined at {locs[0][0]}:{locs[0][1]}',
+                ))
+
+    for variants in by_shape.values():
+        if len(variants) > 1:
+            (first_expr, (fpath, fline)), *rest = variants.items()
+            for expr, (path, line) in rest:
+                errors.append(Violation(
+                    path, line, "ambiguous-step",
+                    f'Step expression "{expr}" can match the same text as "{first_expr}" ({fpath}:{fline})',
+                ))
+
+    # every feature step must match exactly one definition
+    matcher = StepMatcher(
+        {"expression": expr, "source": path, "line": line} for path, _, expr, line in step_definitions(files)
+    )
+    for d, err in matcher.invalid:
+        errors.append(Violation(d["source"], d["line"], "invalid-step-expression", err))
+    seen = set()
+    for path, _, text, line in feature_steps(files):
+        if (path, line, text) in seen:
+            continue
+        seen.add((path, line, text))
+        defs = matcher.match(text)
+        if not defs:
+            errors.append(Violation(path, line, "undefined-step", f'No step definition matches "{text}"'))
+        elif len(defs) > 1:
+            where = ", ".join(f"{d['source']}:{d['line']}" for d in defs)
+            errors.append(Violation(path, line, "ambiguous-match", f'"{text}" matches {len(defs)} definitions ({where})'))
+
+    for cls, (path, methods) in pages.items():
+        for name, line in methods.items():
+            if name not in used[cls]:
+                warnings.append(Violation(path, line, "unused-method", f"{cls}.{name}() is not called by any step"))
+
+    return errors, warnings
+
+
+def feature_steps(files: Dict[str, Any]) -> Iterable[Tuple[str, str, str, int]]:
+    """(feature path, effective keyword, step text, line) for every feature step in the index."""
+    for path, f in files.items():
+        if f["kind"] == "feature":
+            for kw, text, line in f["symbols"]["steps"]:
+                yield path, kw, text, line
+
+
+def step_definitions(files: Dict[str, Any]) -> Iterable[Tuple[str, str, str, int]]:
+    """(steps path, keyword, expression, line) for every annotated step in the index."""
+    for path, f in files.items():
+        if f["kind"] == "steps":
+            for s in f["symbols"]["steps"]:
+                yield path, s["keyword"], s["expression"], s["line"]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Cross-artifact binding checks for generated/.")
+    ap.add_argument("--root", default=".")
+    ap.add_argument("--index-path", default="")
+    ap.add_argument("--json", dest="json_path", default="", help="write errors/warnings as JSON")
+    ap.add_argument("--strict-unused", action="store_true", help="treat unused page methods as errors")
+    args = ap.parse_args(argv)
+
+    files, stats = update(args.root, args.index_path or None)
+    errors, warnings = check(files)
+    if args.strict_unused:
+        errors, warnings = errors + warnings, []
+
+    print(f"SYMBOL_INDEX: files={stats['files']} rescanned={stats['rescanned']} "
+          f"reused={stats['reused']} removed={stats['removed']}")
+    for w in warnings:
+        print(f"WARNING: {w}")
+    for e in errors:
+        print(f"BINDING FAILED: {e}")
+
+    if args.json_path:
+        Path(args.json_path).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.json_path).write_text(json.dumps({
+            "stats": stats,
+            "errors": [e.to_dict() for e in errors],
+            "warnings": [w.to_dict() for w in warnings],
+        }, indent=2), encoding="utf-8")
+
+    if errors:
+        return 1
+    print("BINDINGS PASSED")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
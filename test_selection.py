@@ -0,0 +1,239 @@
+"""
+Change-based test selection for generated Cucumber suites.
+
+Compares the artifact hashes under generated/ with the snapshot recorded after
+the last test run and maps the changes through the dependency graph
+
+  page object  ->  steps classes holding a field of that page type
+  steps class  ->  scenarios with a step its definitions match (step_matcher)
+  feature      ->  scenarios whose own content (name + step texts, background
+                   and Examples rows included) changed or is new
+
+so only impacted scenarios run. The selection is emitted as Cucumber
+`path:line:line` filters and a ready-made Maven argument
+(-Dcucumber.features=...). Changed files are attributed to the generation task
+whose manifest (generated/_manifests) lists them.
+
+  python test_selection.py [--json selection.json] [--all]
+  python test_selection.py --record        # after the selected tests passed
+
+Without a recorded snapshot everything is selected. An empty selection exits
+with SELECTION_EMPTY_EXIT: empty Maven arguments would run the whole suite.
+With --maven-args only the arguments go to stdout (the report goes to stderr),
+so CI can do
+
+  args=$(python test_selection.py --maven-args); rc=$?
+  if [ $rc -eq 3 ]; then echo "nothing impacted"; elif [ $rc -eq 0 ]; then mvn test $args; else exit $rc; fi
+  python test_selection.py --record        # only once mvn passed
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+import generation_manifest
+import symbol_index
+from step_matcher import StepMatcher
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_PATH = Path("generated/_cache/tested_snapshot.json")
+
+# exit code when no scenario is impacted (CI skips Maven)
+SELECTION_EMPTY_EXIT = 3
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def scenario_fingerprint(sc: Dict[str, Any]) -> str:
+    return _sha256(json.dumps([sc["name"], sc["steps"]]).encode("utf-8"))
+
+
+# =========================
+# Snapshot
+# =========================
+def current_state(files: Dict[str, Any]) -> Dict[str, Any]:
+    """{"files": {path: sha256}, "scenarios": {feature path: [fingerprint, ...]}} of the indexed tree."""
+    hashes: Dict[str, str] = {}
+    for p in files:
+        try:
+            hashes[p] = _sha256(Path(p).read_bytes())
+        except OSError:
+            continue
+    scenarios = {
+        p: [scenario_fingerprint(sc) for sc in f["symbols"]["scenarios"]]
+        for p, f in files.items() if f["kind"] == "feature"
+    }
+    return {"files": hashes, "scenarios": scenarios}
+
+
+def load_snapshot(path: Path = SNAPSHOT_PATH) -> Optional[Dict[str, Any]]:
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != SNAPSHOT_VERSION:
+        return None
+    return data
+
+
+def record(state: Dict[str, Any], path: Path = SNAPSHOT_PATH) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".tested_snapshot.", dir=str(path.parent))
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"version": SNAPSHOT_VERSION, **state}, f)
+    os.replace(tmp, path)
+
+
+def manifest_tasks() -> Dict[str, str]:
+    """Artifact path (repo-relative when possible) -> generation task that produced it."""
+    out: Dict[str, str] = {}
+    root = generation_manifest.REPO_ROOT
+    for mp in sorted(generation_manifest.MANIFEST_DIR.glob("*.json")):
+        try:
+            data = json.loads(mp.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        task = data.get("inputs", {}).get("task", mp.stem)
+        for p in data.get("outputs", {}):
+            try:
+                p = str(Path(p).relative_to(root))
+            except ValueError:
+                pass
+            out[p] = task
+    return out
+
+
+# =========================
+# Selection
+# =========================
+def select(
+    files: Dict[str, Any],
+    previous: Optional[Dict[str, Any]],
+    current: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    current = current or current_state(files)
+    old_files = previous["files"] if previous else {}
+    changed = sorted(p for p, h in current["files"].items() if old_files.get(p) != h)
+    removed = sorted(set(old_files) - set(current["files"]))
+    kind_of = {p: f["kind"] for p, f in files.items()}
+
+    # page -> steps
+    page_class = {f["symbols"]["class"]: p for p, f in files.items() if f["kind"] == "page" and f["symbols"]["class"]}
+    touched_pages = {p for p in changed if kind_of.get(p) == "page"}
+    removed_pages = {Path(p).stem for p in removed if Path(p).parent.name == "pages"}
+    impacted_steps: Dict[str, List[str]] = {p: ["changed"] for p in changed if kind_of.get(p) == "steps"}
+    for p, f in files.items():
+        if f["kind"] != "steps":
+            continue
+        for cls in set(f["symbols"]["fields"].values()):
+            if page_class.get(cls) in touched_pages or cls in removed_pages:
+                impacted_steps.setdefault(p, []).append(f"uses {cls}")
+    steps_removed = any(Path(p).parent.name == "steps" for p in removed)
+
+    # steps -> scenarios
+    matcher = StepMatcher(
+        {"expression": expr, "source": path, "line": line}
+        for path, _, expr, line in symbol_index.step_definitions(files)
+    )
+    old_scenarios = previous["scenarios"] if previous else {}
+    selected: List[Dict[str, Any]] = []
+    total = 0
+    for path, f in sorted(files.items()):
+        if f["kind"] != "feature":
+            continue
+        known = set(old_scenarios.get(path, ()))
+        for sc, fp in zip(f["symbols"]["scenarios"], current["scenarios"].get(path, ())):
+            total += 1
+            reasons: List[str] = []
+            if previous is None:
+                reasons.append("no snapshot")
+            elif fp not in known:
+                reasons.append("scenario changed" if path in old_files else "new feature")
+            sources: Set[str] = set()
+            unmatched = False
+            for text in sc["steps"]:
+                defs = matcher.match(text)
+                unmatched |= not defs
+                sources.update(d["source"] for d in defs)
+            for s in sorted(sources & set(impacted_steps)):
+                reasons.append(f"{s} ({', '.join(impacted_steps[s])})")
+            if unmatched and steps_removed:
+                reasons.append("step definition removed")
+            if reasons:
+                selected.append({"feature": path, "line": sc["line"], "name": sc["name"], "reasons": reasons})
+
+    by_feature: Dict[str, List[int]] = {}
+    for s in selected:
+        by_feature.setdefault(s["feature"], []).append(s["line"])
+    scenario_count = {p: len(f["symbols"]["scenarios"]) for p, f in files.items() if f["kind"] == "feature"}
+    # whole feature when every scenario of it is selected (shorter, and picks up hooks-only changes)
+    filters = [
+        p if len(lines) == scenario_count.get(p) else ":".join([p] + [str(n) for n in sorted(lines)])
+        for p, lines in sorted(by_feature.items())
+    ]
+
+    tasks = manifest_tasks()
+    return {
+        "changed": changed,
+        "removed": removed,
+        "tasks": sorted({tasks[p] for p in changed + removed if p in tasks}),
+        "impacted_steps": sorted(impacted_steps),
+        "scenarios": selected,
+        "counts": {"scenarios": total, "selected": len(selected), "features": len(by_feature)},
+        "cucumber_features": filters,
+        "maven_args": [f"-Dcucumber.features={','.join(filters)}"] if filters else [],
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Select the generated scenarios impacted by artifact changes.")
+    ap.add_argument("--root", default=".")
+    ap.add_argument("--snapshot", default="", help=f"default: <root>/{SNAPSHOT_PATH}")
+    ap.add_argument("--json", dest="json_path", default="", help="write the selection as JSON")
+    ap.add_argument("--all", action="store_true", help="ignore the snapshot and select everything")
+    ap.add_argument("--record", action="store_true", help="record the current tree as tested and exit")
+    ap.add_argument("--maven-args", action="store_true", help="print only the Maven arguments on stdout")
+    args = ap.parse_args(argv)
+
+    snapshot = Path(args.snapshot) if args.snapshot else Path(args.root) / SNAPSHOT_PATH
+    files, _ = symbol_index.update(args.root)
+    state = current_state(files)
+    if args.record:
+        record(state, snapshot)
+        print(f"SELECTION_RECORDED: files={len(state['files'])} -> {snapshot}")
+        return 0
+
+    result = select(files, None if args.all else load_snapshot(snapshot), state)
+    out = sys.stderr if args.maven_args else sys.stdout
+    c = result["counts"]
+    print(f"SELECTION: scenarios={c['selected']}/{c['scenarios']} features={c['features']} "
+          f"changed={len(result['changed'])} removed={len(result['removed'])}", file=out)
+    if result["tasks"]:
+        print(f"TASKS: {', '.join(result['tasks'])}", file=out)
+    for s in result["scenarios"]:
+        print(f"  {s['feature']}:{s['line']} {s['name']} <- {'; '.join(s['reasons'])}", file=out)
+
+    if args.json_path:
+        Path(args.json_path).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.json_path).write_text(json.dumps(result, indent=2), encoding="utf-8")
+
+    if not result["maven_args"]:
+        # empty args would make `mvn test` run the whole suite
+        print("SELECTION_EMPTY: no impacted scenarios", file=sys.stderr)
+        return SELECTION_EMPTY_EXIT
+    if args.maven_args:
+        print(" ".join(result["maven_args"]))
+    else:
+        print(f"MAVEN_ARGS: {' '.join(result['maven_args'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+"""
+Unit checks for step_matcher's dispatch trie:
+
+  python -m pytest -q test_step_matcher.py
+"""
+from step_matcher import StepMatcher, literal_prefix_words
+
+
+def _defn(expression: str) -> dict:
+    return {"keyword": "Given", "expression": expression, "source": "Steps.java", "line": 1}
+
+
+def test_top_level_regex_alternation_is_indexed_at_root():
+    assert literal_prefix_words("^I open home|^I close shop$") == []
+    m = StepMatcher([_defn("^I open home|^I close shop$")])
+    assert len(m.match("I close shop")) == 1
+    assert len(m.match("I open home")) == 1
+    assert m.match("I open shop") == []
+
+
+def test_grouped_alternation_keeps_prefix():
+    assert literal_prefix_words("^I (open|close) the shop$") == ["I"]
+    assert literal_prefix_words(r"^I open a\|b shop$") == ["I", "open"]
+    assert literal_prefix_words("^I pick [a|b] now$") == ["I", "pick"]
+    m = StepMatcher([_defn("^I (open|close) the shop$")])
+    assert len(m.match("I close the shop")) == 1
@@ -0,0 +1,250 @@
+"""
+Token accounting for LLM calls.
+
+- count_tokens(): chars/4 estimate by default; the real tokenizer only when
+  LOCAL_LLM_TOKENIZER names one (a Hub id or local dir, e.g.
+  deepseek-ai/DeepSeek-Coder-V2-Lite-Instruct), falling back to the estimate
+  when transformers or the tokenizer files are unavailable
+- section_breakdown(): tokens contributed by each prompt section
+  (contracts, RAG context, task, ...) with the remainder attributed to
+  the fixed instructions/examples; without a tokenizer it is marked
+  "estimate" and calibrate() rescales it so it sums to the backend-reported
+  usage.prompt_tokens of the same prompt
+- record_call() / recording(): per-run log of backend `usage` + timing, fed
+  by llm_generate.completions()
+
+Batch report over the run ledger:
+  python token_usage.py [--task T] [--model M] [--prompt-version V] [--limit N]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+APPROX_CHARS_PER_TOKEN = 4
+
+_TOKENIZER_LOCK = threading.Lock()
+_TOKENIZER: Any = None
+_TOKENIZER_NAME: Optional[str] = None
+_TOKENIZER_FAILED = False
+
+_CALLS: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("llm_calls", default=None)
+_STAGE: ContextVar[str] = ContextVar("llm_stage", default="")
+
+
+# =========================
+# Tokenizer
+# =========================
+def _get_tokenizer() -> Any:
+    global _TOKENIZER, _TOKENIZER_NAME, _TOKENIZER_FAILED
+    if _TOKENIZER is not None or _TOKENIZER_FAILED:
+        return _TOKENIZER
+    with _TOKENIZER_LOCK:
+        if _TOKENIZER is not None or _TOKENIZER_FAILED:
+            return _TOKENIZER
+        name = os.getenv("LOCAL_LLM_TOKENIZER", "").strip()
+        if not name:
+            # opt-in only: counting tokens shouldn't download a tokenizer on every fresh run
+            _TOKENIZER_FAILED = True
+            return None
+        try:
+            from transformers import AutoTokenizer
+
+            # the tokenizer files are plain tokenizer.json, no remote code needed
+            _TOKENIZER = AutoTokenizer.from_pretrained(name)
+            _TOKENIZER_NAME = name
+        except Exception:
+            # no transformers / offline: fall back to the chars/4 estimate, don't retry per call
+            _TOKENIZER_FAILED = True
+    return _TOKENIZER
+
+
+def tokenizer_name() -> str:
+    tok = _get_tokenizer()
+    return _TOKENIZER_NAME if tok is not None and _TOKENIZER_NAME else "approx_chars_div_4"
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    tok = _get_tokenizer()
+    if tok is None:
+        return max(1, len(text) // APPROX_CHARS_PER_TOKEN)
+    return len(tok.encode(text, add_special_tokens=False))
+
+
+def section_breakdown(prompt: str, sections: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Tokens per named section of `prompt`. Whatever is not covered by a named
+    section (system text, rules, examples, separators) is reported as "instructions".
+    """
+    total = count_tokens(prompt)
+    out: Dict[str, int] = {}
+    for name, text in sections.items():
+        out[name] = count_tokens(text) if text and text in prompt else 0
+    out["instructions"] = max(0, total - sum(out.values()))
+    return {"total": total, "sections": out, "tokenizer": tokenizer_name(), "estimate": _get_tokenizer() is None}
+
+
+def calibrate(breakdown: Dict[str, Any], prompt_tokens: Optional[int]) -> Dict[str, Any]:
+    """
+    Scale an estimated breakdown so it sums to the backend's prompt_tokens for the
+    same prompt (the section shares stay estimates). Tokenizer-exact breakdowns, or
+    no backend usage, come back unchanged.
+    """
+    if not breakdown.get("estimate") or not prompt_tokens or not breakdown.get("total"):
+        return breakdown
+    scale = prompt_tokens / breakdown["total"]
+    sections = {k: int(round(v * scale)) for k, v in breakdown["sections"].items() if k != "instructions"}
+    sections["instructions"] = max(0, prompt_tokens - sum(sections.values()))
+    return {**breakdown, "total": prompt_tokens, "sections": sections,
+            "scaled_to": "backend_prompt_tokens", "scale": round(scale, 3)}
+
+
+def stage_prompt_tokens(calls: List[Dict[str, Any]], stage_name: str) -> Optional[int]:
+    """Backend-reported prompt_tokens of the stage's first call (its unrepaired prompt)."""
+    for c in calls:
+        if c["stage"] == stage_name:
+            return c["prompt_tokens"] if c.get("usage_source") == "backend" else None
+    return None
+
+
+# =========================
+# Per-call recording
+# =========================
+@contextmanager
+def recording() -> Iterator[List[Dict[str, Any]]]:
+    """Collect every record_call() made in this context (and threads that copy it)."""
+    calls: List[Dict[str, Any]] = []
+    token = _CALLS.set(calls)
+    try:
+        yield calls
+    finally:
+        _CALLS.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    token = _STAGE.set(name)
+    try:
+        yield
+    finally:
+        _STAGE.reset(token)
+
+
+def record_call(usage: Optional[Dict[str, Any]], elapsed_s: float, prompt: str, completions: List[str], n: int = 1) -> Dict[str, Any]:
+    usage = usage or {}
+    prompt_tokens = usage.get("prompt_tokens")
+    completion_tokens = usage.get("completion_tokens")
+    source = "backend"
+    if prompt_tokens is None or completion_tokens is None:
+        # backend did not return usage: measure locally
+        source = "tokenizer"
+        prompt_tokens = count_tokens(prompt)
+        completion_tokens = sum(count_tokens(c) for c in completions)
+
+    rec = {
+        "stage": _STAGE.get() or "unlabeled",
+        "n": n,
+        "prompt_tokens": int(prompt_tokens),
+        "completion_tokens": int(completion_tokens),
+        "elapsed_ms": round(elapsed_s * 1000, 1),
+        # end-to-end rate (includes prefill); comparable across runs on the same backend
+        "tokens_per_s": round(completion_tokens / elapsed_s, 2) if elapsed_s > 0 else None,
+        "usage_source": source,
+    }
+    calls = _CALLS.get()
+    if calls is not None:
+        calls.append(rec)
+    return rec
+
+
+def summarize_calls(calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+    prompt_tokens = sum(c["prompt_tokens"] for c in calls)
+    completion_tokens = sum(c["completion_tokens"] for c in calls)
+    elapsed_s = sum(c["elapsed_ms"] for c in calls) / 1000.0
+    return {
+        "calls": len(calls),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "llm_elapsed_ms": round(elapsed_s * 1000, 1),
+        "tokens_per_s": round(completion_tokens / elapsed_s, 2) if elapsed_s > 0 else None,
+    }
+
+
+# =========================
+# Batch report
+# =========================
+def aggregate(metas: Iterator[Dict[str, Any]]) -> Dict[str, Any]:
+    runs = 0
+    totals = {"prompt_tokens": 0, "completion_tokens": 0, "llm_elapsed_ms": 0.0}
+    per_stage: Dict[str, Dict[str, float]] = {}
+    per_section: Dict[str, Dict[str, float]] = {}
+    estimated = 0  # prompt breakdowns from the chars/4 estimate (scaled to backend usage when it was reported)
+
+    for meta in metas:
+        tokens = meta.get("tokens") or {}
+        # cache hits make no LLM calls; counting them would dilute the averages
+        if not tokens.get("calls"):
+            continue
+        runs += 1
+        summary = tokens.get("summary") or {}
+        for k in totals:
+            totals[k] += summary.get(k) or 0
+        for c in tokens.get("calls", []):
+            st = per_stage.setdefault(c["stage"], {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "elapsed_ms": 0.0})
+            st["calls"] += 1
+            st["prompt_tokens"] += c["prompt_tokens"]
+            st["completion_tokens"] += c["completion_tokens"]
+            st["elapsed_ms"] += c["elapsed_ms"]
+        for prompt_name, bd in (tokens.get("prompt_sections") or {}).items():
+            estimated += bool(bd.get("estimate"))
+            for sec, n in bd.get("sections", {}).items():
+                key = f"{prompt_name}.{sec}"
+                ps = per_section.setdefault(key, {"tokens": 0})
+                ps["tokens"] += n
+
+    def avg(x: float) -> float:
+        return round(x / runs, 1) if runs else 0.0
+
+    return {
+        "runs_with_tokens": runs,
+        "total": {**totals, "tokens_per_s": round(totals["completion_tokens"] / (totals["llm_elapsed_ms"] / 1000.0), 2)
+                  if totals["llm_elapsed_ms"] else None},
+        "avg_per_run": {k: avg(v) for k, v in totals.items()},
+        "stages": {
+            name: {
+                "calls": int(st["calls"]),
+                "avg_prompt_tokens": round(st["prompt_tokens"] / st["calls"], 1),
+                "avg_completion_tokens": round(st["completion_tokens"] / st["calls"], 1),
+                "tokens_per_s": round(st["completion_tokens"] / (st["elapsed_ms"] / 1000.0), 2) if st["elapsed_ms"] else None,
+            }
+            for name, st in per_stage.items()
+        },
+        # sorted biggest first: these are the sections worth trimming
+        "estimated_section_breakdowns": estimated,
+        "avg_section_tokens": dict(sorted(((k, avg(v["tokens"])) for k, v in per_section.items()), key=lambda kv: -kv[1])),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import run_ledger
+
+    ap = argparse.ArgumentParser(description="Token usage report across runs in the run ledger.")
+    ap.add_argument("--task")
+    ap.add_argument("--model")
+    ap.add_argument("--prompt-version")
+    ap.add_argument("--limit", type=int, default=0, help="most recent N runs (0 = all)")
+    args = ap.parse_args(argv)
+
+    metas = run_ledger.iter_meta(args.task, args.model, args.prompt_version, limit=args.limit or None)
+    print(json.dumps(aggregate(metas), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
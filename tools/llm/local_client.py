@@ -3,6 +3,7 @@ from __future__ import annotations
 
 import json
 import os
+import threading
 import time
 from typing import Any, Dict, List, Optional, Union
 
@@ -48,6 +49,21 @@ def _api_key() -> str:
     return (os.getenv("LOCAL_LLM_API_KEY", "") or "").strip().strip('"').strip("'")
 
 
+_SESSION_LOCAL = threading.local()
+
+
+def _session() -> requests.Session:
+    """
+    One keep-alive session per thread, so repeated calls (batch runs, generation_service.py)
+    reuse TCP/TLS connections instead of reconnecting every time.
+    """
+    sess = getattr(_SESSION_LOCAL, "session", None)
+    if sess is None:
+        sess = requests.Session()
+        _SESSION_LOCAL.session = sess
+    return sess
+
+
 def _headers() -> Dict[str, str]:
     h = {
         "Content-Type": "application/json",
@@ -87,7 +103,7 @@ def list_models(timeout: float = DEFAULT_TIMEOUT_SECS, retries: int = DEFAULT_RE
     last_err: Optional[Exception] = None
     for attempt in range(retries + 1):
         try:
-            r = requests.get(url, headers=_headers(), timeout=timeout)
+            r = _session().get(url, headers=_headers(), timeout=timeout)
             if r.status_code != 200:
                 _raise_http_error(r, url)
             data = r.json()
@@ -102,19 +118,20 @@ def list_models(timeout: float = DEFAULT_TIMEOUT_SECS, retries: int = DEFAULT_RE
     raise last_err or RuntimeError("LOCAL_LLM_UNKNOWN_ERROR")
 
 
-def _completion(
+def completion(
     prompt: str,
     model: Optional[str] = None,
     temperature: float = 0.0,
     max_tokens: int = 512,
     timeout: float = DEFAULT_TIMEOUT_SECS,
     retries: int = DEFAULT_RETRIES,
-) -> str:
+    stop: Optional[List[str]] = None,
+) -> Dict[str, Any]:
     """
     Calls OpenAI-compatible endpoint:
       POST /v1/completions
 
-    Returns text as a string.
+    Returns {"text", "usage", "finish_reason"} (usage as reported by the server, may be {}).
     """
     url = _url("completions")
     if not url:
@@ -130,18 +147,25 @@ def _completion(
         "temperature": temperature,
         "max_tokens": max_tokens,
     }
+    if stop:
+        payload["stop"] = stop
 
     last_err: Optional[Exception] = None
     for attempt in range(retries + 1):
         try:
-            r = requests.post(url, headers=_headers(), data=json.dumps(payload), timeout=timeout)
+            r = _session().post(url, headers=_headers(), data=json.dumps(payload), timeout=timeout)
             if r.status_code != 200:
                 _raise_http_error(r, url)
 
             j = r.json()
             # OpenAI-compatible shape: choices[0].text
             try:
-                return j["choices"][0]["text"]
+                choice = j["choices"][0]
+                return {
+                    "text": choice["text"],
+                    "usage": j.get("usage") or {},
+                    "finish_reason": choice.get("finish_reason"),
+                }
             except Exception:
                 compact = json.dumps(j, ensure_ascii=False)[:2000]
                 raise RuntimeError(f"LOCAL_LLM_BAD_RESPONSE\nURL: {url}\nRESPONSE:\n{compact}")
@@ -155,6 +179,24 @@ def _completion(
     raise last_err or RuntimeError("LOCAL_LLM_UNKNOWN_ERROR")
 
 
+def _completion(
+    prompt: str,
+    model: Optional[str] = None,
+    temperature: float = 0.0,
+    max_tokens: int = 512,
+    timeout: float = DEFAULT_TIMEOUT_SECS,
+    retries: int = DEFAULT_RETRIES,
+) -> str:
+    return completion(
+        prompt=prompt,
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        timeout=timeout,
+        retries=retries,
+    )["text"]
+
+
 def chat_completion(
     messages: Union[str, List[Dict[str, str]]],
     model: Optional[str] = None,
@@ -198,7 +240,7 @@ def chat_completion(
     last_err: Optional[Exception] = None
     for attempt in range(retries + 1):
         try:
-            r = requests.post(url, headers=_headers(), data=json.dumps(payload), timeout=timeout)
+            r = _session().post(url, headers=_headers(), data=json.dumps(payload), timeout=timeout)
             if r.status_code != 200:
                 _raise_http_error(r, url)
 
@@ -0,0 +1,174 @@
+import java.io.BufferedReader;
+import java.io.File;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.nio.charset.StandardCharsets;
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.HashMap;
+import java.util.List;
+import java.util.Locale;
+import java.util.Map;
+
+import javax.tools.Diagnostic;
+import javax.tools.DiagnosticCollector;
+import javax.tools.JavaCompiler;
+import javax.tools.JavaFileObject;
+import javax.tools.StandardJavaFileManager;
+import javax.tools.ToolProvider;
+
+import org.junit.platform.engine.TestExecutionResult;
+import org.junit.platform.engine.discovery.DiscoverySelectors;
+import org.junit.platform.engine.support.descriptor.MethodSource;
+import org.junit.platform.launcher.Launcher;
+import org.junit.platform.launcher.LauncherDiscoveryRequest;
+import org.junit.platform.launcher.TestExecutionListener;
+import org.junit.platform.launcher.TestIdentifier;
+import org.junit.platform.launcher.core.LauncherDiscoveryRequestBuilder;
+import org.junit.platform.launcher.core.LauncherFactory;
+
+/**
+ * Long-lived JVM driven by maven_runner.py over stdin/stdout (one tab-separated command per line).
+ *
+ *   COMPILE  outDir  file...      -> DIAG kind file line message ... then COMPILED ok ms
+ *   TEST     testClassesDir cls.. -> CASE status class method ms message ... then DONE tests failures errors skipped ms
+ *   QUIT
+ *
+ * Test classes are loaded through a fresh class loader per TEST so recompiled classes are picked
+ * up without restarting the JVM; the dependency jars stay loaded (and JIT-warm) on the app class path.
+ * Test output (System.out/err) is redirected to stderr so it never interleaves with the protocol.
+ */
+public final class WarmRunner {
+
+    private static final PrintStream PROTOCOL = new PrintStream(System.out, true, StandardCharsets.UTF_8);
+
+    public static void main(String[] args) throws Exception {
+        System.setOut(new PrintStream(System.err, true, StandardCharsets.UTF_8));
+        JavaCompiler compiler = ToolProvider.getSystemJavaCompiler();
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        PROTOCOL.println("READY");
+
+        String line;
+        while ((line = in.readLine()) != null) {
+            String[] cmd = line.split("\t");
+            try {
+                switch (cmd[0]) {
+                    case "COMPILE":
+                        compile(compiler, cmd[1], Arrays.copyOfRange(cmd, 2, cmd.length));
+                        break;
+                    case "TEST":
+                        test(cmd[1], Arrays.copyOfRange(cmd, 2, cmd.length));
+                        break;
+                    case "QUIT":
+                        return;
+                    default:
+                        PROTOCOL.println("ERROR\tunknown command " + escape(cmd[0]));
+                }
+            } catch (Throwable t) {
+                PROTOCOL.println("ERROR\t" + escape(t.toString()));
+            }
+        }
+    }
+
+    private static void compile(JavaCompiler compiler, String outDir, String[] files) throws Exception {
+        long t0 = System.nanoTime();
+        if (compiler == null) {
+            PROTOCOL.println("ERROR\tno system Java compiler (run on a JDK, not a JRE)");
+            return;
+        }
+        new File(outDir).mkdirs();
+        DiagnosticCollector<JavaFileObject> diagnostics = new DiagnosticCollector<>();
+        boolean ok;
+        try (StandardJavaFileManager fm = compiler.getStandardFileManager(diagnostics, Locale.ROOT, StandardCharsets.UTF_8)) {
+            // the output dir is on the class path so unchanged classes resolve without recompiling them
+            List<String> options = new ArrayList<>(Arrays.asList(
+                "-d", outDir,
+                "-cp", outDir + File.pathSeparator + System.getProperty("java.class.path"),
+                "-encoding", "UTF-8",
+                "-proc:none"
+            ));
+            ok = compiler.getTask(null, fm, diagnostics, options, null, fm.getJavaFileObjects(files)).call();
+        }
+        for (Diagnostic<? extends JavaFileObject> d : diagnostics.getDiagnostics()) {
+            String src = d.getSource() == null ? "" : d.getSource().getName();
+            PROTOCOL.println("DIAG\t" + d.getKind() + "\t" + escape(src) + "\t" + d.getLineNumber()
+                + "\t" + escape(d.getMessage(Locale.ROOT)));
+        }
+        PROTOCOL.println("COMPILED\t" + (ok ? 1 : 0) + "\t" + (System.nanoTime() - t0) / 1_000_000);
+    }
+
+    private static void test(String testClassesDir, String[] classNames) throws Exception {
+        long t0 = System.nanoTime();
+        int[] counts = new int[4]; // tests, failures, errors, skipped
+        ClassLoader previous = Thread.currentThread().getContextClassLoader();
+        URL[] urls = {new File(testClassesDir).toURI().toURL()};
+        try (URLClassLoader loader = new URLClassLoader(urls, WarmRunner.class.getClassLoader())) {
+            Thread.currentThread().setContextClassLoader(loader);
+            LauncherDiscoveryRequestBuilder request = LauncherDiscoveryRequestBuilder.request();
+            for (String name : classNames) {
+                request.selectors(DiscoverySelectors.selectClass(loader.loadClass(name)));
+            }
+            LauncherDiscoveryRequest discovery = request.build();
+            Launcher launcher = LauncherFactory.create();
+            launcher.execute(discovery, new TestExecutionListener() {
+                private final Map<String, Long> started = new HashMap<>();
+
+                @Override
+                public void executionStarted(TestIdentifier id) {
+                    started.put(id.getUniqueId(), System.nanoTime());
+                }
+
+                @Override
+                public void executionSkipped(TestIdentifier id, String reason) {
+                    if (id.isTest()) {
+                        counts[0]++;
+                        counts[3]++;
+                        emit("skipped", id, 0, reason);
+                    }
+                }
+
+                @Override
+                public void executionFinished(TestIdentifier id, TestExecutionResult result) {
+                    if (!id.isTest()) {
+                        return;
+                    }
+                    long ms = (System.nanoTime() - started.getOrDefault(id.getUniqueId(), System.nanoTime())) / 1_000_000;
+                    String message = result.getThrowable().map(Throwable::toString).orElse("");
+                    String status;
+                    if (result.getStatus() == TestExecutionResult.Status.SUCCESSFUL) {
+                        status = "passed";
+                    } else if (result.getThrowable().map(t -> t instanceof AssertionError).orElse(false)) {
+                        status = "failed";
+                        counts[1]++;
+                    } else {
+                        status = "error";
+                        counts[2]++;
+                    }
+                    counts[0]++;
+                    emit(status, id, ms, message);
+                }
+            });
+        } finally {
+            Thread.currentThread().setContextClassLoader(previous);
+        }
+        PROTOCOL.println("DONE\t" + counts[0] + "\t" + counts[1] + "\t" + counts[2] + "\t" + counts[3]
+            + "\t" + (System.nanoTime() - t0) / 1_000_000);
+    }
+
+    private static void emit(String status, TestIdentifier id, long ms, String message) {
+        String cls = "";
+        String method = id.getDisplayName();
+        if (id.getSource().isPresent() && id.getSource().get() instanceof MethodSource) {
+            MethodSource src = (MethodSource) id.getSource().get();
+            cls = src.getClassName();
+            method = src.getMethodName();
+        }
+        PROTOCOL.println("CASE\t" + status + "\t" + escape(cls) + "\t" + escape(method) + "\t" + ms + "\t" + escape(message));
+    }
+
+    private static String escape(String s) {
+        return s == null ? "" : s.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "");
+    }
+}
@@ -1,134 +1,526 @@
+"""
+Contract checks for generated artifacts (features, step definitions, page objects).
+
+Importable API:
+  validate_paths(paths)        -> ValidationReport   (reads the files)
+  validate_contents(contents)  -> ValidationReport   ({path: text}, nothing read from disk)
+
+The artifact kind is taken from the path: *.feature, steps/*.java (or *Steps.java),
+pages/*.java (or *Page.java). Java files also go through java_precheck (syntax,
+package/class vs path, duplicate methods, page imports) so broken sources never
+reach Maven. The CLI validates everything under generated/ and
+reports every violation, not just the first:
+  python validate_artifacts.py [paths...] [-j 8] [--json report.json] [--junit junit.xml] [--slowest 10]
+
+Results are cached by content hash (generated/_cache/validation_cache.json), so a
+re-run only checks files that changed or whose imported page objects changed.
+"""
+import argparse
+import hashlib
+import json
 import os
-import sys
 import re
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+import gherkin_parser
+import java_precheck
 
 FEATURE_DIR = "generated/features"
-STEPS_FILE = "generated/steps/CancelOrderSteps.java"
+STEPS_DIR = "generated/steps"
 PAGES_DIR = "generated/pages"
 
-def fail(msg):
-    print(f"VALIDATION FAILED: {msg}")
-    sys.exit(1)
-
-def validate_feature_file(path):
-    with open(path, "r", encoding="utf-8") as f:
-        lines = [l.rstrip() for l in f.readlines()]
-
-    # No markdown fences
-    for l in lines:
-        if "```" in l:
-            fail(f"Markdown fence found in {path}")
-
-    # Must start with Feature:
-    non_empty = [l for l in lines if l.strip()]
-    if not non_empty or not non_empty[0].startswith("Feature:"):
-        fail(f"{path} must start with 'Feature:'")
-
-    # Enforce exactly 1 Given / When / Then
-    scenario_blocks = []
-    current = []
-
-    for line in lines:
-        if line.strip().startswith(("Scenario:", "Scenario Outline:")):
-            if current:
-                scenario_blocks.append(current)
-            current = [line]
-        elif current:
-            current.append(line)
-
-    if current:
-        scenario_blocks.append(current)
-
-    for block in scenario_blocks:
-        given = when = then = 0
-
-        for line in block:
-            s = line.strip()
-            if s.startswith("Given "):
-                given += 1
-            elif s.startswith("When "):
-                when += 1
-            elif s.startswith("Then "):
-                then += 1
-            elif s.startswith(("And ", "But ")):
-                fail(f"{path}: And/But not allowed")
-
-        if given != 1 or when != 1 or then != 1:
-            fail(
-                f"{path}: Each scenario must have exactly "
-                f"1 Given, 1 When, 1 Then"
-            )
-
-def validate_step_definitions():
-    if not os.path.exists(STEPS_FILE):
-        fail(f"Missing step definition file: {STEPS_FILE}")
-
-    with open(STEPS_FILE, "r", encoding="utf-8") as f:
-        src = f.read()
-
-    given = src.count("@Given(")
-    when = src.count("@When(")
-    then = src.count("@Then(")
-
-    if given != 1 or when != 1 or then != 1:
-        fail(
-            f"{STEPS_FILE}: Must contain exactly 1 @Given, 1 @When, 1 @Then. "
-            f"Found Given={given}, When={when}, Then={then}"
-        )
-
-def validate_pages_atomic():
-    if not os.path.isdir(PAGES_DIR):
-        fail(f"Missing directory: {PAGES_DIR}")
-
-    allowed_prefixes = (
-        "click", "select", "enter", "type", "set", "fill",
-        "open", "navigate", "goTo", "wait",
-        "get", "is", "has",
-        "verify", "assert"
-    )
-
-    forbidden_tokens = (
-        "io.cucumber",
-        "@Given", "@When", "@Then",
-        "import io.cucumber"
-    )
-
-    method_re = re.compile(r"public\s+[\w\<\>\[\]]+\s+([A-Za-z_]\w*)\s*\(")
-
-    for root, _, files in os.walk(PAGES_DIR):
-        for file in files:
-            if not file.endswith(".java"):
-                continue
-
-            path = os.path.join(root, file)
-            with open(path, "r", encoding="utf-8") as f:
-                src = f.read()
-
-            for tok in forbidden_tokens:
-                if tok in src:
-                    fail(f"{path}: Page Objects must not contain Cucumber annotations")
-
-            for m in method_re.finditer(src):
-                name = m.group(1)
-                if not name.startswith(allowed_prefixes):
-                    fail(
-                        f"{path}: Non-atomic public method '{name}'. "
-                        f"Allowed prefixes: {', '.join(allowed_prefixes)}"
-                    )
-
-def main():
-    if not os.path.isdir(FEATURE_DIR):
-        fail(f"Missing directory: {FEATURE_DIR}")
-
-    for root, _, files in os.walk(FEATURE_DIR):
-        for file in files:
-            if file.endswith(".feature"):
-                validate_feature_file(os.path.join(root, file))
-
-    validate_step_definitions()
-    validate_pages_atomic()
+ALLOWED_PREFIXES = (
+    "click", "select", "enter", "type", "set", "fill",
+    "open", "navigate", "goTo", "wait",
+    "get", "is", "has",
+    "verify", "assert"
+)
+
+FORBIDDEN_PAGE_TOKENS = (
+    "io.cucumber",
+    "@Given", "@When", "@Then",
+    "import io.cucumber"
+)
+
+METHOD_RE = re.compile(r"public\s+[\w\<\>\[\]]+\s+([A-Za-z_]\w*)\s*\(")
+PAGE_IMPORT_RE = re.compile(r"^\s*import\s+generated\.pages\.([A-Za-z_]\w*)\s*;", re.M)
+
+# Bump whenever a check changes: cached results from other versions are ignored
+RULESET_VERSION = "4"
+
+# files per worker task in parallel mode
+PARALLEL_CHUNK = 64
+
+PathLike = Union[str, Path]
+
+
+class Violation:
+    __slots__ = ("path", "line", "rule", "message")
+
+    def __init__(self, path: str, line: Optional[int], rule: str, message: str) -> None:
+        self.path = path
+        self.line = line
+        self.rule = rule
+        self.message = message
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"path": self.path, "line": self.line, "rule": self.rule, "message": self.message}
+
+    def __str__(self) -> str:
+        loc = f"{self.path}:{self.line}" if self.line else self.path
+        return f"{loc}: [{self.rule}] {self.message}"
+
+    def __repr__(self) -> str:
+        return f"Violation({self.path!r}, {self.line!r}, {self.rule!r}, {self.message!r})"
+
+
+class FileResult:
+    def __init__(self, path: str, kind: str, violations: List[Violation], elapsed_ms: float = 0.0) -> None:
+        self.path = path
+        self.kind = kind
+        self.violations = violations
+        self.elapsed_ms = elapsed_ms
+
+    @property
+    def ok(self) -> bool:
+        return not self.violations
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "kind": self.kind,
+            "ok": self.ok,
+            "elapsed_ms": self.elapsed_ms,
+            "violations": [v.to_dict() for v in self.violations],
+        }
+
+
+class ValidationReport:
+    def __init__(self, files: List[FileResult], violations: Optional[List[Violation]] = None) -> None:
+        self.files = files
+        # violations not tied to a single file (missing directories, empty suites)
+        self.global_violations = violations or []
+
+    @property
+    def violations(self) -> List[Violation]:
+        out = list(self.global_violations)
+        for f in self.files:
+            out.extend(f.violations)
+        return out
+
+    @property
+    def ok(self) -> bool:
+        return not self.violations
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ok": self.ok,
+            "files": len(self.files),
+            "violations": [v.to_dict() for v in self.violations],
+            "results": [f.to_dict() for f in self.files],
+        }
+
+
+# =========================
+# Per-kind checks
+# =========================
+def check_feature(path: str, text: str) -> List[Violation]:
+    out: List[Violation] = []
+    doc = gherkin_parser.parse_lines(text.splitlines())
+
+    # No markdown fences (Gherkin would read a leading ``` as a doc string delimiter)
+    fence_lines = {n for n, t in doc.free_text() if "```" in t}
+    fence_lines |= {st.line for st in doc.steps() if "```" in st.text}
+    fence_lines |= {st.doc_string.line for st in doc.steps() if st.doc_string and st.doc_string.delimiter == "```"}
+    for n in sorted(fence_lines):
+        out.append(Violation(path, n, "no-markdown-fence", "Markdown fence found"))
+
+    # Must start with Feature: (tags and comments may precede it)
+    first = doc.first_line
+    if first is None or not first[1].startswith("Feature:"):
+        out.append(Violation(path, first[0] if first else None, "feature-header", "File must start with 'Feature:'"))
+
+    for n, msg in doc.errors:
+        if n not in fence_lines:
+            out.append(Violation(path, n, "gherkin-syntax", msg))
+
+    for st in doc.steps():
+        if st.keyword in ("And", "But"):
+            out.append(Violation(path, st.line, "no-and-but", "And/But not allowed"))
+
+    # Enforce exactly 1 Given / When / Then per scenario
+    for sc in doc.scenarios:
+        n = {"Given": 0, "When": 0, "Then": 0}
+        for st in sc.steps:
+            if st.keyword in n:
+                n[st.keyword] += 1
+        if any(v != 1 for v in n.values()):
+            out.append(Violation(
+                path, sc.line, "one-given-when-then",
+                f"Each scenario must have exactly 1 Given, 1 When, 1 Then "
+                f"(found Given={n['Given']}, When={n['When']}, Then={n['Then']})",
+            ))
+    return sorted(out, key=lambda v: v.line or 0)
+
+
+def page_dependencies(path: PathLike, text: str) -> List[str]:
+    """
+    Page object files a steps class depends on: the ones it imports (generated.pages.X
+    -> ../pages/X.java) plus any other class name it references, since whether that
+    name is a page (and must be imported) depends on ../pages/ too.
+    """
+    pages_dir = Path(path).parent.parent / "pages"
+    names = dict.fromkeys(PAGE_IMPORT_RE.findall(text))
+    names.update(dict.fromkeys(sorted(java_precheck.parse(text).referenced)))
+    return [str(pages_dir / f"{name}.java") for name in names]
+
+
+def check_java(path: str, text: str, page_classes: Optional[Iterable[str]] = None) -> List[Violation]:
+    """Syntax / package / class name / duplicate method / page import checks (java_precheck)."""
+    return [Violation(path, line, rule, msg) for line, rule, msg in java_precheck.check(path, text, page_classes)]
+
+
+def check_steps(path: str, text: str) -> List[Violation]:
+    out: List[Violation] = []
+    counts = {kw: text.count(f"@{kw}(") for kw in ("Given", "When", "Then")}
+    if not all(n == 1 for n in counts.values()):
+        # point at the first surplus annotation (no line when one is missing)
+        line = None
+        for kw, n in counts.items():
+            if n > 1:
+                pos = [m.start() for m in re.finditer(re.escape(f"@{kw}("), text)][1]
+                line = text.count("\n", 0, pos) + 1
+                break
+        out.append(Violation(
+            path, line, "one-step-per-keyword",
+            f"Must contain exactly 1 @Given, 1 @When, 1 @Then. "
+            f"Found Given={counts['Given']}, When={counts['When']}, Then={counts['Then']}",
+        ))
+
+    pages_dir = Path(path).parent.parent / "pages"
+    for m in PAGE_IMPORT_RE.finditer(text):
+        dep = str(pages_dir / f"{m.group(1)}.java")
+        if not os.path.exists(dep):
+            out.append(Violation(
+                path, text.count("\n", 0, m.start(1)) + 1, "steps-page-exists",
+                f"Imported page object not found: {dep}",
+            ))
+
+    out.extend(check_java(path, text, java_precheck.page_classes_near(path)))
+    return out
+
+
+def check_page(path: str, text: str) -> List[Violation]:
+    out: List[Violation] = []
+    for tok in FORBIDDEN_PAGE_TOKENS:
+        pos = text.find(tok)
+        if pos >= 0:
+            out.append(Violation(
+                path, text.count("\n", 0, pos) + 1, "page-no-cucumber",
+                f"Page Objects must not contain Cucumber annotations ({tok})",
+            ))
+            break
+
+    for m in METHOD_RE.finditer(text):
+        name = m.group(1)
+        if not name.startswith(ALLOWED_PREFIXES):
+            out.append(Violation(
+                path, text.count("\n", 0, m.start()) + 1, "page-atomic-method",
+                f"Non-atomic public method '{name}'. Allowed prefixes: {', '.join(ALLOWED_PREFIXES)}",
+            ))
+
+    out.extend(check_java(path, text))
+    return out
+
+
+CHECKS = {
+    "feature": check_feature,
+    "steps": check_steps,
+    "page": check_page,
+}
+
+
+def artifact_kind(path: PathLike) -> Optional[str]:
+    p = Path(path)
+    if p.suffix == ".feature":
+        return "feature"
+    if p.suffix != ".java":
+        return None
+    if p.parent.name == "steps" or p.stem.endswith("Steps"):
+        return "steps"
+    if p.parent.name == "pages" or p.stem.endswith("Page"):
+        return "page"
+    return None
+
+
+def validate_text(path: PathLike, text: str, kind: Optional[str] = None) -> FileResult:
+    t0 = time.perf_counter()
+    path = str(path)
+    kind = kind or artifact_kind(path)
+    if kind not in CHECKS:
+        violations = [Violation(path, None, "unknown-artifact", "Not a feature, steps or page file")]
+    else:
+        violations = CHECKS[kind](path, text)
+    return FileResult(path, kind or "unknown", violations, round((time.perf_counter() - t0) * 1000, 3))
+
+
+def validate_file(path: PathLike) -> FileResult:
+    t0 = time.perf_counter()
+    try:
+        text = Path(path).read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError) as e:
+        return FileResult(str(path), artifact_kind(path) or "unknown", [Violation(str(path), None, "readable", str(e))])
+    result = validate_text(path, text)
+    # per-file time includes the read, so slow storage shows up too
+    result.elapsed_ms = round((time.perf_counter() - t0) * 1000, 3)
+    return result
+
+
+def _validate_chunk(paths: List[str]) -> List[FileResult]:
+    return [validate_file(p) for p in paths]
+
+
+# =========================
+# API
+# =========================
+def validate_contents(contents: Mapping[PathLike, str]) -> ValidationReport:
+    return ValidationReport([validate_text(p, text) for p, text in contents.items()])
+
+
+def validate_paths(paths: Iterable[PathLike], jobs: int = 1) -> ValidationReport:
+    """
+    Validate every path and collect all violations (never stops at the first).
+    jobs > 1 spreads the files over a process pool; results keep input order.
+    """
+    paths = [str(p) for p in paths]
+    if jobs <= 1 or len(paths) < 2 * PARALLEL_CHUNK:
+        return ValidationReport(_validate_chunk(paths))
+
+    # chunks amortize the pickling/IPC cost: single checks take well under a millisecond
+    chunks = [paths[i:i + PARALLEL_CHUNK] for i in range(0, len(paths), PARALLEL_CHUNK)]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        results = [r for chunk in pool.map(_validate_chunk, chunks) for r in chunk]
+    return ValidationReport(results)
+
+
+def discover(root: PathLike = ".") -> Tuple[List[Path], List[Violation]]:
+    """Artifact paths of a generated/ tree, plus layout problems (missing dirs / no steps)."""
+    root = Path(root)
+    paths: List[Path] = []
+    layout: List[Violation] = []
+    for d, pattern in ((FEATURE_DIR, "*.feature"), (STEPS_DIR, "*.java"), (PAGES_DIR, "*.java")):
+        full = root / d
+        if not full.is_dir():
+            layout.append(Violation(d, None, "layout", f"Missing directory: {d}"))
+            continue
+        found = sorted(full.rglob(pattern))
+        if not found and d == STEPS_DIR:
+            layout.append(Violation(d, None, "layout", f"Missing step definition files in {d}"))
+        paths.extend(found)
+    return paths, layout
+
+
+def validate_tree(root: PathLike = ".", jobs: int = 1) -> ValidationReport:
+    paths, layout = discover(root)
+    report = validate_paths(paths, jobs=jobs)
+    report.global_violations = layout
+    return report
+
+
+# =========================
+# Result cache
+# =========================
+# Results are keyed by content hash + RULESET_VERSION + the hashes of the file's
+# cross-file dependencies (a steps class -> the page objects it imports), so
+# only changed files and their dependents are re-validated. (size, mtime_ns)
+# lets unchanged files skip even the read + hash.
+CACHE_PATH = Path("generated/_cache/validation_cache.json")
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _load_cache(path: Path) -> Dict[str, Any]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("ruleset") == RULESET_VERSION:
+            return data["files"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+
+def _save_cache(path: Path, files: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".validation_cache.", dir=str(path.parent))
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"ruleset": RULESET_VERSION, "files": files}, f)
+    os.replace(tmp, path)
+
+
+def _fingerprint(path: str, prev: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Content hash + dependencies of one file, reusing the cached ones when stat is unchanged."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return {"sha256": None, "deps": []}
+    stat = [st.st_size, st.st_mtime_ns]
+    if prev and prev.get("stat") == stat:
+        return {"sha256": prev["sha256"], "deps": prev["deps"], "stat": stat}
+    data = Path(path).read_bytes()
+    deps = page_dependencies(path, data.decode("utf-8", "ignore")) if artifact_kind(path) == "steps" else []
+    return {"sha256": _sha256(data), "deps": deps, "stat": stat}
+
+
+def _dep_hash(dep: str, fps: Dict[str, Dict[str, Any]]) -> str:
+    fp = fps.get(dep)
+    if fp is None:
+        # dependency outside this run (or missing): hash it directly
+        fp = _fingerprint(dep, None)
+    return fp["sha256"] or "MISSING"
+
+
+def validate_paths_cached(
+    paths: Iterable[PathLike], jobs: int = 1, cache_path: PathLike = CACHE_PATH
+) -> Tuple[ValidationReport, Dict[str, int]]:
+    """
+    validate_paths() that re-runs checks only for files whose content, rule set
+    or dependencies changed. Returns (report, stats).
+    """
+    cache_path = Path(cache_path)
+    cached = _load_cache(cache_path)
+    paths = [str(p) for p in paths]
+
+    fps = {p: _fingerprint(p, cached.get(p)) for p in paths}
+    keys: Dict[str, str] = {}
+    for p, fp in fps.items():
+        parts = [RULESET_VERSION, fp["sha256"] or "MISSING"]
+        parts += [f"{d}={_dep_hash(d, fps)}" for d in fp["deps"]]
+        keys[p] = _sha256("\n".join(parts).encode("utf-8"))
+
+    stats = {"files": len(paths), "hits": 0, "misses": 0, "dependency_misses": 0}
+    results: Dict[str, FileResult] = {}
+    todo: List[str] = []
+    for p in paths:
+        entry = cached.get(p)
+        if entry and entry.get("key") == keys[p]:
+            stats["hits"] += 1
+            vs = [Violation(**v) for v in entry["violations"]]
+            results[p] = FileResult(p, entry["kind"], vs, 0.0)
+            continue
+        stats["misses"] += 1
+        if entry and entry.get("sha256") == fps[p]["sha256"]:
+            # own content unchanged: a dependency changed
+            stats["dependency_misses"] += 1
+        todo.append(p)
+
+    for r in validate_paths(todo, jobs=jobs).files:
+        results[r.path] = r
+
+    # keep entries for files outside this run (a partial run must not evict them)
+    for p in paths:
+        if fps[p]["sha256"] is None:
+            cached.pop(p, None)
+            continue
+        r = results[p]
+        cached[p] = {
+            "key": keys[p],
+            "sha256": fps[p]["sha256"],
+            "stat": fps[p].get("stat"),
+            "deps": fps[p]["deps"],
+            "kind": r.kind,
+            "violations": [v.to_dict() for v in r.violations],
+        }
+    _save_cache(cache_path, cached)
+    return ValidationReport([results[p] for p in paths]), stats
+
+
+# =========================
+# Reports
+# =========================
+def write_json_report(report: ValidationReport, path: PathLike) -> None:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text(json.dumps(report.to_dict(), indent=2), encoding="utf-8")
+
+
+def write_junit_report(report: ValidationReport, path: PathLike) -> None:
+    """One <testcase> per file (time = per-file seconds), one <failure> per violation."""
+    cases = list(report.files)
+    if report.global_violations:
+        cases.insert(0, FileResult("layout", "layout", report.global_violations))
+
+    suite = ET.Element("testsuite", {
+        "name": "validate_artifacts",
+        "tests": str(len(cases)),
+        "failures": str(sum(1 for c in cases if c.violations)),
+        "errors": "0",
+        "time": f"{sum(c.elapsed_ms for c in cases) / 1000:.3f}",
+    })
+    for c in cases:
+        case = ET.SubElement(suite, "testcase", {
+            "classname": f"validate_artifacts.{c.kind}",
+            "name": c.path,
+            "time": f"{c.elapsed_ms / 1000:.6f}",
+        })
+        for v in c.violations:
+            failure = ET.SubElement(case, "failure", {"type": v.rule, "message": v.message})
+            failure.text = str(v)
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    ET.ElementTree(suite).write(str(path), encoding="utf-8", xml_declaration=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Validate generated features, step definitions and page objects.")
+    ap.add_argument("paths", nargs="*", help="artifact files (default: everything under generated/)")
+    ap.add_argument("--jobs", "-j", type=int, default=1, help="worker processes (0 = one per CPU)")
+    ap.add_argument("--json", dest="json_path", default="", help="write a JSON report here")
+    ap.add_argument("--junit", default="", help="write a JUnit XML report here")
+    ap.add_argument("--slowest", type=int, default=0, help="print the N slowest files")
+    ap.add_argument("--no-cache", action="store_true", help="re-validate every file (ignore the result cache)")
+    ap.add_argument("--cache-path", default=str(CACHE_PATH))
+    args = ap.parse_args(argv)
+
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    t0 = time.perf_counter()
+    if args.paths:
+        paths, layout = list(args.paths), []
+    else:
+        paths, layout = discover()
+    if args.no_cache:
+        report = validate_paths(paths, jobs=jobs)
+    else:
+        report, stats = validate_paths_cached(paths, jobs=jobs, cache_path=args.cache_path)
+        print(f"VALIDATION_CACHE: hits={stats['hits']} misses={stats['misses']} "
+              f"(dependency_changed={stats['dependency_misses']}) ruleset={RULESET_VERSION}")
+    report.global_violations = layout
+    elapsed = time.perf_counter() - t0
+
+    if args.json_path:
+        write_json_report(report, args.json_path)
+    if args.junit:
+        write_junit_report(report, args.junit)
+    for f in sorted(report.files, key=lambda f: -f.elapsed_ms)[:args.slowest]:
+        print(f"SLOW: {f.elapsed_ms:.3f}ms {f.path}")
+
+    violations = report.violations
+    print(f"FILES: {len(report.files)} failed={sum(1 for f in report.files if not f.ok)} "
+          f"violations={len(violations)} elapsed={elapsed:.2f}s jobs={jobs}")
+    if violations:
+        for v in violations:
+            print(f"VALIDATION FAILED: {v}")
+        return 1
 
     print("VALIDATION PASSED")
+    return 0
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""
+Watch mode: re-validate touched artifacts and re-index touched RAG docs as you edit.
+
+  python watch.py [--poll] [--debounce-ms 150] [--no-rag] [--no-bindings] [-j 4]
+
+Changes under generated/ and rag_docs/ are collected and debounced (editors and
+the generator write several files in a burst), then:
+  - generated/*.feature|*.java: validate_artifacts (hash cache) on the touched
+    files, plus the steps classes when a page changed, and the symbol index
+    binding checks for the touched files
+  - rag_docs/*.md|*.txt: rag_build.build() with the warm embedding model; only
+    the changed docs are re-embedded
+
+Events come from inotify (Linux, via ctypes); elsewhere, or with --poll, the
+trees are polled by (size, mtime).
+"""
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import symbol_index
+import validate_artifacts
+
+REPO_ROOT = Path(__file__).resolve().parent
+WATCH_DIRS = ("generated", "rag_docs")
+ARTIFACT_SUFFIXES = (".feature", ".java")
+RAG_SUFFIXES = (".md", ".txt")
+
+DEFAULT_DEBOUNCE_MS = 150
+POLL_INTERVAL_S = 0.5
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT = struct.Struct("iIII")
+
+
+def _relevant(path: Path) -> bool:
+    # skip temp files from atomic writers (.name.xxx.tmp) and caches
+    if path.name.startswith(".") or "_cache" in path.parts:
+        return False
+    return path.suffix in ARTIFACT_SUFFIXES + RAG_SUFFIXES
+
+
+# =========================
+# Change sources
+# =========================
+class InotifyWatcher:
+    def __init__(self, roots: List[Path]) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, Path] = {}
+        for root in roots:
+            if root.is_dir():
+                self._add_tree(root)
+
+    def _add_tree(self, root: Path) -> None:
+        for d, _, _ in os.walk(root):
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(d), WATCH_MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {d}")
+            self._dirs[wd] = Path(d)
+
+    def wait(self, timeout: Optional[float]) -> Set[Path]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed: Set[Path] = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        off = 0
+        while off + _EVENT.size <= len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, off)
+            name = data[off + _EVENT.size: off + _EVENT.size + length].rstrip(b"\0").decode("utf-8", "replace")
+            off += _EVENT.size + length
+            base = self._dirs.get(wd)
+            if base is None or not name:
+                continue
+            path = base / name
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path)
+                    changed.update(p for p in path.rglob("*") if p.is_file())
+                continue
+            changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    def __init__(self, roots: List[Path], interval: float = POLL_INTERVAL_S) -> None:
+        self.roots = roots
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        out: Dict[Path, Tuple[int, int]] = {}
+        for root in self.roots:
+            for p in root.rglob("*") if root.is_dir() else ():
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                if p.is_file():
+                    out[p] = (st.st_size, st.st_mtime_ns)
+        return out
+
+    def wait(self, timeout: Optional[float]) -> Set[Path]:
+        time.sleep(self.interval if timeout is None else min(self.interval, timeout))
+        new = self._scan()
+        old, self._snapshot = self._snapshot, new
+        return {p for p in set(old) | set(new) if old.get(p) != new.get(p)}
+
+    def close(self) -> None:
+        pass
+
+
+def make_watcher(roots: List[Path], poll: bool = False):
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(roots)
+        except OSError as e:
+            # e.g. fs.inotify.max_user_watches exhausted, or a filesystem without inotify
+            print(f"WATCH: inotify unavailable ({e}), polling instead")
+    return PollingWatcher(roots)
+
+
+def batches(watcher, debounce_s: float) -> Iterator[Set[Path]]:
+    """Yield sets of changed paths once no new change arrived for `debounce_s`."""
+    pending: Set[Path] = set()
+    while True:
+        got = watcher.wait(debounce_s if pending else None)
+        got = {p for p in got if _relevant(p)}
+        if got:
+            pending |= got
+            continue
+        if pending:
+            yield pending
+            pending = set()
+
+
+# =========================
+# Actions
+# =========================
+class Session:
+    def __init__(self, jobs: int, rag: bool, bindings: bool) -> None:
+        self.jobs = jobs
+        self.rag = rag
+        self.bindings = bindings
+
+    def on_artifacts(self, paths: Set[Path]) -> None:
+        t0 = time.perf_counter()
+        existing = sorted(str(p.relative_to(REPO_ROOT)) for p in paths if p.exists())
+        removed = sorted(str(p.relative_to(REPO_ROOT)) for p in paths if not p.exists())
+        targets = list(existing)
+        if any(validate_artifacts.artifact_kind(p) == "page" for p in paths):
+            # steps classes import pages: their cache keys change with the page
+            steps_dir = Path(validate_artifacts.STEPS_DIR)
+            targets += [str(p) for p in sorted(steps_dir.glob("*.java")) if str(p) not in existing]
+
+        report, stats = validate_artifacts.validate_paths_cached(targets, jobs=self.jobs)
+        for v in report.violations:
+            print(f"  VALIDATION FAILED: {v}")
+        touched = set(existing) | set(removed)
+
+        binding_errors: List[validate_artifacts.Violation] = []
+        if self.bindings:
+            files, _ = symbol_index.update(".")
+            errors, _ = symbol_index.check(files)
+            binding_errors = [e for e in errors if e.path in touched or e.path in targets]
+            for e in binding_errors:
+                print(f"  BINDING FAILED: {e}")
+
+        ms = (time.perf_counter() - t0) * 1000
+        status = "OK" if report.ok and not binding_errors else "FAILED"
+        print(f"[{time.strftime('%H:%M:%S')}] ARTIFACTS {status}: changed={len(existing)} removed={len(removed)} "
+              f"checked={len(targets)} cache_hits={stats['hits']} in {ms:.0f}ms")
+
+    def on_rag_docs(self, paths: Set[Path]) -> None:
+        import rag_build
+        from rag.retrieve import encode  # warm model, loaded once per watch session
+
+        t0 = time.perf_counter()
+        try:
+            result = rag_build.build(encode=encode, verbose=False)
+        except Exception as e:
+            print(f"[{time.strftime('%H:%M:%S')}] RAG_BUILD FAILED: {type(e).__name__}: {e}")
+            return
+        ms = (time.perf_counter() - t0) * 1000
+        print(f"[{time.strftime('%H:%M:%S')}] RAG_BUILD OK: indexed={len(result['sources'])} "
+              f"re-embedded={result['encoded']} reused={result['reused']} in {ms:.0f}ms")
+
+    def handle(self, changed: Set[Path]) -> None:
+        artifacts = {p for p in changed if p.suffix in ARTIFACT_SUFFIXES and "generated" in p.parts}
+        docs = {p for p in changed if p.suffix in RAG_SUFFIXES and "rag_docs" in p.parts}
+        if artifacts:
+            self.on_artifacts(artifacts)
+        if docs and self.rag:
+            self.on_rag_docs(docs)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Re-validate and re-index on change.")
+    ap.add_argument("--poll", action="store_true", help="poll instead of inotify")
+    ap.add_argument("--debounce-ms", type=int, default=DEFAULT_DEBOUNCE_MS)
+    ap.add_argument("--no-rag", action="store_true", help="don't rebuild the RAG index on rag_docs changes")
+    ap.add_argument("--no-bindings", action="store_true", help="skip symbol index binding checks")
+    ap.add_argument("--jobs", "-j", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    # artifact/index paths are repo-relative throughout (validate_artifacts, rag_build)
+    os.chdir(REPO_ROOT)
+    roots = [REPO_ROOT / d for d in WATCH_DIRS]
+    watcher = make_watcher(roots, poll=args.poll)
+    session = Session(jobs=args.jobs, rag=not args.no_rag, bindings=not args.no_bindings)
+    print(f"WATCHING: {', '.join(WATCH_DIRS)} ({type(watcher).__name__}, debounce={args.debounce_ms}ms) - Ctrl+C to stop")
+
+    try:
+        for changed in batches(watcher, args.debounce_ms / 1000.0):
+            session.handle(changed)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())